@@ -0,0 +1,289 @@
+from typing import Optional, Tuple, Union, List, Dict
+
+import numpy as np
+
+from tak_env.TakAction import TakAction, TakActionTable
+from tak_env.TakState import TakState
+from tak_env.TakSymmetry import TakSymmetry
+from utils.PackedTable import PackedTable
+
+
+class MCTSPlayerArrayKnowledgeGraph(object):
+    """
+    MCTSPlayerArrayKnowledgeGraph class.
+    Same interface as MCTSPlayerKnowledgeGraph, but the statistics of the graph are kept in NumPy arrays instead of
+    igraph attributes:
+        - visits and sum_reward, indexed by node id
+        - edge_source, edge_target and edge_action (id in the TakActionTable), indexed by edge id
+    States are kept in a list indexed by node id (and in a state -> node id index), and each node keeps the ids of its
+    outgoing edges and of its parents in a list (child_edges and parent_nodes). The searches add the edges one at a
+    time, to any node, so offsets into a single array of edges (CSR) would have to be rebuilt on every edge added; the
+    lists of edge ids index the edge arrays instead, which is what the vectorized operations need.
+    The arrays grow (doubling their capacity) as nodes and edges are added.
+    Like MCTSPlayerKnowledgeGraph, it can key the nodes on canonical states (canonical_states).
+
+    Backups update all the nodes to credit with a single fancy-indexed addition, and the best child of a node is
+    found with an argmax/argmin over the values of its children.
+
+    Like MCTSPlayerKnowledgeGraph, the visits and rewards of the nodes can be saved and loaded (see save_stats and
+    load_stats) to warm start later searches.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(
+            self,
+            initial_state: TakState,
+            initial_capacity: int = INITIAL_CAPACITY,
+            canonical_states: bool = False
+    ):
+        self.states: List[TakState] = []
+        self.node_ids: Dict[TakState, int] = {}
+        self.canonical_states: bool = canonical_states
+        self.symmetry: Optional[TakSymmetry] = TakSymmetry.get(initial_state.board_size) if canonical_states else None
+        self.visits = np.zeros(initial_capacity, dtype=np.int64)
+        self.sum_reward = np.zeros(initial_capacity, dtype=np.float64)
+        self.child_edges: List[List[int]] = []
+        self.parent_nodes: List[List[int]] = []
+
+        self.action_table: TakActionTable = TakActionTable.get(initial_state.board_size)
+        self.edges = 0
+        self.edge_source = np.zeros(initial_capacity, dtype=np.int64)
+        self.edge_target = np.zeros(initial_capacity, dtype=np.int64)
+        self.edge_action = np.zeros(initial_capacity, dtype=np.int64)
+        # Saved stats the nodes start with (see load_stats)
+        self.stats_base: Optional[PackedTable] = None
+
+        self.initial_state_node_id = self._add_state(self._node_state(initial_state))
+
+    @staticmethod
+    def _grow(array: np.ndarray, size: int) -> np.ndarray:
+        """
+        Returns the given array if it can hold the given number of elements, or a copy with (at least) double the
+        capacity otherwise
+        :param array: the array
+        :param size: the number of elements it must hold
+        :return: np.ndarray
+        """
+        if size <= len(array):
+            return array
+        grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def get_root(self) -> Tuple[TakState, float, int]:
+        return (
+            self.states[self.initial_state_node_id],
+            self.get_state_value(self.initial_state_node_id),
+            int(self.visits[self.initial_state_node_id])
+        )
+
+    def state_in_graph(self, state: TakState) -> bool:
+        return self._node_state(state) in self.node_ids
+
+    def state_node_id(self, state: TakState) -> Optional[int]:
+        return self.node_ids.get(self._node_state(state))
+
+    def _node_state(self, state: TakState) -> TakState:
+        return state if self.symmetry is None else self.symmetry.canonical(state)[0]
+
+    def state_action(self, state: TakState, action: Optional[TakAction]) -> Optional[TakAction]:
+        """
+        Returns the given action of the node of the given state (actions of the nodes are relative to the state stored
+        in the node, see get_state) as an action of the given state. Only differs when keying on canonical states.
+        :param state: the state
+        :param action: an action of the node of the state
+        :return: the action on the given state
+        """
+        if self.symmetry is None or action is None:
+            return action
+        return self.symmetry.transform_action(action, self.symmetry.inverse(self.symmetry.canonical_transform(state)))
+
+    def get_state(self, state_node_id: int) -> TakState:
+        return self.states[state_node_id]
+
+    def _add_state(self, node_state: TakState) -> int:
+        state_node_id = len(self.states)
+        self.visits = self._grow(self.visits, state_node_id + 1)
+        self.sum_reward = self._grow(self.sum_reward, state_node_id + 1)
+        self.states.append(node_state)
+        self.child_edges.append([])
+        self.parent_nodes.append([])
+        self.node_ids[node_state] = state_node_id
+        if self.stats_base is not None:
+            i = self.stats_base.index(node_state.key)
+            if i is not None:
+                self.visits[state_node_id] = self.stats_base.arrays['visits'][i]
+                self.sum_reward[state_node_id] = self.stats_base.arrays['sum_reward'][i]
+        return state_node_id
+
+    def add_state(self, parent: Union[int, TakState], state: TakState, action: TakAction) -> int:
+        """
+        Adds the edge of the given action from the parent to the given state (adding the state if it is new)
+        :param parent: the node id of the parent (the action is relative to its stored state) or the parent state
+        :param state: the state the action leads to
+        :param action: the action
+        :return: the node id of the state
+        """
+        if isinstance(parent, int):
+            parent_node_id = parent
+        else:
+            parent_node_id = self.state_node_id(parent)
+            if self.symmetry is not None:
+                action = self.symmetry.transform_action(action, self.symmetry.canonical_transform(parent))
+        if parent_node_id is None:
+            raise ValueError("Parent state is not in the graph")
+        node_state = self._node_state(state)
+        state_node_id = self.node_ids.get(node_state)
+        if state_node_id is None:
+            state_node_id = self._add_state(node_state)
+
+        edge_id = self.edges
+        self.edges += 1
+        self.edge_source = self._grow(self.edge_source, self.edges)
+        self.edge_target = self._grow(self.edge_target, self.edges)
+        self.edge_action = self._grow(self.edge_action, self.edges)
+        self.edge_source[edge_id] = parent_node_id
+        self.edge_target[edge_id] = state_node_id
+        self.edge_action[edge_id] = self.action_table.id_of(action)
+        self.child_edges[parent_node_id].append(edge_id)
+        self.parent_nodes[state_node_id].append(parent_node_id)
+        return state_node_id
+
+    def add_action_result(self, parent: TakState, action: TakAction) -> int:
+        return self.add_state(parent, action.take(parent, mutate=False), action)
+
+    def get_children(self, state: Union[int, TakState]) -> List[Tuple[TakAction, int]]:
+        state_node_id = state if isinstance(state, int) else self.state_node_id(state)
+        edges = self.child_edges[state_node_id]
+        return [
+            (self.action_table.actions[action_id], int(target))
+            for action_id, target in zip(self.edge_action[edges], self.edge_target[edges])
+        ]
+
+    def get_ancestors(self, state_node_id: int, max_depth: Optional[int] = None) -> List[int]:
+        """
+        Returns the ids of all the nodes the given node can be reached from (each one once)
+        :param state_node_id: the id of the node
+        :param max_depth: if given, only the nodes up to this many edges away from the node
+        :return: list of node ids
+        """
+        ancestors, visited = [], set()
+        frontier, depth = [state_node_id], 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for node_id in frontier:
+                for parent_node_id in self.parent_nodes[node_id]:
+                    if parent_node_id not in visited:
+                        visited.add(parent_node_id)
+                        next_frontier.append(parent_node_id)
+            ancestors.extend(next_frontier)
+            frontier = next_frontier
+        return ancestors
+
+    def add_visit(self, state: Union[int, TakState], reward: float, backpropagate: bool = True) -> None:
+        self.add_visits(state, [reward], backpropagate)
+
+    def add_visits(
+            self,
+            state: Union[int, TakState],
+            rewards: List[float],
+            backpropagate: bool = True,
+            max_depth: Optional[int] = None
+    ) -> None:
+        """
+        Adds a visit for each of the given rewards to the given node and (once per reward) to each of its ancestors
+        :param state: the node id or the state
+        :param rewards: the rewards of the visits
+        :param backpropagate: whether to also add the visits to the ancestors of the node
+        :param max_depth: if given, only add the visits to the ancestors up to this many edges away from the node
+        """
+        state_node_id = state if isinstance(state, int) else self.state_node_id(state)
+        node_ids = [state_node_id]
+        if backpropagate:
+            node_ids.extend(self.get_ancestors(state_node_id, max_depth))
+        self.add_stats(node_ids, len(rewards), sum(rewards))
+
+    def add_path_visits(self, path: List[int], rewards: List[float]) -> None:
+        """
+        Adds a visit for each of the given rewards to each node of the given path (once per node)
+        :param path: the node ids from the root of the search to the expanded node
+        :param rewards: the rewards of the visits
+        """
+        self.add_stats(np.unique(path), len(rewards), sum(rewards))
+
+    def add_stats(self, node_ids: Union[List[int], np.ndarray], visits: int, sum_reward: float) -> None:
+        """
+        Adds the given visits and reward to each of the given nodes (each must appear once).
+        Negative values take them back, e.g. to remove a virtual loss.
+        :param node_ids: the ids of the nodes
+        :param visits: the number of visits to add
+        :param sum_reward: the total reward to add
+        """
+        self.visits[node_ids] += visits
+        self.sum_reward[node_ids] += sum_reward
+
+    def get_state_value(self, state: Union[int, TakState]) -> float:
+        state_node_id = state if isinstance(state, int) else self.state_node_id(state)
+        if state_node_id is not None:
+            return float(self.sum_reward[state_node_id] / max(1, self.visits[state_node_id]))
+        else:
+            return 0.0
+
+    def get_best_child_action(self, state: Union[int, TakState], maximize: bool = True) -> Optional[TakAction]:
+        """
+        Returns the action leading to the child with the highest (or lowest) value, the first one on ties
+        :param state: the node id or the state
+        :param maximize: whether to pick the highest value (or the lowest)
+        :return: the action, or None if the node has no children
+        """
+        state_node_id = state if isinstance(state, int) else self.state_node_id(state)
+        edges = self.child_edges[state_node_id]
+        if len(edges) == 0:
+            return None
+        targets = self.edge_target[edges]
+        values = self.sum_reward[targets] / np.maximum(1, self.visits[targets])
+        best_edge = edges[int(np.argmax(values) if maximize else np.argmin(values))]
+        return self.action_table.actions[self.edge_action[best_edge]]
+
+    def total_nodes(self) -> int:
+        return len(self.states)
+
+    def total_rollouts(self):
+        return int(self.visits[:len(self.states)].sum())
+
+    def save_stats(self, path: str) -> None:
+        """
+        Saves the visits and total reward of every node (merged with the loaded stats of the states that are not in
+        the graph) to the given directory, as a PackedTable keyed by the Zobrist keys of the states of the nodes.
+        The edges are not saved.
+        :param path: the directory to save the stats to (it can be the one they were loaded from)
+        """
+        nodes = len(self.states)
+        PackedTable.save(
+            path,
+            np.array([state.key for state in self.states], dtype=np.uint64),
+            {'visits': self.visits[:nodes], 'sum_reward': self.sum_reward[:nodes]},
+            meta={'board_size': self.action_table.board_size, 'canonical_states': self.canonical_states},
+            base=self.stats_base
+        )
+        self.stats_base = PackedTable.load(path, mmap=self.stats_base.mmap if self.stats_base is not None else True)
+
+    def load_stats(self, path: str, mmap: bool = True) -> None:
+        """
+        Warm starts the graph with the stats saved to the given directory (see save_stats): the nodes of the saved
+        states get their saved visits and total reward, now for the ones in the graph and when added for the rest
+        :param path: the directory the stats were saved to
+        :param mmap: whether to memory map the saved stats instead of reading them into memory
+        :raises ValueError: if the stats were saved by a graph of another board size or keying
+        """
+        stats_base = PackedTable.load(path, mmap=mmap)
+        if stats_base.meta['board_size'] != self.action_table.board_size or \
+                stats_base.meta['canonical_states'] != self.canonical_states:
+            raise ValueError(f"The stats in {path} are of another board size or keying: {stats_base.meta}")
+        self.stats_base = stats_base
+        indices = stats_base.indices(np.array([state.key for state in self.states], dtype=np.uint64))
+        in_base = np.flatnonzero(indices >= 0)
+        self.visits[in_base] = stats_base.arrays['visits'][indices[in_base]]
+        self.sum_reward[in_base] = stats_base.arrays['sum_reward'][indices[in_base]]
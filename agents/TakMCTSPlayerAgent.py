@@ -1,42 +1,104 @@
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Tuple, Union, Set, List
+from typing import Optional, Tuple, Union, List, Dict
 
 import numpy as np
 from igraph import Graph, Vertex
 
+from agents.MCTSPlayerArrayKnowledgeGraph import MCTSPlayerArrayKnowledgeGraph
 from agents.TakPlayerAgent import TakPlayerAgent
+from agents.TakRolloutExecutor import TakRolloutExecutor, TakThreadRolloutExecutor
 from policies.Policy import Policy
 from policies.RandomPolicy import RandomPolicy
 from tak_env.TakAction import TakAction
 from tak_env.TakEnvironment import TakEnvironment
 from tak_env.TakPlayer import TakPlayer
 from tak_env.TakState import TakState
+from tak_env.TakSymmetry import TakSymmetry
+from utils.PackedTable import PackedTable
+from utils.SearchBudget import SearchBudget
 
 
 # NOTE: consider using only board as the elements of the MCTS graph
 
 class MCTSPlayerKnowledgeGraph(object):
-
-    def __init__(self, initial_state: TakState):
+    """
+    MCTSPlayerKnowledgeGraph class.
+    Graph of the states seen by the MCTS agents (with their visits and rewards), connected by the actions between them.
+    Alongside the igraph graph it keeps an index of state -> node id (states hash by their Zobrist key), so checking
+    whether a state is in the graph, finding its node and adding it take constant time regardless of the graph size.
+
+    With canonical_states, the nodes are keyed on (and store) the canonical form of the states (see TakSymmetry), so
+    rotated and mirrored versions of a position share their node. The actions of the edges are relative to the state
+    stored in their source node: add_state transforms the action when given the parent state, and state_action maps
+    the actions of a node back to any of the states of the node.
+
+    The visits and rewards of the nodes can be saved (see save_stats) and loaded into another graph (see load_stats)
+    to warm start its searches: the nodes of the saved states start with their saved stats. The edges are not saved,
+    they are added again as the searches expand the nodes.
+    """
+
+    def __init__(self, initial_state: TakState, canonical_states: bool = False):
         self.g = Graph(directed=True)
-        self.initial_state_node_id = self._add_state(initial_state)
+        self.node_ids: Dict[TakState, int] = {}
+        self.board_size: int = initial_state.board_size
+        self.canonical_states: bool = canonical_states
+        # Saved stats the nodes start with (see load_stats)
+        self.stats_base: Optional[PackedTable] = None
+        self.symmetry: Optional[TakSymmetry] = TakSymmetry.get(initial_state.board_size) if canonical_states else None
+        self.initial_state_node_id = self._add_state(self._node_state(initial_state))
 
     def get_root(self) -> Tuple[TakState, float, int]:
         return self.g.vs[self.initial_state_node_id]
 
     def state_in_graph(self, state: TakState) -> bool:
-        return state in self.g.vs['state']
+        return self._node_state(state) in self.node_ids
 
     def state_node_id(self, state: TakState) -> Optional[int]:
-        return self.g.vs.find(state=state).index if self.state_in_graph(state) else None
-
-    def _add_state(self, state: TakState) -> int:
-        node = self.g.add_vertex(state=state, visits=0, sum_reward=0)
+        return self.node_ids.get(self._node_state(state))
+
+    def _node_state(self, state: TakState) -> TakState:
+        return state if self.symmetry is None else self.symmetry.canonical(state)[0]
+
+    def state_action(self, state: TakState, action: Optional[TakAction]) -> Optional[TakAction]:
+        """
+        Returns the given action of the node of the given state (actions of the nodes are relative to the state stored
+        in the node, see get_state) as an action of the given state. Only differs when keying on canonical states.
+        :param state: the state
+        :param action: an action of the node of the state
+        :return: the action on the given state
+        """
+        if self.symmetry is None or action is None:
+            return action
+        return self.symmetry.transform_action(action, self.symmetry.inverse(self.symmetry.canonical_transform(state)))
+
+    def _add_state(self, node_state: TakState) -> int:
+        visits, sum_reward = 0, 0
+        if self.stats_base is not None:
+            i = self.stats_base.index(node_state.key)
+            if i is not None:
+                visits = int(self.stats_base.arrays['visits'][i])
+                sum_reward = float(self.stats_base.arrays['sum_reward'][i])
+        node = self.g.add_vertex(state=node_state, visits=visits, sum_reward=sum_reward)
+        self.node_ids[node_state] = node.index
         return node.index
 
     def add_state(self, parent: Union[int, TakState], state: TakState, action: TakAction) -> int:
-        parent_node_id = parent if isinstance(parent, int) else self.state_node_id(parent)
-        state_node_id = self.state_node_id(state) or self._add_state(state)
+        """
+        Adds the edge of the given action from the parent to the given state (adding the state if it is new)
+        :param parent: the node id of the parent (the action is relative to its stored state) or the parent state
+        :param state: the state the action leads to
+        :param action: the action
+        :return: the node id of the state
+        """
+        if isinstance(parent, int):
+            parent_node_id = parent
+        else:
+            parent_node_id = self.state_node_id(parent)
+            if self.symmetry is not None:
+                action = self.symmetry.transform_action(action, self.symmetry.canonical_transform(parent))
+        node_state = self._node_state(state)
+        state_node_id = self.node_ids.get(node_state)
+        if state_node_id is None:
+            state_node_id = self._add_state(node_state)
         self.g.add_edge(parent_node_id, state_node_id, action=action)
         return state_node_id
 
@@ -44,22 +106,89 @@ class MCTSPlayerKnowledgeGraph(object):
         return self.add_state(parent, action.take(parent, mutate=False), action)
 
     def add_visit(self, state: Union[int, TakState], reward: float, backpropagate: bool = True) -> None:
+        self.add_visits(state, [reward], backpropagate)
+
+    def add_visits(
+            self,
+            state: Union[int, TakState],
+            rewards: List[float],
+            backpropagate: bool = True,
+            max_depth: Optional[int] = None
+    ) -> None:
+        """
+        Adds a visit for each of the given rewards to the given node and (once per reward) to each of its ancestors
+        :param state: the node id or the state
+        :param rewards: the rewards of the visits
+        :param backpropagate: whether to also add the visits to the ancestors of the node
+        :param max_depth: if given, only add the visits to the ancestors up to this many edges away from the node
+        """
         state_node_id = state if isinstance(state, int) else self.state_node_id(state)
-        self.g.vs[state_node_id]['visits'] += 1
-        self.g.vs[state_node_id]['sum_reward'] += reward
+        node_ids = [state_node_id]
         if backpropagate:
-            self._backpropagate_visit(state_node_id, reward, set())
-
-    def _backpropagate_visit(self, state_id: int, reward: float, visited: Set[int]) -> None:
-        for edge_index in self.g.incident(state_id, mode='IN'):
-            parent_index = self.g.es[edge_index].source
-            if parent_index not in visited:
-                visited.add(parent_index)
-                self.add_visit(parent_index, reward, False)
-                self._backpropagate_visit(parent_index, reward, visited)
+            node_ids.extend(self.get_ancestors(state_node_id, max_depth))
+        self._add_visits_to_nodes(node_ids, len(rewards), sum(rewards))
+
+    def add_path_visits(self, path: List[int], rewards: List[float]) -> None:
+        """
+        Adds a visit for each of the given rewards to each node of the given path (once per node)
+        :param path: the node ids from the root of the search to the expanded node
+        :param rewards: the rewards of the visits
+        """
+        self._add_visits_to_nodes(list(dict.fromkeys(path)), len(rewards), sum(rewards))
+
+    def _add_visits_to_nodes(self, node_ids: List[int], visits: int, sum_reward: float) -> None:
+        nodes = self.g.vs.select(node_ids)
+        nodes['visits'] = [node_visits + visits for node_visits in nodes['visits']]
+        nodes['sum_reward'] = [node_sum_reward + sum_reward for node_sum_reward in nodes['sum_reward']]
+
+    def get_ancestors(self, state_node_id: int, max_depth: Optional[int] = None) -> List[int]:
+        """
+        Returns the ids of all the nodes the given node can be reached from (each one once)
+        :param state_node_id: the id of the node
+        :param max_depth: if given, only the nodes up to this many edges away from the node
+        :return: list of node ids
+        """
+        ancestors, visited = [], set()
+        frontier, depth = [state_node_id], 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for node_id in frontier:
+                for parent_node_id in self.g.predecessors(node_id):
+                    if parent_node_id not in visited:
+                        visited.add(parent_node_id)
+                        next_frontier.append(parent_node_id)
+            ancestors.extend(next_frontier)
+            frontier = next_frontier
+        return ancestors
 
     def get_state_node(self, state: TakState) -> Optional[Vertex]:
-        return self.g.vs.find(state=state) if self.state_in_graph(state) else None
+        state_node_id = self.state_node_id(state)
+        return self.g.vs[state_node_id] if state_node_id is not None else None
+
+    def get_state(self, state_node_id: int) -> TakState:
+        return self.g.vs[state_node_id]['state']
+
+    def get_children(self, state: Union[int, TakState]) -> List[Tuple[TakAction, int]]:
+        state_node_id = state if isinstance(state, int) else self.state_node_id(state)
+        return [(out_edge['action'], out_edge.target) for out_edge in self.g.vs[state_node_id].out_edges()]
+
+    def get_best_child_action(self, state: Union[int, TakState], maximize: bool = True) -> Optional[TakAction]:
+        """
+        Returns the action leading to the child with the highest (or lowest) value, the first one on ties
+        :param state: the node id or the state
+        :param maximize: whether to pick the highest value (or the lowest)
+        :return: the action, or None if the node has no children
+        """
+        best_action_value = -float('inf') if maximize else float('inf')
+        best_action = None
+        for action, target in self.get_children(state):
+            if action:
+                action_value = self.get_state_value(target)
+                if (action_value > best_action_value) if maximize else (action_value < best_action_value):
+                    best_action_value = action_value
+                    best_action = action
+        return best_action
 
     def get_state_value(self, state: Union[int, TakState]) -> float:
         state_node_id = state if isinstance(state, int) else self.state_node_id(state)
@@ -75,10 +204,55 @@ class MCTSPlayerKnowledgeGraph(object):
         return sum(self.g.vs['visits'])
 
 
+    def save_stats(self, path: str) -> None:
+        """
+        Saves the visits and total reward of every node (merged with the loaded stats of the states that are not in
+        the graph) to the given directory, as a PackedTable keyed by the Zobrist keys of the states of the nodes.
+        The edges are not saved.
+        :param path: the directory to save the stats to (it can be the one they were loaded from)
+        """
+        PackedTable.save(
+            path,
+            np.array([state.key for state in self.g.vs['state']], dtype=np.uint64),
+            {
+                'visits': np.array(self.g.vs['visits'], dtype=np.int64),
+                'sum_reward': np.array(self.g.vs['sum_reward'], dtype=np.float64)
+            },
+            meta={'board_size': self.board_size, 'canonical_states': self.canonical_states},
+            base=self.stats_base
+        )
+        self.stats_base = PackedTable.load(path, mmap=self.stats_base.mmap if self.stats_base is not None else True)
+
+    def load_stats(self, path: str, mmap: bool = True) -> None:
+        """
+        Warm starts the graph with the stats saved to the given directory (see save_stats): the nodes of the saved
+        states get their saved visits and total reward, now for the ones in the graph and when added for the rest
+        :param path: the directory the stats were saved to
+        :param mmap: whether to memory map the saved stats instead of reading them into memory
+        :raises ValueError: if the stats were saved by a graph of another board size or keying
+        """
+        stats_base = PackedTable.load(path, mmap=mmap)
+        if stats_base.meta['board_size'] != self.board_size or \
+                stats_base.meta['canonical_states'] != self.canonical_states:
+            raise ValueError(f"The stats in {path} are of another board size or keying: {stats_base.meta}")
+        self.stats_base = stats_base
+        indices = stats_base.indices(np.array([state.key for state in self.g.vs['state']], dtype=np.uint64))
+        for node_id in np.flatnonzero(indices >= 0):
+            node = self.g.vs[int(node_id)]
+            node['visits'] = int(stats_base.arrays['visits'][indices[node_id]])
+            node['sum_reward'] = float(stats_base.arrays['sum_reward'][indices[node_id]])
+
+
 class TakMCTSPlayerAgent(TakPlayerAgent):
 
     max_parallel_rollouts_threads: int = 16
 
+    # How rollout results are backed up:
+    #   - 'dag': to the expanded node and every node it can be reached from in the graph
+    #   - 'path': only to the nodes on the path taken from the searched state to the expanded node
+    #   - 'bounded': like 'dag', but only to the nodes up to backup_depth edges away from the expanded node
+    backup_modes = ['dag', 'path', 'bounded']
+
     @classmethod
     def default_rollout_policy(cls):
         return RandomPolicy()
@@ -87,73 +261,113 @@ class TakMCTSPlayerAgent(TakPlayerAgent):
             self,
             env: TakEnvironment,
             player: TakPlayer,
-            graph: MCTSPlayerKnowledgeGraph,
+            graph: Union[MCTSPlayerKnowledgeGraph, MCTSPlayerArrayKnowledgeGraph],
             rollout_policy: Optional[Policy] = None,
             mcts_expansion_depth: int = 3,
             mcts_expansion_epsilon: float = 0.5,
             mcts_iterations: int = 10,
             rollout_runs: int = 10,
             parallel_rollouts: bool = True,
+            backup_mode: str = 'dag',
+            backup_depth: int = 3,
+            rollout_executor: Optional[TakRolloutExecutor] = None,
+            time_budget_ms: Optional[float] = None,
+            node_budget: Optional[int] = None,
     ):
         super().__init__(player)
         self.env: TakEnvironment = env
         self.player: TakPlayer = player
-        self.graph: MCTSPlayerKnowledgeGraph = graph
+        self.graph: Union[MCTSPlayerKnowledgeGraph, MCTSPlayerArrayKnowledgeGraph] = graph
         self.rollout_policy: Policy = rollout_policy or TakMCTSPlayerAgent.default_rollout_policy()
         self.mcts_expansion_depth: int = mcts_expansion_depth
         self.mcts_expansion_epsilon: float = mcts_expansion_epsilon
         self.mcts_iterations: int = mcts_iterations
         self.rollout_runs: int = rollout_runs
         self.parallel_rollouts: bool = parallel_rollouts if self.rollout_runs > 1 else False
-        self.parallel_rollouts_threads = max(self.rollout_runs, self.__class__.max_parallel_rollouts_threads)
+        self.parallel_rollouts_threads = min(self.rollout_runs, self.__class__.max_parallel_rollouts_threads)
+        if backup_mode not in self.__class__.backup_modes:
+            raise ValueError(f"Unknown backup mode: {backup_mode} (expected one of {self.__class__.backup_modes})")
+        self.backup_mode: str = backup_mode
+        self.backup_depth: int = backup_depth
+        if rollout_executor is None:
+            rollout_executor = TakThreadRolloutExecutor(self.parallel_rollouts_threads) if self.parallel_rollouts \
+                else TakRolloutExecutor()
+        self.rollout_executor: TakRolloutExecutor = rollout_executor
+        # If given, each search runs until the time (ms) or number of new graph nodes runs out (instead of running
+        # mcts_iterations iterations)
+        self.time_budget_ms: Optional[float] = time_budget_ms
+        self.node_budget: Optional[int] = node_budget
+        # Iterations, rollouts, new graph nodes and time (ms) of the last search
+        self.last_search_stats: Dict[str, float] = {}
 
     def select_action(self, state: TakState) -> TakAction:
         # SELECTION?
         state = state.copy()
-        root_node = self.graph.get_state_node(state)
-        for i in range(self.mcts_iterations):
+        root_node_id = self.graph.state_node_id(state)
+        self.search(state, self.mcts_iterations)
+        return self.graph.state_action(state, self.get_best_action(root_node_id))
+
+    def search(self, state: TakState, iterations: int) -> None:
+        """
+        Runs the given number of MCTS iterations from the given state, updating the graph.
+        If the agent has a time or node budget, runs iterations until it runs out instead (checked between iterations,
+        and always running at least one).
+        :param state: the state to search from
+        :param iterations: the number of iterations
+        """
+        budget = SearchBudget(self.time_budget_ms, self.node_budget).start()
+        initial_nodes = self.graph.total_nodes()
+        completed_iterations, rollouts = 0, 0
+        while (not budget.exhausted() or completed_iterations == 0) if budget.is_limited() \
+                else completed_iterations < iterations:
             # EXPANSION
-            expansion_leaf_state = self.expand(state)
+            expansion_leaf_state, expansion_path = self.expand_path(state)
 
             # SIMULATION
             rewards = self.rollout(expansion_leaf_state)
 
             # BACKUP
-            self.backup(expansion_leaf_state, rewards)
-        return self.get_best_action(root_node)
+            self.backup(expansion_leaf_state, rewards, expansion_path)
 
-    def get_best_black_action(self, root_node: Vertex) -> Optional[TakAction]:
-        best_action_value = float('inf')
-        best_action = None
-        for out_edge in root_node.out_edges():
-            if out_edge['action']:
-                action_value = self.graph.get_state_value(out_edge.target)
-                if action_value < best_action_value:
-                    best_action_value = action_value
-                    best_action = out_edge['action']
-        return best_action
+            completed_iterations += 1
+            rollouts += len(rewards)
+            budget.nodes = self.graph.total_nodes() - initial_nodes
 
-    def get_best_white_action(self, root_node: Vertex) -> Optional[TakAction]:
-        best_action_value = -float('inf')
-        best_action = None
-        for out_edge in root_node.out_edges():
-            if out_edge['action']:
-                action_value = self.graph.get_state_value(out_edge.target)
-                if action_value > best_action_value:
-                    best_action_value = action_value
-                    best_action = out_edge['action']
-        return best_action
+        self.last_search_stats = {
+            'iterations': completed_iterations,
+            'rollouts': rollouts,
+            'nodes': budget.nodes,
+            'time_ms': budget.elapsed_ms(),
+        }
 
-    def get_best_action(self, root_node: Vertex) -> Optional[TakAction]:
-        best_action = self.get_best_white_action(root_node) if self.player == TakPlayer.WHITE \
-            else self.get_best_black_action(root_node)
+    def get_best_black_action(self, root_node_id: int) -> Optional[TakAction]:
+        return self.graph.get_best_child_action(root_node_id, maximize=False)
+
+    def get_best_white_action(self, root_node_id: int) -> Optional[TakAction]:
+        return self.graph.get_best_child_action(root_node_id, maximize=True)
+
+    def get_best_action(self, root_node_id: int) -> Optional[TakAction]:
+        best_action = self.get_best_white_action(root_node_id) if self.player == TakPlayer.WHITE \
+            else self.get_best_black_action(root_node_id)
         if best_action is not None:
             return best_action
-        possible_actions = TakAction.get_possible_actions(root_node['state'])
+        possible_actions = TakAction.get_possible_actions(self.graph.get_state(root_node_id))
         return np.random.choice(possible_actions)
 
     def expand(self, state: TakState) -> TakState:
+        return self.expand_path(state)[0]
+
+    def expand_path(self, state: TakState) -> Tuple[TakState, List[int]]:
+        """
+        Expands the graph from the given state
+        :param state: the state to expand from
+        :return: the expanded state, and the node ids of the states on the path to it (starting with the given one)
+        """
         current_state, was_in_graph, depth = state, self.graph.state_in_graph(state), 0
+        path = [self.graph.state_node_id(state)]
+        if self.graph.canonical_states and path[0] is not None:
+            # The actions of the nodes are relative to their stored (canonical) states, so walk those
+            current_state = self.graph.get_state(path[0])
         while not current_state.is_terminal()[0] and (was_in_graph or depth < self.mcts_expansion_depth):
             depth += 1  # Increment expanded depth
 
@@ -162,20 +376,19 @@ class TakMCTSPlayerAgent(TakPlayerAgent):
                 possible_actions = TakAction.get_possible_actions(current_state)
                 action = np.random.choice(possible_actions)
             else:  # Greedy
-                action = self.get_best_action(self.graph.get_state_node(current_state))
+                action = self.get_best_action(path[-1])
 
             next_state = action.take(current_state, mutate=False)
-            was_in_graph = self.graph.state_in_graph(next_state)
+            next_state_node_id = self.graph.state_node_id(next_state)
+            was_in_graph = next_state_node_id is not None
             if not was_in_graph:
-                self.graph.add_state(current_state, next_state, action)
-            current_state = next_state
-        return current_state
+                next_state_node_id = self.graph.add_state(path[-1], next_state, action)
+            path.append(next_state_node_id)
+            current_state = self.graph.get_state(next_state_node_id) if self.graph.canonical_states else next_state
+        return current_state, path
 
     def rollout(self, leaf: TakState) -> List[float]:
-        if self.parallel_rollouts:
-            return self._rollout_parallel(leaf)
-        else:
-            return [self._rollout_single(leaf) for _ in range(self.rollout_runs)]
+        return self.rollout_executor.rollout(self, leaf, self.rollout_runs)
 
     def _rollout_single(self, leaf: TakState) -> float:
         env = self.env.get_copy_at_state(leaf)
@@ -184,22 +397,26 @@ class TakMCTSPlayerAgent(TakPlayerAgent):
         while not done:
             possible_actions = TakAction.get_possible_actions(state)
             action = self.rollout_policy.select_action(state, possible_actions)
-            next_state, reward, done, info = env.step(action)
+            # The environment has its own copy of the leaf, so the rollout plays on it in place
+            next_state, reward, done, info = env.step(action, mutate=True)
             state = next_state
         return abs(reward) * (1.0 if info['winning_player'] == self.player else -1.0)
 
-    def _rollout_parallel(self, leaf: TakState, threads: int = 10) -> List[float]:
-        with ThreadPoolExecutor(max_workers=threads) as executor:
-            futures = [executor.submit(self._rollout_single, leaf) for _ in range(self.rollout_runs)]
-            return [future.result() for future in futures]
-
     def _compute_score_for_terminal_state(self, state: TakState, info) -> float:
         current_player = state.current_player.other()
         winning_player = info["winning_player"]
         return self.env.compute_score(current_player, winning_player, discount=True)
 
-    def backup(self, expansion_end_state: TakState, rewards: List[float]) -> None:
-        for reward in rewards:
-            self.graph.add_visit(expansion_end_state, reward, backpropagate=True)
+    def backup(
+            self,
+            expansion_end_state: TakState,
+            rewards: List[float],
+            expansion_path: Optional[List[int]] = None
+    ) -> None:
+        if self.backup_mode == 'path' and expansion_path is not None:
+            self.graph.add_path_visits(expansion_path, rewards)
+        else:
+            max_depth = self.backup_depth if self.backup_mode == 'bounded' else None
+            self.graph.add_visits(expansion_end_state, rewards, backpropagate=True, max_depth=max_depth)
 
 
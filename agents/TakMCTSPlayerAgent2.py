@@ -1,15 +1,16 @@
-from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple, Union, Set, List
 
 import numpy as np
-from igraph import Vertex
 
+from agents.MCTSPlayerArrayKnowledgeGraph import MCTSPlayerArrayKnowledgeGraph
 from agents.TakMCTSPlayerAgent import MCTSPlayerKnowledgeGraph
 from agents.TakPlayerAgent import TakPlayerAgent
+from agents.TakRolloutExecutor import TakRolloutExecutor, TakThreadRolloutExecutor
 from policies.EGreedyPolicy import EGreedyPolicy
 from policies.RandomPolicyEff import RandomPolicyEff
 from tak_env.TakAction import TakAction, TakActionPlace
 from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakMoveGenerator import TakMoveGenerator
 from tak_env.TakPlayer import TakPlayer
 from tak_env.TakState import TakState
 
@@ -18,6 +19,12 @@ class TakMCTSPlayerAgent2(TakPlayerAgent):
 
     max_parallel_rollouts_threads: int = 16
 
+    # How rollout results are backed up:
+    #   - 'dag': to the expanded node and every node it can be reached from in the graph
+    #   - 'path': only to the nodes on the path taken from the searched state to the expanded node
+    #   - 'bounded': like 'dag', but only to the nodes up to backup_depth edges away from the expanded node
+    backup_modes = ['dag', 'path', 'bounded']
+
     @classmethod
     def default_rollout_policy(cls, board_size: int = 19) -> Union[RandomPolicyEff, EGreedyPolicy]:
         return RandomPolicyEff(board_size)
@@ -26,18 +33,21 @@ class TakMCTSPlayerAgent2(TakPlayerAgent):
             self,
             env: TakEnvironment,
             player: TakPlayer,
-            graph: MCTSPlayerKnowledgeGraph,
+            graph: Union[MCTSPlayerKnowledgeGraph, MCTSPlayerArrayKnowledgeGraph],
             rollout_policy: Union[RandomPolicyEff, EGreedyPolicy] = None,
             mcts_expansion_depth: int = 3,
             mcts_expansion_epsilon: float = 0.5,
             mcts_iterations: int = 10,
             rollout_runs: int = 10,
             parallel_rollouts: bool = True,
+            backup_mode: str = 'dag',
+            backup_depth: int = 3,
+            rollout_executor: Optional[TakRolloutExecutor] = None,
     ):
         super().__init__(player)
         self.env: TakEnvironment = env
         self.player: TakPlayer = player
-        self.graph: MCTSPlayerKnowledgeGraph = graph
+        self.graph: Union[MCTSPlayerKnowledgeGraph, MCTSPlayerArrayKnowledgeGraph] = graph
         self.rollout_policy: Union[RandomPolicyEff, EGreedyPolicy] = \
             rollout_policy or TakMCTSPlayerAgent2.default_rollout_policy(env.board_size)
         self.mcts_expansion_depth: int = mcts_expansion_depth
@@ -45,61 +55,61 @@ class TakMCTSPlayerAgent2(TakPlayerAgent):
         self.mcts_iterations: int = mcts_iterations
         self.rollout_runs: int = rollout_runs
         self.parallel_rollouts: bool = parallel_rollouts if self.rollout_runs > 1 else False
-        self.parallel_rollouts_threads = max(self.rollout_runs, self.__class__.max_parallel_rollouts_threads)
-
-        self.first_actions = {
-            TakPlayer.WHITE: TakAction.get_first_actions(self.env.board_size, TakPlayer.WHITE),
-            TakPlayer.BLACK: TakAction.get_first_actions(self.env.board_size, TakPlayer.BLACK)
-        }
-        self.all_actions = TakAction.get_all_actions(self.env.board_size)
+        self.parallel_rollouts_threads = min(self.rollout_runs, self.__class__.max_parallel_rollouts_threads)
+        if backup_mode not in self.__class__.backup_modes:
+            raise ValueError(f"Unknown backup mode: {backup_mode} (expected one of {self.__class__.backup_modes})")
+        self.backup_mode: str = backup_mode
+        self.backup_depth: int = backup_depth
+        if rollout_executor is None:
+            rollout_executor = TakThreadRolloutExecutor(self.parallel_rollouts_threads) if self.parallel_rollouts \
+                else TakRolloutExecutor()
+        self.rollout_executor: TakRolloutExecutor = rollout_executor
+
+        self.move_generator = TakMoveGenerator.get(self.env.board_size)
 
     def select_action(self, state: TakState) -> TakAction:
         # SELECTION?
         state = state.copy()
-        root_node = self.graph.get_state_node(state)
+        root_node_id = self.graph.state_node_id(state)
         for i in range(self.mcts_iterations):
             # EXPANSION
-            expansion_leaf_state = self.expand(state)
+            expansion_leaf_state, expansion_path = self.expand_path(state)
 
             # SIMULATION
             rewards = self.rollout(expansion_leaf_state)
 
             # BACKUP
-            self.backup(expansion_leaf_state, rewards)
-        return self.get_best_action(root_node)
-
-    def get_best_black_action(self, root_node: Vertex) -> Optional[TakAction]:
-        best_action_value = float('inf')
-        best_action = None
-        for out_edge in root_node.out_edges():
-            if out_edge['action']:
-                action_value = self.graph.get_state_value(out_edge.target)
-                if action_value < best_action_value:
-                    best_action_value = action_value
-                    best_action = out_edge['action']
-        return best_action
-
-    def get_best_white_action(self, root_node: Vertex) -> Optional[TakAction]:
-        best_action_value = -float('inf')
-        best_action = None
-        for out_edge in root_node.out_edges():
-            if out_edge['action']:
-                action_value = self.graph.get_state_value(out_edge.target)
-                if action_value > best_action_value:
-                    best_action_value = action_value
-                    best_action = out_edge['action']
-        return best_action
-
-    def get_best_action(self, root_node: Vertex) -> Optional[TakAction]:
-        best_action = self.get_best_white_action(root_node) if self.player == TakPlayer.WHITE \
-            else self.get_best_black_action(root_node)
+            self.backup(expansion_leaf_state, rewards, expansion_path)
+        return self.graph.state_action(state, self.get_best_action(root_node_id))
+
+    def get_best_black_action(self, root_node_id: int) -> Optional[TakAction]:
+        return self.graph.get_best_child_action(root_node_id, maximize=False)
+
+    def get_best_white_action(self, root_node_id: int) -> Optional[TakAction]:
+        return self.graph.get_best_child_action(root_node_id, maximize=True)
+
+    def get_best_action(self, root_node_id: int) -> Optional[TakAction]:
+        best_action = self.get_best_white_action(root_node_id) if self.player == TakPlayer.WHITE \
+            else self.get_best_black_action(root_node_id)
         if best_action is not None:
             return best_action
-        possible_actions, weights = self.get_actions_and_weights(root_node['state'])
+        possible_actions, weights = self.get_actions_and_weights(self.graph.get_state(root_node_id))
         return np.random.choice(possible_actions, p=weights)
 
     def expand(self, state: TakState) -> TakState:
+        return self.expand_path(state)[0]
+
+    def expand_path(self, state: TakState) -> Tuple[TakState, List[int]]:
+        """
+        Expands the graph from the given state
+        :param state: the state to expand from
+        :return: the expanded state, and the node ids of the states on the path to it (starting with the given one)
+        """
         current_state, was_in_graph, depth = state, self.graph.state_in_graph(state), 0
+        path = [self.graph.state_node_id(state)]
+        if self.graph.canonical_states and path[0] is not None:
+            # The actions of the nodes are relative to their stored (canonical) states, so walk those
+            current_state = self.graph.get_state(path[0])
         while not current_state.is_terminal()[0] and (was_in_graph or depth < self.mcts_expansion_depth):
             depth += 1  # Increment expanded depth
 
@@ -108,80 +118,76 @@ class TakMCTSPlayerAgent2(TakPlayerAgent):
                 actions, weights = self.get_actions_and_weights(current_state)
                 action = np.random.choice(actions, p=weights)
             else:  # Greedy
-                action = self.get_best_action(self.graph.get_state_node(current_state))
+                action = self.get_best_action(path[-1])
 
             next_state = action.take(current_state, mutate=False)
-            was_in_graph = self.graph.state_in_graph(next_state)
+            next_state_node_id = self.graph.state_node_id(next_state)
+            was_in_graph = next_state_node_id is not None
             if not was_in_graph:
-                self.graph.add_state(current_state, next_state, action)
-            current_state = next_state
-        return current_state
+                next_state_node_id = self.graph.add_state(path[-1], next_state, action)
+            path.append(next_state_node_id)
+            current_state = self.graph.get_state(next_state_node_id) if self.graph.canonical_states else next_state
+        return current_state, path
 
     def rollout(self, leaf: TakState) -> List[float]:
-        if self.parallel_rollouts:
-            return self._rollout_parallel(leaf)
-        else:
-            return [self._rollout_single(leaf) for _ in range(self.rollout_runs)]
+        return self.rollout_executor.rollout(self, leaf, self.rollout_runs)
 
     def _rollout_single(self, leaf: TakState) -> float:
         env = self.env.get_copy_at_state(leaf)
         done, info = leaf.is_terminal()
         state, reward = leaf, 0.0 if not done else self._compute_score_for_terminal_state(leaf, info)
 
-        prev_step_first: Optional[Tuple[TakState, TakAction, float]] = None
-        prev_step_second: Optional[Tuple[TakState, TakAction, float]] = None
-        on_first = True
+        # EGreedyPolicy rollout policies get the SARSA updates of the rollout in one batch at the end, as (Q key,
+        # reward) of each step (see EGreedyPolicy.update_batch)
+        learns = isinstance(self.rollout_policy, EGreedyPolicy)
+        steps: List[Tuple[Tuple[int, int], float]] = []
         while not done:
             action = self.rollout_policy.select_action(state, None)
-            prev_step = prev_step_first if on_first else prev_step_second
-            if prev_step is not None:  # update from prev step
-                prev_state, prev_action, prev_reward = prev_step
-                self.rollout_policy.update(prev_state, prev_action, prev_reward, state, action)
-            next_state, reward, done, info = env.step(action)
-            if on_first:
-                prev_step_first = (state, action, reward)
-            else:
-                prev_step_second = (state, action, reward)
-            state = next_state
-        prev_step = prev_step_first if on_first else prev_step_second
-        if prev_step is not None:  # update from prev step
-            prev_state, prev_action, prev_reward = prev_step
-            self.rollout_policy.update(prev_state, prev_action, prev_reward, state, action)
+            if learns:
+                key = self.rollout_policy.q_key(state, action)
+            state, reward, done, info = env.step(action)
+            if learns:
+                steps.append((key, reward))
+        if len(steps) > 0:
+            # The last step bootstraps from the Q value of its own action on the terminal state
+            keys = np.array([key for key, _ in steps] + [self.rollout_policy.q_key(state, action)], dtype=np.uint64)
+            self.rollout_policy.update_batch(
+                keys[:-1, 0], keys[:-1, 1].astype(np.int64), np.array([step_reward for _, step_reward in steps]),
+                keys[1:, 0], keys[1:, 1].astype(np.int64)
+            )
         return abs(reward) * (1.0 if info['winning_player'] == self.player else -1.0)
 
-    def _rollout_parallel(self, leaf: TakState, threads: int = 10) -> List[float]:
-        with ThreadPoolExecutor(max_workers=threads) as executor:
-            futures = [executor.submit(self._rollout_single, leaf) for _ in range(self.rollout_runs)]
-            return [future.result() for future in futures]
-
     def _compute_score_for_terminal_state(self, state: TakState, info) -> float:
         current_player = state.current_player.other()
         winning_player = info["winning_player"]
         return self.env.compute_score(current_player, winning_player, discount=True)
 
-    def backup(self, expansion_end_state: TakState, rewards: List[float]) -> None:
-        for reward in rewards:
-            self.graph.add_visit(expansion_end_state, reward, backpropagate=True)
+    def backup(
+            self,
+            expansion_end_state: TakState,
+            rewards: List[float],
+            expansion_path: Optional[List[int]] = None
+    ) -> None:
+        if self.backup_mode == 'path' and expansion_path is not None:
+            self.graph.add_path_visits(expansion_path, rewards)
+        else:
+            max_depth = self.backup_depth if self.backup_mode == 'bounded' else None
+            self.graph.add_visits(expansion_end_state, rewards, backpropagate=True, max_depth=max_depth)
 
     def get_actions_and_weights(
             self,
             current_state: TakState,
             place_action_prob: float = 0.5
     ) -> Tuple[List[TakAction], np.ndarray]:
-        actions = self.all_actions if not current_state.first_action() \
-            else self.first_actions[current_state.current_player]
+        actions = self.move_generator.legal_actions(current_state)
 
         weights = np.zeros(len(actions))
         valid_place_actions, valid_move_actions = [], []
         for i, action in enumerate(actions):
-            # is valid?
-            if action.is_valid(current_state):
-                if isinstance(action, TakActionPlace):
-                    valid_place_actions.append(i)
-                else:
-                    valid_move_actions.append(i)
+            if isinstance(action, TakActionPlace):
+                valid_place_actions.append(i)
             else:
-                weights[i] = 0
+                valid_move_actions.append(i)
 
         if len(valid_move_actions) == 0:
             place_action_prob = 1.0
@@ -0,0 +1,254 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from os import cpu_count
+from typing import Optional, Tuple, List, Dict
+
+import numpy as np
+
+from agents.MCTSPlayerArrayKnowledgeGraph import MCTSPlayerArrayKnowledgeGraph
+from agents.TakMCTSPlayerAgent import TakMCTSPlayerAgent
+from agents.TakRolloutExecutor import TakRolloutExecutor, TakProcessRolloutExecutor
+from policies.Policy import Policy
+from tak_env.TakAction import TakAction, TakActionTable
+from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+from utils.SearchBudget import SearchBudget
+
+
+# Per process state of the root parallel search workers
+_worker_agent: Optional[TakMCTSPlayerAgent] = None
+
+
+def _init_search_worker(env: TakEnvironment, player: TakPlayer, rollout_policy: Policy, agent_kwargs: dict) -> None:
+    global _worker_agent
+    _worker_agent = TakMCTSPlayerAgent(
+        env, player, None, rollout_policy=rollout_policy, parallel_rollouts=False, **agent_kwargs
+    )
+
+
+def _search_root(
+        state_tuple: Tuple,
+        iterations: int,
+        seed: int
+) -> Tuple[int, float, List[Tuple[int, int, float]], Dict[str, float]]:
+    np.random.seed(seed)
+    board_class = TakEnvironment.board_engines[_worker_agent.env.board_engine]
+    state = TakState.from_tuple(state_tuple, board_class)
+    graph = MCTSPlayerArrayKnowledgeGraph(state)
+    _worker_agent.graph = graph
+    _worker_agent.search(state, iterations)
+
+    root_node_id = graph.initial_state_node_id
+    children_stats = {}
+    for action, child_node_id in graph.get_children(root_node_id):
+        if action not in children_stats:
+            children_stats[action] = (int(graph.visits[child_node_id]), float(graph.sum_reward[child_node_id]))
+    return int(graph.visits[root_node_id]), float(graph.sum_reward[root_node_id]), [
+        (graph.action_table.id_of(action), visits, sum_reward)
+        for action, (visits, sum_reward) in children_stats.items()
+    ], _worker_agent.last_search_stats
+
+
+class TakParallelMCTSPlayerAgent(TakMCTSPlayerAgent):
+    """
+    TakParallelMCTSPlayerAgent class.
+    MCTS agent that runs the whole select/expand/simulate/backup loop in parallel on a pool of worker processes:
+        - 'root' parallelism: each worker searches its own tree from the current state (with its share of the
+          iterations); the statistics of the children of the root are then merged into the graph of the agent
+        - 'tree' parallelism: the agent selects and expands on its (shared) graph and the workers simulate. Up to one
+          simulation per worker runs at a time; the nodes on the path of each running simulation get a virtual loss
+          so the next selections go down other branches, which is replaced by the real rewards when it finishes.
+    Worker i seeds its random number generator with `seed + i` (plus an offset for each search); in tree mode each
+    simulation is seeded with `seed` plus its number. The graph must be a MCTSPlayerArrayKnowledgeGraph.
+
+    In root mode the workers use copies of the rollout policy, so policies that learn during rollouts do not learn
+    from the parallel searches.
+
+    With a time budget, every worker (root mode) or the agent (tree mode, checked before starting each simulation)
+    searches until it runs out; a node budget is split between the workers in root mode.
+    """
+
+    parallel_modes = ['root', 'tree']
+
+    def __init__(
+            self,
+            env: TakEnvironment,
+            player: TakPlayer,
+            graph: Optional[MCTSPlayerArrayKnowledgeGraph],
+            rollout_policy: Optional[Policy] = None,
+            mcts_expansion_depth: int = 3,
+            mcts_expansion_epsilon: float = 0.5,
+            mcts_iterations: int = 10,
+            rollout_runs: int = 10,
+            backup_mode: str = 'dag',
+            backup_depth: int = 3,
+            parallel_mode: str = 'root',
+            workers: Optional[int] = None,
+            virtual_loss: float = 1.0,
+            seed: int = 0,
+            time_budget_ms: Optional[float] = None,
+            node_budget: Optional[int] = None,
+    ):
+        super().__init__(
+            env,
+            player,
+            graph,
+            rollout_policy=rollout_policy,
+            mcts_expansion_depth=mcts_expansion_depth,
+            mcts_expansion_epsilon=mcts_expansion_epsilon,
+            mcts_iterations=mcts_iterations,
+            rollout_runs=rollout_runs,
+            parallel_rollouts=False,
+            backup_mode=backup_mode,
+            backup_depth=backup_depth,
+            rollout_executor=TakRolloutExecutor(),
+            time_budget_ms=time_budget_ms,
+            node_budget=node_budget,
+        )
+        if parallel_mode not in self.__class__.parallel_modes:
+            raise ValueError(
+                f"Unknown parallel mode: {parallel_mode} (expected one of {self.__class__.parallel_modes})"
+            )
+        if workers is not None and workers < 1:
+            raise ValueError(f"The number of workers must be at least 1 (got {workers})")
+        self.parallel_mode: str = parallel_mode
+        self.workers: int = workers or cpu_count() or 1
+        self.virtual_loss: float = virtual_loss
+        self.seed: int = seed
+
+        self.searches: int = 0
+        self.simulations: int = 0
+        self._search_executor: Optional[ProcessPoolExecutor] = None
+        self._simulation_executor: Optional[TakProcessRolloutExecutor] = None
+
+    def select_action(self, state: TakState) -> TakAction:
+        state = state.copy()
+        root_node_id = self.graph.state_node_id(state)
+        # The actions of the nodes are relative to their stored states (which differ when keying on canonical states)
+        root_state = self.graph.get_state(root_node_id)
+        if self.parallel_mode == 'root':
+            self.search_root_parallel(root_state, self.mcts_iterations)
+        else:
+            self.search_tree_parallel(root_state, self.mcts_iterations)
+        self.searches += 1
+        return self.graph.state_action(state, self.get_best_action(root_node_id))
+
+    def search_root_parallel(self, state: TakState, iterations: int) -> None:
+        """
+        Runs the given number of MCTS iterations from the given state, split between independent trees on the
+        workers, and merges the statistics of the children of the root into the graph
+        :param state: the state to search from
+        :param iterations: the total number of iterations
+        """
+        if self._search_executor is None:
+            self._search_executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_search_worker,
+                initargs=(self.env, self.player, self.rollout_policy, {
+                    'mcts_expansion_depth': self.mcts_expansion_depth,
+                    'mcts_expansion_epsilon': self.mcts_expansion_epsilon,
+                    'rollout_runs': self.rollout_runs,
+                    'backup_mode': self.backup_mode,
+                    'backup_depth': self.backup_depth,
+                    'time_budget_ms': self.time_budget_ms,
+                    'node_budget': None if self.node_budget is None else max(1, self.node_budget // self.workers),
+                })
+            )
+        start_time = time.perf_counter()
+        state_tuple = state.as_tuple()
+        worker_iterations = [len(split) for split in np.array_split(np.arange(iterations), self.workers)]
+        futures = [
+            self._search_executor.submit(
+                _search_root, state_tuple, worker_iteration, self.seed + self.searches * self.workers + worker_index
+            )
+            for worker_index, worker_iteration in enumerate(worker_iterations)
+            if worker_iteration > 0 or self.time_budget_ms is not None or self.node_budget is not None
+        ]
+
+        root_node_id = self.graph.state_node_id(state)
+        root_actions = {action for action, _ in self.graph.get_children(root_node_id)}
+        search_stats = {'iterations': 0, 'rollouts': 0, 'nodes': 0}
+        for future in futures:
+            root_visits, root_sum_reward, children_stats, worker_search_stats = future.result()
+            for stat in search_stats:
+                search_stats[stat] += worker_search_stats[stat]
+            self.graph.add_stats([root_node_id], root_visits, root_sum_reward)
+            for action_index, visits, sum_reward in children_stats:
+                action = self.graph.action_table.action(action_index)
+                child_state = action.take(state, mutate=False)
+                child_node_id = self.graph.state_node_id(child_state)
+                if child_node_id is None or action not in root_actions:
+                    child_node_id = self.graph.add_state(root_node_id, child_state, action)
+                    root_actions.add(action)
+                self.graph.add_stats([child_node_id], visits, sum_reward)
+        self.last_search_stats = dict(search_stats, time_ms=(time.perf_counter() - start_time) * 1000)
+
+    def search_tree_parallel(self, state: TakState, iterations: int) -> None:
+        """
+        Runs the given number of MCTS iterations from the given state on the graph, simulating on the workers
+        (using virtual loss to spread the running simulations over different branches)
+        :param state: the state to search from
+        :param iterations: the number of iterations
+        """
+        if self._simulation_executor is None:
+            self._simulation_executor = TakProcessRolloutExecutor(processes=self.workers)
+        executor = self._simulation_executor
+        # Makes the nodes look worse to get_best_action (which maximizes for white and minimizes for black)
+        virtual_loss = -self.virtual_loss if self.player == TakPlayer.WHITE else self.virtual_loss
+
+        budget = SearchBudget(self.time_budget_ms, self.node_budget).start()
+        initial_nodes = self.graph.total_nodes()
+        running: Dict[Future, Tuple[TakState, List[int], np.ndarray]] = {}
+        started, rollouts = 0, 0
+
+        def can_start() -> bool:
+            if budget.is_limited():
+                return started == 0 or not budget.exhausted()
+            return started < iterations
+
+        while can_start() or len(running) > 0:
+            while can_start() and len(running) < self.workers:
+                # SELECTION / EXPANSION
+                expansion_leaf_state, expansion_path = self.expand_path(state)
+                path_node_ids = np.unique(expansion_path)
+                self.graph.add_stats(path_node_ids, 1, virtual_loss)
+
+                # SIMULATION
+                future = executor.submit(
+                    self, expansion_leaf_state, self.rollout_runs, seed=self.seed + self.simulations
+                )
+                running[future] = (expansion_leaf_state, expansion_path, path_node_ids)
+                self.simulations += 1
+                started += 1
+                budget.nodes = self.graph.total_nodes() - initial_nodes
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                expansion_leaf_state, expansion_path, path_node_ids = running.pop(future)
+                self.graph.add_stats(path_node_ids, -1, -virtual_loss)
+
+                # BACKUP
+                rewards = executor.result(self, future)
+                self.backup(expansion_leaf_state, rewards, expansion_path)
+                rollouts += len(rewards)
+        executor.restart_if_stale()
+
+        self.last_search_stats = {
+            'iterations': started,
+            'rollouts': rollouts,
+            'nodes': self.graph.total_nodes() - initial_nodes,
+            'time_ms': budget.elapsed_ms(),
+        }
+
+    def close(self) -> None:
+        """
+        Stops the worker processes
+        """
+        if self._search_executor is not None:
+            self._search_executor.shutdown()
+            self._search_executor = None
+        if self._simulation_executor is not None:
+            self._simulation_executor.close()
+            self._simulation_executor = None
+
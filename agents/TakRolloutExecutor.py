@@ -0,0 +1,229 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from os import cpu_count
+from typing import Optional, Tuple, List, Dict, Any
+
+import numpy as np
+
+from policies.RandomPolicyEff import RandomPolicyEff
+from tak_env.TakBatchSimulator import TakBatchSimulator
+from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakScorer import TakScorerDefault
+from tak_env.TakState import TakState
+
+
+class TakRolloutExecutor(object):
+    """
+    TakRolloutExecutor class.
+    Runs the rollouts of an MCTS agent (TakMCTSPlayerAgent or TakMCTSPlayerAgent2) from a leaf state, using the
+    `_rollout_single` method of the agent.
+    This one runs them one after the other, in the calling thread.
+    """
+
+    def rollout(self, agent, leaf: TakState, runs: int) -> List[float]:
+        """
+        Runs the given number of rollouts from the given state
+        :param agent: the MCTS agent the rollouts are for
+        :param leaf: the state to start the rollouts from
+        :param runs: the number of rollouts
+        :return: the reward of each rollout
+        """
+        return [agent._rollout_single(leaf) for _ in range(runs)]
+
+    def close(self) -> None:
+        """
+        Releases the workers of the executor (if any)
+        """
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TakThreadRolloutExecutor(TakRolloutExecutor):
+    """
+    TakThreadRolloutExecutor class.
+    Runs the rollouts on a (persistent) pool of threads.
+    Rollouts are pure Python, so they do not run in parallel, but this lets policies share their updates immediately.
+    """
+
+    def __init__(self, threads: int = 10):
+        self.threads: int = threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def rollout(self, agent, leaf: TakState, runs: int) -> List[float]:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads)
+        futures = [self._executor.submit(agent._rollout_single, leaf) for _ in range(runs)]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class TakBatchRolloutExecutor(TakRolloutExecutor):
+    """
+    TakBatchRolloutExecutor class.
+    Runs all the rollouts of a leaf at once as a batch of random games in NumPy arrays (see TakBatchSimulator), instead
+    of one Python game loop per rollout.
+    The batch simulator samples actions like RandomPolicyEff and scores like TakScorerDefault, so agents with any other
+    rollout policy or scoring (and terminal leaves) get their rollouts run one after the other.
+    """
+
+    def supports(self, agent) -> bool:
+        """
+        Returns whether the rollouts of the given agent can run on the batch simulator
+        :param agent: the MCTS agent
+        :return: True if they can
+        """
+        return type(agent.rollout_policy) is RandomPolicyEff and type(agent.env.scoring_metric) is TakScorerDefault
+
+    def rollout(self, agent, leaf: TakState, runs: int) -> List[float]:
+        if not self.supports(agent) or leaf.is_terminal()[0]:
+            return super().rollout(agent, leaf, runs)
+        simulator = TakBatchSimulator.get(leaf.board_size)
+        return simulator.rollout(leaf, runs, agent.player, discount=agent.env.scoring_discount).tolist()
+
+
+# Per process state of the TakProcessRolloutExecutor workers
+_worker_agent: Any = None
+_worker_synced_q_deltas: Dict[Tuple[int, int], float] = {}
+
+
+def _init_rollout_worker(agent_class, env: TakEnvironment, player, rollout_policy) -> None:
+    global _worker_agent, _worker_synced_q_deltas
+    _worker_agent = agent_class(env, player, None, rollout_policy=rollout_policy, rollout_runs=1)
+    _worker_synced_q_deltas = {}
+
+
+def _run_rollouts(
+        leaf_tuple: Tuple,
+        runs: int,
+        seed: int,
+        synced_q_deltas: Dict[Tuple[int, int], float]
+) -> Tuple[List[float], Dict[Tuple[int, int], float]]:
+    np.random.seed(seed)
+    board_class = TakEnvironment.board_engines[_worker_agent.env.board_engine]
+    policy = _worker_agent.rollout_policy
+    records_updates = hasattr(policy, 'record_updates')
+
+    if records_updates:
+        # Catch up with the updates made by the other workers (merged by the main process)
+        policy.apply_q_deltas({
+            key: q_delta - _worker_synced_q_deltas.get(key, 0.0)
+            for key, q_delta in synced_q_deltas.items()
+            if q_delta != _worker_synced_q_deltas.get(key, 0.0)
+        })
+        _worker_synced_q_deltas.update(synced_q_deltas)
+        policy.record_updates()
+
+    leaf = TakState.from_tuple(leaf_tuple, board_class)
+    rewards = [_worker_agent._rollout_single(leaf) for _ in range(runs)]
+
+    if not records_updates:
+        return rewards, {}
+    # The updates are undone here, and come back (merged with the ones of the other workers) on the next batches
+    return rewards, policy.pop_q_deltas(revert=True)
+
+
+class TakProcessRolloutExecutor(TakRolloutExecutor):
+    """
+    TakProcessRolloutExecutor class.
+    Runs the rollouts on a persistent pool of processes, so they run in parallel on all the cores.
+
+    The workers get a copy of the environment, player and rollout policy of the agent when the pool starts. Each batch
+    of rollouts sends the leaf state in its compact form (TakState.as_tuple) and gets back the rewards.
+    For policies that learn during rollouts (EGreedyPolicy) each batch also gets back the changes the rollouts made to
+    the Q values, which are merged into the policy of the agent after the batch. The merged changes are sent with the
+    next batches so every worker catches up with them; once there are more than max_synced_q_deltas of them the pool
+    is restarted with a fresh copy of the policy.
+
+    An executor is bound to the first agent it runs rollouts for.
+    """
+
+    def __init__(self, processes: Optional[int] = None, max_synced_q_deltas: int = 100000):
+        self.processes: int = processes or cpu_count() or 1
+        self.max_synced_q_deltas: int = max_synced_q_deltas
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._agent = None
+        self._synced_q_deltas: Dict[Tuple[int, int], float] = {}
+        self._synced_q_deltas_snapshot: Optional[Dict[Tuple[int, int], float]] = None
+
+    def _start(self, agent) -> ProcessPoolExecutor:
+        if self._agent is not None and self._agent is not agent:
+            raise ValueError("TakProcessRolloutExecutor is already bound to another agent")
+        if self._executor is None:
+            self._agent = agent
+            self._synced_q_deltas = {}
+            self._synced_q_deltas_snapshot = None
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_init_rollout_worker,
+                initargs=(agent.__class__, agent.env, agent.player, agent.rollout_policy)
+            )
+        return self._executor
+
+    def rollout(self, agent, leaf: TakState, runs: int) -> List[float]:
+        batches = [len(batch) for batch in np.array_split(np.arange(runs), min(runs, self.processes))]
+        futures = [self.submit(agent, leaf, batch) for batch in batches]
+        rewards = []
+        for future in futures:
+            rewards.extend(self.result(agent, future))
+        self.restart_if_stale()
+        return rewards
+
+    def submit(self, agent, leaf: TakState, runs: int, seed: Optional[int] = None) -> Future:
+        """
+        Starts running the given number of rollouts from the given state on one of the workers
+        :param agent: the MCTS agent the rollouts are for
+        :param leaf: the state to start the rollouts from
+        :param runs: the number of rollouts
+        :param seed: the seed for the random number generator of the worker (a random one if not given)
+        :return: the future to pass to result
+        """
+        executor = self._start(agent)
+        if seed is None:
+            seed = np.random.randint(2 ** 31)
+        # Snapshot, since the arguments are pickled in the background while the batch results are merged
+        if self._synced_q_deltas_snapshot is None:
+            self._synced_q_deltas_snapshot = dict(self._synced_q_deltas)
+        return executor.submit(_run_rollouts, leaf.as_tuple(), runs, int(seed), self._synced_q_deltas_snapshot)
+
+    def result(self, agent, future: Future) -> List[float]:
+        """
+        Waits for the rollouts started by submit, and merges the changes they made to the rollout policy
+        :param agent: the MCTS agent the rollouts are for
+        :param future: the future returned by submit
+        :return: the reward of each rollout
+        """
+        rewards, q_deltas = future.result()
+        self._merge_q_deltas(agent, q_deltas)
+        return rewards
+
+    def restart_if_stale(self) -> None:
+        """
+        Restarts the pool (with a fresh copy of the rollout policy) if there are too many changes to send to the
+        workers. Must only be called when there are no rollouts running.
+        """
+        if len(self._synced_q_deltas) > self.max_synced_q_deltas:
+            self.close()
+
+    def _merge_q_deltas(self, agent, q_deltas: Dict[Tuple[int, int], float]) -> None:
+        if len(q_deltas) == 0:
+            return
+        self._synced_q_deltas_snapshot = None
+        for key, q_delta in q_deltas.items():
+            self._synced_q_deltas[key] = self._synced_q_deltas.get(key, 0.0) + q_delta
+        agent.rollout_policy.apply_q_deltas(q_deltas)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._agent = None
+        self._synced_q_deltas = {}
+        self._synced_q_deltas_snapshot = None
@@ -0,0 +1,197 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from os import cpu_count
+from typing import Optional, Tuple, List, Dict, Set
+
+import numpy as np
+
+from policies.EGreedyPolicy import EGreedyPolicy
+from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakPlayer import TakPlayer
+
+
+# Transitions of a batch of episodes: (state keys, action ids, rewards, next state keys, next action ids, dones), with
+# one entry per SARSA update (see EGreedyPolicy.q_key), in chains of the steps of each player in each episode (see
+# EGreedyPolicy.update_batch); the next keys of the last step of each chain are unused
+TakTransitions = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def _init_self_play_actor(env: TakEnvironment, policy: EGreedyPolicy) -> None:
+    global _actor_env, _actor_policy, _actor_synced_q_deltas
+    _actor_env = env
+    _actor_policy = policy
+    _actor_synced_q_deltas = {}
+
+
+def _play_episodes(
+        episodes: int,
+        seed: int,
+        synced_q_deltas: Dict[Tuple[int, int], float]
+) -> Tuple[TakTransitions, List[Optional[TakPlayer]]]:
+    np.random.seed(seed)
+    env, policy = _actor_env, _actor_policy
+
+    # Catch up with the updates made by the learner
+    policy.apply_q_deltas({
+        key: q_delta - _actor_synced_q_deltas.get(key, 0.0)
+        for key, q_delta in synced_q_deltas.items()
+        if q_delta != _actor_synced_q_deltas.get(key, 0.0)
+    })
+    _actor_synced_q_deltas.update(synced_q_deltas)
+
+    keys, rewards, next_keys, dones = [], [], [], []
+    winners = []
+    for _ in range(episodes):
+        state = env.reset()
+        # (Q key, reward) of the steps of each player, in order
+        steps: Dict[TakPlayer, List[Tuple[Tuple[int, int], float]]] = {TakPlayer.WHITE: [], TakPlayer.BLACK: []}
+        done, info = False, {}
+        while not done:
+            player = state.current_player
+            action = policy.select_action(state)
+            key = policy.q_key(state, action)
+            state, reward, done, info = env.step(action)
+            steps[player].append((key, reward))
+        # The steps of each player form a chain (see EGreedyPolicy.update_batch), the last one gets the final reward
+        for player, player_steps in steps.items():
+            if len(player_steps) == 0:
+                continue
+            if player != state.current_player.other():
+                player_steps[-1] = (player_steps[-1][0], env.compute_score(player, info['winning_player']))
+            for i, (key, reward) in enumerate(player_steps):
+                keys.append(key)
+                rewards.append(reward)
+                next_keys.append(player_steps[i + 1][0] if i + 1 < len(player_steps) else (0, 0))
+                dones.append(i + 1 == len(player_steps))
+        winners.append(info['winning_player'])
+
+    keys = np.array(keys, dtype=np.uint64).reshape(-1, 2)
+    next_keys = np.array(next_keys, dtype=np.uint64).reshape(-1, 2)
+    transitions = (
+        keys[:, 0], keys[:, 1].astype(np.int64), np.array(rewards, dtype=np.float64),
+        next_keys[:, 0], next_keys[:, 1].astype(np.int64), np.array(dones, dtype=bool)
+    )
+    return transitions, winners
+
+
+class TakSelfPlayTrainer(object):
+    """
+    TakSelfPlayTrainer class.
+    Trains an EGreedyPolicy by self-play on a pool of actor processes: each actor plays both sides of batches of
+    sync_episodes episodes with its own snapshot of the policy, and sends back the SARSA transitions of the episodes
+    as arrays of Q keys (see EGreedyPolicy.q_key). The learner (the main process) applies the updates of each batch
+    to the policy as the batches arrive, in one vectorized update (with the eligibility traces of the policy, if any).
+
+    Like TakProcessRolloutExecutor, the changes the learner made to the Q values are sent with the next batches so the
+    actors catch up with them (so the snapshots are at most a few batches old); once there are more than
+    max_synced_q_deltas of them the pool is restarted with a fresh copy of the policy.
+    """
+
+    def __init__(
+            self,
+            env: TakEnvironment,
+            policy: EGreedyPolicy,
+            actors: Optional[int] = None,
+            sync_episodes: int = 10,
+            max_synced_q_deltas: int = 100000
+    ):
+        """
+        :param env: the environment to play the episodes on
+        :param policy: the policy to train (it selects the actions of both players)
+        :param actors: the number of actor processes (the number of cores if not given)
+        :param sync_episodes: the number of episodes an actor plays between syncs of its snapshot of the policy
+        :param max_synced_q_deltas: the number of changed Q values the actors are sent before restarting the pool
+        """
+        self.env: TakEnvironment = env
+        self.policy: EGreedyPolicy = policy
+        self.actors: int = actors or cpu_count() or 1
+        self.sync_episodes: int = sync_episodes
+        self.max_synced_q_deltas: int = max_synced_q_deltas
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._synced_q_deltas: Dict[Tuple[int, int], float] = {}
+        self._synced_q_deltas_snapshot: Optional[Dict[Tuple[int, int], float]] = None
+
+    def _start(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._synced_q_deltas = {}
+            self._synced_q_deltas_snapshot = None
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.actors,
+                initializer=_init_self_play_actor,
+                initargs=(self.env, self.policy)
+            )
+        return self._executor
+
+    def _submit(self, episodes: int) -> Future:
+        executor = self._start()
+        # Snapshot, since the arguments are pickled in the background while the updates are applied
+        if self._synced_q_deltas_snapshot is None:
+            self._synced_q_deltas_snapshot = dict(self._synced_q_deltas)
+        seed = int(np.random.randint(2 ** 31))
+        return executor.submit(_play_episodes, episodes, seed, self._synced_q_deltas_snapshot)
+
+    def learn(self, transitions: TakTransitions) -> None:
+        """
+        Applies the SARSA updates of the given transitions to the policy, in one batch (see EGreedyPolicy.update_batch)
+        :param transitions: the transitions (as sent by the actors)
+        """
+        self.policy.record_updates()
+        self.policy.update_batch(*transitions)
+        q_deltas = self.policy.pop_q_deltas()
+        if len(q_deltas) > 0:
+            self._synced_q_deltas_snapshot = None
+            for key, q_delta in q_deltas.items():
+                self._synced_q_deltas[key] = self._synced_q_deltas.get(key, 0.0) + q_delta
+
+    def train(self, episodes: int) -> Dict[str, float]:
+        """
+        Trains the policy on the given number of self-play episodes
+        :param episodes: the number of episodes
+        :return: the throughput of the training (episodes, updates, seconds, episodes_per_second, updates_per_second
+        and syncs, the number of batches of episodes) and its results (white_wins, black_wins and ties)
+        """
+        start_time = time.time()
+        batches = [self.sync_episodes] * (episodes // self.sync_episodes)
+        if episodes % self.sync_episodes > 0:
+            batches.append(episodes % self.sync_episodes)
+        batches.reverse()
+
+        report = {'episodes': 0, 'updates': 0, 'syncs': 0, 'white_wins': 0, 'black_wins': 0, 'ties': 0}
+        running: Set[Future] = set()
+        while len(batches) > 0 or len(running) > 0:
+            # Two batches per actor, so the actors keep playing while the learner applies the updates (and none while
+            # the pool is waiting to be restarted)
+            stale = len(self._synced_q_deltas) > self.max_synced_q_deltas
+            while not stale and len(batches) > 0 and len(running) < 2 * self.actors:
+                running.add(self._submit(batches.pop()))
+            if stale and len(running) == 0:
+                self.close()
+                continue
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                transitions, winners = future.result()
+                self.learn(transitions)
+                report['episodes'] += len(winners)
+                report['updates'] += len(transitions[2])
+                report['syncs'] += 1
+                report['white_wins'] += winners.count(TakPlayer.WHITE)
+                report['black_wins'] += winners.count(TakPlayer.BLACK)
+                report['ties'] += winners.count(None)
+
+        report['seconds'] = time.time() - start_time
+        report['episodes_per_second'] = report['episodes'] / report['seconds'] if report['seconds'] > 0 else 0.0
+        report['updates_per_second'] = report['updates'] / report['seconds'] if report['seconds'] > 0 else 0.0
+        return report
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._synced_q_deltas = {}
+        self._synced_q_deltas_snapshot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,89 @@
+from os.path import isfile
+
+from tqdm import trange
+
+from agents.MCTSPlayerArrayKnowledgeGraph import MCTSPlayerArrayKnowledgeGraph
+from agents.TakMCTSPlayerAgent import MCTSPlayerKnowledgeGraph
+from agents.TakMCTSPlayerAgent2 import TakMCTSPlayerAgent2
+from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakPlayer import TakPlayer
+
+import time
+
+# Measures the latency of each move as the knowledge graph shared by both agents grows across games
+# (the same setup as mcts_with_sarsa.py), for the igraph and the array backed knowledge graphs. With the state -> node
+# index of the knowledge graphs the move time should stay flat as the number of nodes grows.
+
+board_sizes = [3, 4]
+knowledge_graphs = {'igraph': MCTSPlayerKnowledgeGraph, 'array': MCTSPlayerArrayKnowledgeGraph}
+mcts_expansion_depth = 3
+mcts_expansion_epsilon = 0.9
+mcts_iterations = 5
+rollout_runs = 8
+games = 50
+
+run_number = 1
+path = f"./results/mcts_graph_benchmark_run_{run_number}.csv"
+while isfile(path):
+    run_number += 1
+    path = f"./results/mcts_graph_benchmark_run_{run_number}.csv"
+
+with open(path, "w+") as results_file:
+    results_file.writelines(",".join([
+        "board_size",
+        "knowledge_graph",
+        "trial_number",
+        "step",
+        "player",
+        "knowledge_graph_nodes",
+        "move_time",
+    ]) + "\n")
+
+print(f"Will run {len(board_sizes) * len(knowledge_graphs)} configurations {games} times each.")
+print(f"Output file: {path}")
+
+with open(path, "a") as results_file:
+
+    for board_size in board_sizes:
+        for knowledge_graph_name, knowledge_graph in knowledge_graphs.items():
+            with TakEnvironment(board_size=board_size) as env:
+                game_knowledge_graph = knowledge_graph(env.reset())
+                agents = {
+                    player: TakMCTSPlayerAgent2(
+                        env.get_copy_at_state(env.reset()),
+                        player,
+                        game_knowledge_graph,
+                        mcts_expansion_depth=mcts_expansion_depth,
+                        mcts_expansion_epsilon=mcts_expansion_epsilon,
+                        mcts_iterations=mcts_iterations,
+                        rollout_runs=rollout_runs,
+                        parallel_rollouts=False
+                    )
+                    for player in TakPlayer
+                }
+
+                for trial in trange(games, desc=f"Board: {board_size}; G={knowledge_graph_name}"):
+                    done = False
+                    steps = 0
+                    state = env.reset()
+
+                    while not done:
+                        agent = agents[state.current_player]
+                        move_start_time = time.time_ns()
+                        action = agent.select_action(state.copy())
+                        move_elapsed_time = time.time_ns() - move_start_time
+
+                        results_file.writelines([
+                            ",".join([
+                                str(board_size),                                # board_size
+                                knowledge_graph_name,                           # knowledge_graph
+                                str(trial),                                     # trial_number
+                                str(steps),                                     # step
+                                str(state.current_player),                      # player
+                                str(game_knowledge_graph.total_nodes()),        # knowledge_graph_nodes
+                                str(move_elapsed_time),                         # move_time
+                            ]) + "\n"])
+
+                        state, reward, done, info = env.step(action)
+                        steps += 1
+                    results_file.flush()
@@ -1,4 +1,4 @@
-from os.path import isfile
+from os.path import isdir, isfile, join
 
 from tqdm import tqdm, trange
 
@@ -32,6 +32,9 @@ sarsa_epsilons = [0.1]
 sarsa_alphas = [0.99]
 sarsa_gammas = [0.99]
 games = 10
+# Directory to warm start the knowledge graph stats from (and save them to after each configuration), one per board
+# size; None to start every configuration with no knowledge
+knowledge_graph_dir = None
 
 
 def make_policy(board_size, policy_name, epsilon, alpha, gamma):
@@ -111,6 +114,10 @@ with open(path, "a") as results_file:
         # Init the environment
         with TakEnvironment(board_size=board_size, init_player=starting_player) as env:
             game_knowledge_graph = MCTSPlayerKnowledgeGraph(env.reset())
+            board_knowledge_graph_dir = join(knowledge_graph_dir, f"board_{board_size}") \
+                if knowledge_graph_dir is not None else None
+            if board_knowledge_graph_dir is not None and isdir(board_knowledge_graph_dir):
+                game_knowledge_graph.load_stats(board_knowledge_graph_dir)
             # Init agents with no knowledge of the game
             agent_white_policy = make_policy(board_size, rollout_policy, sarsa_epsilon, sarsa_alpha, sarsa_gamma)
             agent_white_player = TakMCTSPlayerAgent2(
@@ -197,5 +204,7 @@ with open(path, "a") as results_file:
                         str(int(final_reward_for_black_player)),        # reward_for_black_player
                     ]) + "\n"])
             results_file.flush()
+            if board_knowledge_graph_dir is not None:
+                game_knowledge_graph.save_stats(board_knowledge_graph_dir)
 
 print("Done!")
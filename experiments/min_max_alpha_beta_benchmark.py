@@ -0,0 +1,97 @@
+from os.path import isfile
+
+import numpy as np
+from tqdm import tqdm
+
+from policies.MinMaxPolicy import MinMaxPolicy
+from tak_env.TakAction import TakAction
+from tak_env.TakEnvironment import TakEnvironment
+from utils.TranspositionTable import TranspositionTable
+
+# Compares the nodes, cutoffs and time of the full MinMax search with alpha-beta (with and without move ordering,
+# and with a transposition table) on positions reached by random openings. The selected actions of the searches are
+# compared with the same random seed, since MinMax picks randomly between the best actions. The full search is skipped
+# where it is impractical.
+
+board_sizes = [3, 4, 5]
+min_max_depths = [1, 2, 3]
+full_search_max_depths = {3: 3, 4: 2, 5: 2}
+opening_moves = [2, 6, 10]
+positions = 5
+
+searches = {
+    'minmax': {'alpha_beta': False},
+    'alpha_beta_unordered': {'alpha_beta': True, 'move_ordering': False},
+    'alpha_beta': {'alpha_beta': True, 'move_ordering': True},
+    'alpha_beta_transpositions': {'alpha_beta': True, 'move_ordering': True, 'transposition_table': True},
+}
+
+run_number = 1
+path = f"./results/min_max_alpha_beta_benchmark_run_{run_number}.csv"
+while isfile(path):
+    run_number += 1
+    path = f"./results/min_max_alpha_beta_benchmark_run_{run_number}.csv"
+
+with open(path, "w+") as results_file:
+    results_file.writelines(",".join([
+        "board_size",
+        "min_max_depth",
+        "opening_moves",
+        "position_number",
+        "search",
+        "nodes",
+        "cutoffs",
+        "time_ms",
+        "same_action_as_first_search",
+    ]) + "\n")
+
+settings = []
+for board_size in board_sizes:
+    for min_max_depth in min_max_depths:
+        for opening_move in opening_moves:
+            for position in range(positions):
+                settings.append((board_size, min_max_depth, opening_move, position))
+
+print(f"Will run {len(settings)} positions with {len(searches)} searches each.")
+print(f"Output file: {path}")
+
+with open(path, "a") as results_file:
+
+    for board_size, min_max_depth, opening_move, position in tqdm(settings):
+        with TakEnvironment(board_size=board_size) as env:
+            rng = np.random.RandomState(position)
+            state = env.reset()
+            for _ in range(opening_move):
+                possible_actions = TakAction.get_possible_actions(state)
+                next_state = possible_actions[rng.randint(len(possible_actions))].take(state)
+                if next_state.is_terminal()[0]:
+                    break
+                state = next_state
+            possible_actions = TakAction.get_possible_actions(state)
+
+            first_action = None
+            for search_name, search_kwargs in searches.items():
+                if not search_kwargs['alpha_beta'] and min_max_depth > full_search_max_depths[board_size]:
+                    continue
+                if search_kwargs.get('transposition_table'):
+                    search_kwargs = dict(search_kwargs, transposition_table=TranspositionTable())
+                policy = MinMaxPolicy(depth=min_max_depth, **search_kwargs)
+                np.random.seed(position)
+                action = policy.select_action(state, possible_actions)
+                first_action = action if first_action is None else first_action
+
+                results_file.writelines([
+                    ",".join([
+                        str(board_size),                                # board_size
+                        str(min_max_depth),                             # min_max_depth
+                        str(opening_move),                              # opening_moves
+                        str(position),                                  # position_number
+                        search_name,                                    # search
+                        str(policy.last_search_stats['nodes']),         # nodes
+                        str(policy.last_search_stats['cutoffs']),       # cutoffs
+                        str(policy.last_search_stats['time_ms']),       # time_ms
+                        str(action == first_action),                    # same_action_as_first_search
+                    ]) + "\n"])
+            results_file.flush()
+
+print("Done!")
@@ -1,9 +1,10 @@
-from os.path import isfile
+from os.path import isdir, isfile, join
 from typing import Optional, Tuple
 
 from tqdm import trange
 from agents.TakPlayerAgent import TakPlayerAgent
 from policies.EGreedyPolicy import EGreedyPolicy
+from policies.LinearEGreedyPolicy import LinearEGreedyPolicy
 from tak_env.TakAction import TakAction
 from tak_env.TakEnvironment import TakEnvironment
 from tak_env.TakPlayer import TakPlayer
@@ -16,6 +17,12 @@ alphas = [0.99]
 episodes_options = [500, 1000]
 starting_players = [TakPlayer.WHITE]
 games = 30
+# Approximate the Q values with a linear function of the features of the states (LinearEGreedyPolicy) instead of a
+# table (q_values_dir is then unused)
+linear_q = False
+# Directory to warm start the Q values from (and save them to after each game), one table per board size; None to
+# start every game with no knowledge
+q_values_dir: Optional[str] = None
 
 trial_settings = []
 for board_size in board_sizes:
@@ -58,7 +65,12 @@ with open(path, "a") as results_file:
             # Init the environment
             with TakEnvironment(board_size=board_size) as env:
                 # Init agents with no knowledge of the game
-                sarsa_policy = EGreedyPolicy(board_size, eps, alpha, gamma)
+                sarsa_policy = LinearEGreedyPolicy(board_size, eps, alpha, gamma) if linear_q \
+                    else EGreedyPolicy(board_size, eps, alpha, gamma)
+                board_q_values_dir = join(q_values_dir, f"board_{board_size}") \
+                    if q_values_dir is not None and not linear_q else None
+                if board_q_values_dir is not None and isdir(board_q_values_dir):
+                    sarsa_policy.load_q_values(board_q_values_dir)
                 agent_white_player = TakPlayerAgent(
                     TakPlayer.WHITE, policy=sarsa_policy,
                     skip_possible_actions=True
@@ -139,6 +151,8 @@ with open(path, "a") as results_file:
                             str(int(final_reward_for_black_player))     # reward_for_black_player
                         ]) + "\n"])
                 results_file.flush()
+                if board_q_values_dir is not None:
+                    sarsa_policy.save_q_values(board_q_values_dir)
                 print(f"# White wins: {white_won}")
 
 print("Done!")
@@ -0,0 +1,81 @@
+from os.path import isdir, isfile, join
+from typing import Optional
+
+from agents.TakSelfPlayTrainer import TakSelfPlayTrainer
+from policies.EGreedyPolicy import EGreedyPolicy
+from tak_env.TakEnvironment import TakEnvironment
+
+# Trains a SARSA policy by self-play (the same setup as sarsa.py) on a pool of actor processes, and reports the
+# throughput of the training (episodes and updates per second) for each number of actors, sync interval and decay of
+# the eligibility traces.
+
+board_sizes = [3, 4]
+epsilon = 0.1
+gamma = 0.99
+alpha = 0.99
+trace_decays = [0.0, 0.8]  # 0 for one step SARSA, lambda of SARSA(lambda) otherwise
+episodes = 1000
+actors_options = [None]  # None for one actor per core
+sync_episodes_options = [5, 20]
+# Directory to warm start the Q values from (and save them to after training), one table per board size; None to
+# start every configuration with no knowledge
+q_values_dir: Optional[str] = None
+
+trial_settings = []
+for board_size in board_sizes:
+    for trace_decay in trace_decays:
+        for actors in actors_options:
+            for sync_episodes in sync_episodes_options:
+                trial_settings.append((board_size, trace_decay, actors, sync_episodes))
+
+report_columns = [
+    "episodes",
+    "updates",
+    "syncs",
+    "seconds",
+    "episodes_per_second",
+    "updates_per_second",
+    "white_wins",
+    "black_wins",
+    "ties"
+]
+
+if __name__ == '__main__':
+    run_number = 1
+    path = f"./results/sarsa_self_play_run_{run_number}.csv"
+    while isfile(path):
+        run_number += 1
+        path = f"./results/sarsa_self_play_run_{run_number}.csv"
+
+    with open(path, "w+") as results_file:
+        setting_columns = ["board_size", "trace_decay", "actors", "sync_episodes"]
+        results_file.writelines(",".join(setting_columns + report_columns) + "\n")
+
+    print(f"Will run {len(trial_settings)} configurations of {episodes} episodes each.")
+    print(f"Output file: {path}")
+
+    with open(path, "a") as results_file:
+        for board_size, trace_decay, actors, sync_episodes in trial_settings:
+            with TakEnvironment(board_size=board_size) as env:
+                sarsa_policy = EGreedyPolicy(board_size, epsilon, alpha, gamma, trace_decay=trace_decay)
+                board_q_values_dir = join(q_values_dir, f"board_{board_size}") if q_values_dir is not None else None
+                if board_q_values_dir is not None and isdir(board_q_values_dir):
+                    sarsa_policy.load_q_values(board_q_values_dir)
+
+                with TakSelfPlayTrainer(env, sarsa_policy, actors, sync_episodes) as trainer:
+                    report = trainer.train(episodes)
+
+                if board_q_values_dir is not None:
+                    sarsa_policy.save_q_values(board_q_values_dir)
+
+            results_file.writelines([
+                ",".join([str(board_size), str(trace_decay), str(trainer.actors), str(sync_episodes)] + [
+                    str(report[column]) for column in report_columns
+                ]) + "\n"])
+            results_file.flush()
+            print(
+                f"B:{board_size}, λ={trace_decay}, A:{trainer.actors}, S:{sync_episodes}: "
+                f"{report['episodes_per_second']:.1f} episodes/s, {report['updates_per_second']:.1f} updates/s"
+            )
+
+    print("Done!")
@@ -1,12 +1,14 @@
-from collections import defaultdict
-from typing import List, Tuple, DefaultDict
+from typing import List, Tuple, Dict, Optional
 
 import numpy as np
 
 from policies.Policy import Policy
 from tak_env.TakAction import TakAction, TakActionPlace
-from tak_env.TakPlayer import TakPlayer
+from tak_env.TakMoveGenerator import TakMoveGenerator
 from tak_env.TakState import TakState
+from tak_env.TakSymmetry import TakSymmetry
+from utils.QTable import QTable
+from utils.utils import decayed_chain_sums
 
 
 class EGreedyPolicy(Policy):
@@ -18,34 +20,53 @@ class EGreedyPolicy(Policy):
             alpha: float,
             gamma: float,
             initial_q_value: float = 0.0,
-            place_action_prob: float = 0.5
+            place_action_prob: float = 0.5,
+            canonical_states: bool = False,
+            trace_decay: float = 0.0
     ):
-        self.first_actions = {
-            TakPlayer.WHITE: TakAction.get_first_actions(board_size, TakPlayer.WHITE),
-            TakPlayer.BLACK: TakAction.get_first_actions(board_size, TakPlayer.BLACK)
-        }
-        self.all_actions = TakAction.get_all_actions(board_size)
+        """
+        The Q values are kept in a QTable, with the Zobrist keys of the states as state keys and the ids of the
+        actions in the action table (see TakActionTable) as action indices.
+
+        :param canonical_states: if true, the Q values are keyed on the canonical form of the states (see
+        TakSymmetry), so rotated and mirrored versions of a position share their Q values
+        :param trace_decay: the decay (lambda) of the eligibility traces of update_batch, 0 for one step SARSA
+        """
+        self.move_generator = TakMoveGenerator.get(board_size)
+        self.action_table = self.move_generator.action_table
         self.epsilon = epsilon
         self.alpha = alpha
         self.gamma = gamma
-        self.Q: DefaultDict[Tuple[TakState, TakAction], float] = defaultdict(lambda: initial_q_value)
+        self.initial_q_value = initial_q_value
+        self.Q: QTable = QTable(len(self.action_table), initial_q_value)
         self.place_action_prob = place_action_prob
+        self.symmetry: Optional[TakSymmetry] = TakSymmetry.get(board_size) if canonical_states else None
+        self.trace_decay = trace_decay
+
+        # Q values before the first update of each entry since record_updates was called (None when not recording)
+        self.recorded_q_values: Optional[Dict[Tuple[int, int], float]] = None
+
+    def q_key(self, state: TakState, action: TakAction) -> Tuple[int, int]:
+        """
+        Returns the key of the Q value of the given state and action: the Zobrist key of the canonical state and the
+        id of the matching action if keying on canonical states, or of the state and the action otherwise
+        """
+        if self.symmetry is None:
+            return state.key, self.action_table.id_of(action)
+        canonical_state, transform = self.symmetry.canonical(state)
+        return canonical_state.key, self.action_table.id_of(self.symmetry.transform_action(action, transform))
 
     def select_best_action(self, current_state: TakState) -> TakAction:
-        actions = self.all_actions if not current_state.first_action() \
-            else self.first_actions[current_state.current_player]
-        best_actions, best_value = None, float("-inf")
+        action_ids = np.array(self.move_generator.legal_action_indices(current_state), dtype=np.int64)
 
-        for action in actions:
-            value = self.Q[(current_state, action)]
-            if action.is_valid(current_state):
-                if value > best_value:
-                    best_value = value
-                    best_actions = [action]
-                elif value == best_value:
-                    best_actions.append(action)
+        q_state, transform = current_state, 0
+        if self.symmetry is not None:
+            q_state, transform = self.symmetry.canonical(current_state)
+        q_action_ids = action_ids if transform == 0 else self.symmetry.transform_action_ids(action_ids, transform)
+        values = self.Q.row(q_state.key)[q_action_ids]
+        best_action_ids = action_ids[values == values.max()]
 
-        return np.random.choice(best_actions)
+        return self.action_table.action(np.random.choice(best_action_ids))
 
     def select_action(self, state: TakState, _: List[TakAction] = None) -> TakAction:
         if np.random.random() < self.epsilon:
@@ -59,30 +80,30 @@ class EGreedyPolicy(Policy):
 
     def get_actions_and_weights(self, current_state) -> Tuple[List[TakAction], np.ndarray]:
         place_action_prob = self.place_action_prob
-        actions = self.all_actions if not current_state.first_action() \
-            else self.first_actions[current_state.current_player]
+        actions = self.move_generator.legal_actions(current_state)
 
+        # Private copy for the lookahead, the given state may be shared (e.g. the leaf of the rollouts of the threads
+        # of TakThreadRolloutExecutor)
+        lookahead_state = current_state.copy()
         weights = np.zeros(len(actions))
         valid_place_actions, valid_move_actions = [], []
         winning_actions = []
         losing_actions = []
         for i, action in enumerate(actions):
-            # is valid?
-            if action.is_valid(current_state):
-                if isinstance(action, TakActionPlace):
-                    valid_place_actions.append(i)
-                else:
-                    valid_move_actions.append(i)
-                # is winning?
-                next_state = action.take(current_state, mutate=False)
-                if next_state.is_terminal():
-                    if next_state.winning_player() == current_state.current_player:
-                        winning_actions.append(action)
-                    else:
-                        losing_actions.append(action)
-                        weights[i] = 0
+            if isinstance(action, TakActionPlace):
+                valid_place_actions.append(i)
             else:
-                weights[i] = 0
+                valid_move_actions.append(i)
+            # is winning? (made and undone on the copy)
+            record = action.make(lookahead_state)
+            done, info = lookahead_state.is_terminal()
+            record.undo(lookahead_state)
+            if done:
+                if info['winning_player'] == current_state.current_player:
+                    winning_actions.append(action)
+                else:
+                    losing_actions.append(action)
+                    weights[i] = 0
 
         if len(winning_actions) > 0:
             return winning_actions, np.ones(len(winning_actions)) / len(winning_actions)
@@ -104,5 +125,111 @@ class EGreedyPolicy(Policy):
         return actions, weights
 
     def update(self, state, action, reward, next_state, next_action):
-        update_val = reward + self.gamma * self.Q[(next_state, next_action)] - self.Q[(state, action)]
-        self.Q[(state, action)] = self.Q[(state, action)] + self.alpha * update_val
+        self.update_q_key(self.q_key(state, action), reward, self.q_key(next_state, next_action))
+
+    def update_q_key(self, key: Tuple[int, int], reward: float, next_key: Optional[Tuple[int, int]]) -> None:
+        """
+        Same as update, for the Q keys (see q_key) of the state-action pairs instead of the pairs themselves
+        :param key: the key of the Q value to update
+        :param reward: the reward of the step
+        :param next_key: the key of the next state-action pair, or None if the step ended the game
+        """
+        q_value = self.Q.get(*key)
+        next_q_value = self.Q.get(*next_key) if next_key is not None else 0.0
+        update_val = reward + self.gamma * next_q_value - q_value
+        if self.recorded_q_values is not None and key not in self.recorded_q_values:
+            self.recorded_q_values[key] = q_value
+        self.Q.set(*key, q_value + self.alpha * update_val)
+
+    def update_batch(
+            self,
+            state_keys: np.ndarray,
+            action_ids: np.ndarray,
+            rewards: np.ndarray,
+            next_state_keys: np.ndarray,
+            next_action_ids: np.ndarray,
+            dones: Optional[np.ndarray] = None,
+            trace_decay: Optional[float] = None
+    ) -> None:
+        """
+        Applies the SARSA updates of a batch of steps at once, given as arrays of the Q keys (see q_key) of their
+        state-action pairs. The TD errors are all computed from the Q values before the batch, and the updates of
+        repeated pairs are added up.
+
+        With eligibility traces (SARSA(lambda), trace_decay > 0) the steps must be in order, as chains of steps where
+        the next pair of each step is the pair of the next step, ended by a step that ended the game (or by the end of
+        the batch). The update of each step then adds the TD errors of the later steps of its chain, decayed by
+        (gamma * trace_decay) per step: the same updates as accumulating traces applied at the end of the chain.
+        :param state_keys: array with the state key of each step
+        :param action_ids: array with the action id of each step
+        :param rewards: array with the reward of each step
+        :param next_state_keys: array with the state key of the next pair of each step
+        :param next_action_ids: array with the action id of the next pair of each step
+        :param dones: array with whether each step ended the game (its next pair is then unused), none if not given
+        :param trace_decay: the decay of the eligibility traces (the one of the policy if not given)
+        """
+        trace_decay = self.trace_decay if trace_decay is None else trace_decay
+        steps = len(rewards)
+        if steps == 0:
+            return
+        dones = np.zeros(steps, dtype=bool) if dones is None else np.asarray(dones, dtype=bool)
+        q_values = self.Q.get_many(state_keys, action_ids)
+        next_q_values = np.where(dones, 0.0, self.Q.get_many(next_state_keys, next_action_ids))
+        td_errors = np.asarray(rewards, dtype=np.float64) + self.gamma * next_q_values - q_values
+
+        if trace_decay > 0:
+            td_errors = decayed_chain_sums(td_errors, dones, self.gamma * trace_decay)
+
+        if self.recorded_q_values is not None:
+            for key, q_value in zip(zip(np.asarray(state_keys).tolist(), np.asarray(action_ids).tolist()), q_values):
+                self.recorded_q_values.setdefault(key, float(q_value))
+        self.Q.add_many(state_keys, action_ids, self.alpha * td_errors)
+
+    def record_updates(self) -> None:
+        """
+        Starts recording the changes made to the Q values by update (see pop_q_deltas)
+        """
+        self.recorded_q_values = {}
+
+    def pop_q_deltas(self, revert: bool = False) -> Dict[Tuple[int, int], float]:
+        """
+        Stops recording and returns the changes made to the Q values since record_updates was called
+        :param revert: whether to also undo those changes
+        :return: dict of (state key, action id) -> change of its Q value (see q_key)
+        """
+        recorded_q_values, self.recorded_q_values = self.recorded_q_values or {}, None
+        q_deltas = {key: self.Q.get(*key) - q_value for key, q_value in recorded_q_values.items()}
+        if revert:
+            for key, q_value in recorded_q_values.items():
+                self.Q.set(*key, q_value)
+        return q_deltas
+
+    def apply_q_deltas(self, q_deltas: Dict[Tuple[int, int], float]) -> None:
+        """
+        Adds the given changes to the Q values (e.g. the ones made by copies of this policy in other processes)
+        :param q_deltas: dict of (state key, action id) -> change of its Q value (see q_key)
+        """
+        for key, q_delta in q_deltas.items():
+            self.Q.add(*key, q_delta)
+
+    def save_q_values(self, path: str) -> None:
+        """
+        Saves the Q values to the given directory (see QTable.save)
+        :param path: the directory
+        """
+        self.Q.save(path)
+
+    def load_q_values(self, path: str, mmap: bool = True) -> None:
+        """
+        Replaces the Q values with the ones saved to the given directory (see QTable.load), which are memory mapped
+        unless mmap is False
+        :param path: the directory
+        :param mmap: whether to memory map the saved Q values instead of reading them into memory
+        :raises ValueError: if the Q values were saved for another board size
+        """
+        q_table = QTable.load(path, mmap=mmap)
+        if q_table.actions != len(self.action_table):
+            raise ValueError(
+                f"The Q values in {path} have {q_table.actions} actions (expected {len(self.action_table)})"
+            )
+        self.Q = q_table
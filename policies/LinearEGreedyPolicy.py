@@ -0,0 +1,131 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from policies.Policy import Policy
+from policies.RandomPolicyEffTakeWinner import RandomPolicyEffTakeWinner
+from tak_env.TakAction import TakAction
+from tak_env.TakFeatures import TakFeatures
+from tak_env.TakMoveGenerator import TakMoveGenerator
+from tak_env.TakState import TakState
+from utils.utils import decayed_chain_sums
+
+
+class LinearEGreedyPolicy(Policy):
+    """
+    LinearEGreedyPolicy class.
+    Epsilon greedy SARSA policy like EGreedyPolicy, but with a linear approximation of the Q values instead of a table:
+    Q(s, a) = weights[a] . features(s), with the features of TakFeatures and one row of weights per action of the
+    action table (see TakActionTable). The memory is fixed (actions x features) whatever the number of states seen,
+    states that were never seen get Q values from their features, and the Q values of all the legal actions of a state
+    are a single matrix product.
+
+    The updates are normalized by the squared norm of the features, so alpha is the fraction of the TD error that is
+    corrected for the features of the state, like for EGreedyPolicy (where the features of a state are one-hot).
+    Exploration actions are the ones of RandomPolicyEffTakeWinner (the same as EGreedyPolicy).
+    """
+
+    FEATURES_CACHE_SIZE = 64
+
+    def __init__(
+            self,
+            board_size: int,
+            epsilon: float,
+            alpha: float,
+            gamma: float,
+            place_action_prob: float = 0.5,
+            trace_decay: float = 0.0
+    ):
+        """
+        :param trace_decay: the decay (lambda) of the eligibility traces of update_batch, 0 for one step SARSA
+        """
+        self.move_generator = TakMoveGenerator.get(board_size)
+        self.action_table = self.move_generator.action_table
+        self.features: TakFeatures = TakFeatures.get(board_size)
+        self.epsilon = epsilon
+        self.alpha = alpha
+        self.gamma = gamma
+        self.trace_decay = trace_decay
+        self.weights: np.ndarray = np.zeros((len(self.action_table), self.features.size), dtype=np.float64)
+        self.exploration_policy = RandomPolicyEffTakeWinner(board_size, place_action_prob)
+        # Features of the last states seen (by Zobrist key), since SARSA needs each state for a few consecutive steps
+        self._features_cache: Dict[int, np.ndarray] = {}
+
+    def state_features(self, state: TakState) -> np.ndarray:
+        """
+        Returns the features of the given state (see TakFeatures)
+        :param state: the state
+        :return: array of features
+        """
+        features = self._features_cache.get(state.key)
+        if features is None:
+            if len(self._features_cache) >= LinearEGreedyPolicy.FEATURES_CACHE_SIZE:
+                self._features_cache.clear()
+            features = self._features_cache[state.key] = self.features.extract(state)
+        return features
+
+    def q_values(self, state: TakState, action_ids: np.ndarray) -> np.ndarray:
+        """
+        Returns the Q values of the given actions of the given state
+        :param state: the state
+        :param action_ids: array of the ids of the actions (in the action table)
+        :return: array with the Q value of each action
+        """
+        return self.weights[action_ids] @ self.state_features(state)
+
+    def select_best_action(self, current_state: TakState) -> TakAction:
+        action_ids = np.array(self.move_generator.legal_action_indices(current_state), dtype=np.int64)
+        values = self.q_values(current_state, action_ids)
+        best_action_ids = action_ids[values == values.max()]
+        return self.action_table.action(np.random.choice(best_action_ids))
+
+    def select_action(self, state: TakState, _: List[TakAction] = None) -> TakAction:
+        if np.random.random() < self.epsilon:
+            return self.exploration_policy.select_action(state)
+        else:
+            return self.select_best_action(state)
+
+    def update(self, state, action, reward, next_state, next_action):
+        self.update_batch(
+            self.state_features(state)[None, :],
+            np.array([self.action_table.id_of(action)]),
+            np.array([reward]),
+            self.state_features(next_state)[None, :],
+            np.array([self.action_table.id_of(next_action)])
+        )
+
+    def update_batch(
+            self,
+            state_features: np.ndarray,
+            action_ids: np.ndarray,
+            rewards: np.ndarray,
+            next_state_features: np.ndarray,
+            next_action_ids: np.ndarray,
+            dones: Optional[np.ndarray] = None,
+            trace_decay: Optional[float] = None
+    ) -> None:
+        """
+        Applies the SARSA updates of a batch of steps at once, like EGreedyPolicy.update_batch (with the same TD
+        errors, eligibility traces and chains of steps), given the features of the states instead of their keys
+        :param state_features: matrix with the features of the state of each step (one row per step)
+        :param action_ids: array with the action id of each step
+        :param rewards: array with the reward of each step
+        :param next_state_features: matrix with the features of the state of the next pair of each step
+        :param next_action_ids: array with the action id of the next pair of each step
+        :param dones: array with whether each step ended the game (its next pair is then unused), none if not given
+        :param trace_decay: the decay of the eligibility traces (the one of the policy if not given)
+        """
+        trace_decay = self.trace_decay if trace_decay is None else trace_decay
+        steps = len(rewards)
+        if steps == 0:
+            return
+        dones = np.zeros(steps, dtype=bool) if dones is None else np.asarray(dones, dtype=bool)
+        q_values = np.einsum('ij,ij->i', self.weights[action_ids], state_features)
+        next_q_values = np.einsum('ij,ij->i', self.weights[next_action_ids], next_state_features)
+        td_errors = np.asarray(rewards, dtype=np.float64) + self.gamma * np.where(dones, 0.0, next_q_values) - q_values
+
+        if trace_decay > 0:
+            td_errors = decayed_chain_sums(td_errors, dones, self.gamma * trace_decay)
+
+        norms = np.maximum(np.einsum('ij,ij->i', state_features, state_features), 1e-12)
+        np.add.at(self.weights, action_ids, (self.alpha * td_errors / norms)[:, None] * state_features)
@@ -1,29 +1,271 @@
-from typing import List, Optional
+from typing import List, Optional, Dict, Tuple
 
 import numpy as np
 
 from policies.Policy import Policy
-from tak_env.TakAction import TakAction
+from tak_env.TakAction import TakAction, TakActionMove, TakActionPlace, TakUndoRecord
 from tak_env.TakScorer import TakScorerDefault
 from tak_env.TakState import TakState
+from utils.SearchBudget import SearchBudget
+from utils.TranspositionTable import TranspositionTable
+
+
+class SearchBudgetExhausted(Exception):
+    """
+    Raised inside a search when its time or node budget runs out
+    """
+    pass
 
 
 class MinMaxPolicy(Policy):
 
-    def __init__(self, depth: int):
+    # Folded into the keys of the transposition table for the states searched as maximizing
+    MAXIMIZE_KEY = 0x9E3779B97F4A7C15
+
+    def __init__(
+            self,
+            depth: int,
+            time_budget_ms: Optional[float] = None,
+            node_budget: Optional[int] = None,
+            alpha_beta: bool = False,
+            move_ordering: bool = True,
+            transposition_table: Optional[TranspositionTable] = None,
+    ):
+        """
+        :param depth: the depth to search to (the maximum depth when searching with a budget)
+        :param time_budget_ms: if given, search with iterative deepening until this many milliseconds have passed
+        :param node_budget: if given, search with iterative deepening until this many nodes have been expanded
+        :param alpha_beta: if true, search with alpha-beta pruning (gives the same values to the best actions, so
+        selects the same actions as the full search)
+        :param move_ordering: if true (and searching with alpha-beta), searches wins first, then captures and
+        flattenings, then place actions and then the other moves
+        :param transposition_table: if given (and searching with alpha-beta), stores the results of the searches of
+        each state, so states reached again (by other orders of the same moves, later in the search or in the next
+        searches) are not searched again. Results are only reused for the same depth, so the selected actions are
+        still the ones of the full search; the best move of the other depths is searched first.
+        """
         self.depth = depth
         self.scorer = TakScorerDefault()
+        self.budget = SearchBudget(time_budget_ms, node_budget)
+        self.alpha_beta: bool = alpha_beta
+        self.move_ordering: bool = move_ordering
+        self.transposition_table: Optional[TranspositionTable] = transposition_table
+        self.cutoffs: int = 0
+        self.transposition_cutoffs: int = 0
+        # Completed depth, iterations (completed depths), nodes, cutoffs (also the ones from the transposition table)
+        # and time (ms) of the last search
+        self.last_search_stats: Dict[str, float] = {}
 
     def select_action(self, state: TakState, possible_actions: List[TakAction]) -> TakAction:
         """
         Selects an action from the given state using the MinMax algorithm.
+        With a time or node budget, searches with iterative deepening (depth 0, 1, ... up to self.depth) and returns
+        the best action of the deepest search that completed before the budget ran out.
         :param state: the state to select an action from
         :param possible_actions: the possible actions to select from
         :return: the selected action
         """
+        self.budget.start()
+        self.cutoffs, self.transposition_cutoffs = 0, 0
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        if not self.budget.is_limited():
+            possible_action_values = self._evaluate_actions(state, possible_actions, self.depth)
+            self._set_search_stats(self.depth, 1)
+            return MinMaxPolicy.argmax_action(possible_actions, possible_action_values)
+
+        best_action, completed_depth = None, None
+        for depth in range(self.depth + 1):
+            try:
+                possible_action_values = self._evaluate_actions(state, possible_actions, depth)
+            except SearchBudgetExhausted:
+                break
+            best_action, completed_depth = MinMaxPolicy.argmax_action(possible_actions, possible_action_values), depth
+            if self.budget.exhausted():
+                break
+        self._set_search_stats(completed_depth, 0 if completed_depth is None else completed_depth + 1)
+        return best_action if best_action is not None else np.random.choice(possible_actions)
+
+    def _set_search_stats(self, depth: Optional[int], iterations: int) -> None:
+        self.last_search_stats = {
+            'depth': depth,
+            'iterations': iterations,
+            'nodes': self.budget.nodes,
+            'cutoffs': self.cutoffs,
+            'transposition_cutoffs': self.transposition_cutoffs,
+            'time_ms': self.budget.elapsed_ms(),
+        }
+
+    def _evaluate_actions(self, state: TakState, actions: List[TakAction], depth: int) -> List[float]:
+        """
+        Evaluates each of the given actions from the given state, with the full search or with alpha-beta.
+        With alpha-beta, the values of the actions that are not the best may only be upper bounds.
+        The search makes and undoes the actions on a copy of the given state (see TakAction.make).
+        :param state: the state to evaluate the actions from
+        :param actions: the actions to evaluate
+        :param depth: the depth to expand to
+        :return: the value of each action
+        """
+        state = state.copy()
+        if not self.alpha_beta:
+            return [self._evaluate_action_max(state, a, depth) for a in actions]
+
+        values: List[float] = [-np.inf] * len(actions)
+        best_value = -np.inf
+        state_value = None
+        for index, action, next_terminal in self._ordered_actions(state, actions):
+            if depth == 0 or next_terminal:
+                if state_value is None:
+                    state_value = self.state_evaluator(state)
+                values[index] = state_value
+            else:
+                # Just below the best value, so the actions tied with the best one get their exact value too
+                alpha = np.nextafter(best_value, -np.inf)
+                record = action.make(state)
+                values[index] = self._alpha_beta(state, depth, alpha, np.inf, True)
+                record.undo(state)
+            best_value = max(best_value, values[index])
+        return values
+
+    def _alpha_beta(
+            self,
+            next_state: TakState,
+            depth: int,
+            alpha: float,
+            beta: float,
+            maximize: bool
+    ) -> float:
+        """
+        Evaluates the value of the action that took a state to the given next state (made on it), like
+        _evaluate_action_max (if maximize) or _evaluate_action_min, but skipping the actions that can not change it.
+        Fail-soft: the value is exact if it is between alpha and beta, otherwise it is a bound past them.
+        Actions from the next state are made and undone on it, so it is the same state when this returns.
+        (The actions that lead to terminal states, or with depth 0, have the value of the state they are taken from,
+        which the caller evaluates.)
+        :param next_state: the state the action leads to (not terminal)
+        :param depth: the depth to expand to (at least 1)
+        :param alpha: the value the maximizing side already has
+        :param beta: the value the minimizing side already has
+        :param maximize: whether to maximize over the actions from the next state
+        :return: the value of the action
+        """
+        if depth == 1:
+            # All the actions from the next state are leaves, which evaluate the next state
+            return self.state_evaluator(next_state)
 
-        possible_action_values = [self._evaluate_action_max(state, a, self.depth) for a in possible_actions]
-        return MinMaxPolicy.argmax_action(possible_actions, possible_action_values)
+        # From here the value only depends on the next state, the depth and whether it maximizes
+        table = self.transposition_table
+        table_key, best_move = 0, -1
+        if table is not None:
+            table_key = next_state.key ^ (MinMaxPolicy.MAXIMIZE_KEY if maximize else 0)
+            entry = table.get(table_key)
+            if entry is not None:
+                entry_depth, entry_value, entry_bound, best_move = entry
+                if entry_depth == depth and (
+                        entry_bound == TranspositionTable.EXACT or
+                        (entry_bound == TranspositionTable.LOWER_BOUND and entry_value >= beta) or
+                        (entry_bound == TranspositionTable.UPPER_BOUND and entry_value <= alpha)
+                ):
+                    self.transposition_cutoffs += 1
+                    return entry_value
+
+        initial_alpha, initial_beta = alpha, beta
+        value = -np.inf if maximize else np.inf
+        next_state_value = None
+        next_actions = TakAction.get_possible_actions(next_state)
+        for index, action, child_terminal in self._ordered_actions(next_state, next_actions, best_move):
+            if child_terminal:
+                if next_state_value is None:
+                    next_state_value = self.state_evaluator(next_state)
+                child_value = next_state_value
+            else:
+                record = action.make(next_state)
+                child_value = self._alpha_beta(next_state, depth - 1, alpha, beta, not maximize)
+                record.undo(next_state)
+            if (maximize and child_value > value) or (not maximize and child_value < value):
+                value, best_move = child_value, index
+            if maximize:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                self.cutoffs += 1
+                break
+
+        if table is not None:
+            if value <= initial_alpha:
+                bound = TranspositionTable.UPPER_BOUND
+            elif value >= initial_beta:
+                bound = TranspositionTable.LOWER_BOUND
+            else:
+                bound = TranspositionTable.EXACT
+            table.put(table_key, depth, value, bound, best_move)
+        return value
+
+    def _ordered_actions(
+            self,
+            state: TakState,
+            actions: List[TakAction],
+            first_index: int = -1
+    ) -> List[Tuple[int, TakAction, bool]]:
+        """
+        Makes (and undoes) each of the given actions on the given state, in the order to search them
+        :param state: the state to take the actions from
+        :param actions: the actions to take
+        :param first_index: the index of the action to search first (-1 if none)
+        :return: the index of each action, the action and whether the state it leads to is terminal
+        """
+        children = []
+        priorities = []
+        for index, action in enumerate(actions):
+            record = self._make(state, action)
+            next_terminal, info = state.is_terminal()
+            record.undo(state)
+            children.append((index, action, next_terminal))
+            if index == first_index:
+                priorities.append(-1)
+            elif self.move_ordering:
+                priorities.append(MinMaxPolicy.action_priority(state, action, next_terminal, info))
+            else:
+                priorities.append(0)
+        if not self.move_ordering and first_index < 0:
+            return children
+        return [children[i] for i in np.argsort(priorities, kind='stable')]
+
+    @staticmethod
+    def action_priority(state: TakState, action: TakAction, next_terminal: bool, next_info: Dict) -> int:
+        """
+        Gets the search priority of taking the given action from the given state (lower is searched first):
+        wins, then captures and flattenings, then place actions, then the other moves
+        :param state: the state the action is taken from
+        :param action: the action
+        :param next_terminal: whether the state the action leads to is terminal
+        :param next_info: the terminal info of the state the action leads to
+        :return: the priority of the action
+        """
+        if next_terminal and next_info.get('winning_player') == state.current_player:
+            return 0
+        if isinstance(action, TakActionPlace):
+            return 2
+        if isinstance(action, TakActionMove):
+            drop_file, drop_rank = action.position
+            delta_file, delta_rank = action.direction.get_delta()
+            for _ in action.drop_order:
+                drop_file, drop_rank = drop_file + delta_file, drop_rank + delta_rank
+                top_piece = state.board.top_piece(drop_file, drop_rank)
+                if top_piece is not None and (top_piece.player() != state.current_player or top_piece.is_standing()):
+                    return 1
+        return 3
+
+    def _make(self, state: TakState, action: TakAction) -> TakUndoRecord:
+        """
+        Makes the given action on the given state, counting the new node against the search budget
+        :raises SearchBudgetExhausted: if the budget has run out
+        """
+        if self.budget.exhausted():
+            raise SearchBudgetExhausted()
+        self.budget.nodes += 1
+        return action.make(state)
 
     @staticmethod
     def argmax_action(actions: List[TakAction], values: List[float]) -> TakAction:
@@ -34,35 +276,41 @@ class MinMaxPolicy(Policy):
     def _evaluate_action_max(self, state: TakState, action: TakAction, depth: Optional[int] = None) -> float:
         """
         Evaluates the value of taking the given action from the given state
+        (makes and undoes the actions on the given state, so it is the same state when this returns)
         :param state: the current state to expand actions from
         :param action: the action to take
         :param depth: the depth to expand to
         :return: the value of the action
         """
-        next_state = action.take(state, mutate=False)
-        if depth == 0 or next_state.is_terminal()[0]:
+        record = self._make(state, action)
+        if depth == 0 or state.is_terminal()[0]:
+            record.undo(state)
             return self.state_evaluator(state)
 
         next_depth = (self.depth if depth is None else depth) - 1
-        next_actions = TakAction.get_possible_actions(next_state)
-        next_action_values = [self._evaluate_action_min(next_state, a, next_depth) for a in next_actions]
+        next_actions = TakAction.get_possible_actions(state)
+        next_action_values = [self._evaluate_action_min(state, a, next_depth) for a in next_actions]
+        record.undo(state)
         return np.max(np.array(next_action_values))
 
     def _evaluate_action_min(self, state: TakState, action: TakAction, depth: Optional[int] = None) -> float:
         """
         Evaluates the value of taking the given action from the given state
+        (makes and undoes the actions on the given state, so it is the same state when this returns)
         :param state: the current state to expand actions from
         :param action: the action to take
         :param depth: the depth to expand to
         :return: the value of the action
         """
-        next_state = action.take(state, mutate=False)
-        if depth == 0 or next_state.is_terminal()[0]:
+        record = self._make(state, action)
+        if depth == 0 or state.is_terminal()[0]:
+            record.undo(state)
             return self.state_evaluator(state)
 
         next_depth = (self.depth if depth is None else depth) - 1
-        next_actions = TakAction.get_possible_actions(next_state)
-        next_action_values = [self._evaluate_action_max(next_state, a, next_depth) for a in next_actions]
+        next_actions = TakAction.get_possible_actions(state)
+        next_action_values = [self._evaluate_action_max(state, a, next_depth) for a in next_actions]
+        record.undo(state)
         return np.min(np.array(next_action_values))
 
     def state_evaluator(self, state: TakState) -> float:
@@ -4,18 +4,14 @@ import numpy as np
 
 from policies.Policy import Policy
 from tak_env.TakAction import TakAction, TakActionPlace
-from tak_env.TakPlayer import TakPlayer
+from tak_env.TakMoveGenerator import TakMoveGenerator
 from tak_env.TakState import TakState
 
 
 class RandomPolicyEff(Policy):
 
     def __init__(self, board_size: int):
-        self.first_actions = {
-            TakPlayer.WHITE: TakAction.get_first_actions(board_size, TakPlayer.WHITE),
-            TakPlayer.BLACK: TakAction.get_first_actions(board_size, TakPlayer.BLACK)
-        }
-        self.all_actions = TakAction.get_all_actions(board_size)
+        self.move_generator = TakMoveGenerator.get(board_size)
 
     def select_action(self, state: TakState, _: List[TakAction] = None) -> TakAction:
         actions, weights = self.get_actions_and_weights(state)
@@ -26,20 +22,15 @@ class RandomPolicyEff(Policy):
             current_state: TakState,
             place_action_prob: float = 0.5
     ) -> Tuple[List[TakAction], np.ndarray]:
-        actions = self.all_actions if not current_state.first_action() \
-            else self.first_actions[current_state.current_player]
+        actions = self.move_generator.legal_actions(current_state)
 
         weights = np.zeros(len(actions))
         valid_place_actions, valid_move_actions = [], []
         for i, action in enumerate(actions):
-            # is valid?
-            if action.is_valid(current_state):
-                if isinstance(action, TakActionPlace):
-                    valid_place_actions.append(i)
-                else:
-                    valid_move_actions.append(i)
+            if isinstance(action, TakActionPlace):
+                valid_place_actions.append(i)
             else:
-                weights[i] = 0
+                valid_move_actions.append(i)
 
         if len(valid_move_actions) == 0:
             place_action_prob = 1.0
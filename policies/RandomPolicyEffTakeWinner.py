@@ -4,18 +4,14 @@ import numpy as np
 
 from policies.Policy import Policy
 from tak_env.TakAction import TakAction, TakActionPlace
-from tak_env.TakPlayer import TakPlayer
+from tak_env.TakMoveGenerator import TakMoveGenerator
 from tak_env.TakState import TakState
 
 
 class RandomPolicyEffTakeWinner(Policy):
 
     def __init__(self, board_size: int, place_action_prob: float = 0.5):
-        self.first_actions = {
-            TakPlayer.WHITE: TakAction.get_first_actions(board_size, TakPlayer.WHITE),
-            TakPlayer.BLACK: TakAction.get_first_actions(board_size, TakPlayer.BLACK)
-        }
-        self.all_actions = TakAction.get_all_actions(board_size)
+        self.move_generator = TakMoveGenerator.get(board_size)
         self.place_action_prob = place_action_prob
 
     def select_action(self, state: TakState, _: List[TakAction] = None) -> TakAction:
@@ -27,30 +23,30 @@ class RandomPolicyEffTakeWinner(Policy):
             current_state: TakState,
     ) -> Tuple[List[TakAction], np.ndarray]:
         place_action_prob = self.place_action_prob
-        actions = self.all_actions if not current_state.first_action() \
-            else self.first_actions[current_state.current_player]
+        actions = self.move_generator.legal_actions(current_state)
 
+        # Private copy for the lookahead, the given state may be shared (e.g. the leaf of the rollouts of the threads
+        # of TakThreadRolloutExecutor)
+        lookahead_state = current_state.copy()
         weights = np.zeros(len(actions))
         valid_place_actions, valid_move_actions = [], []
         winning_actions = []
         losing_actions = []
         for i, action in enumerate(actions):
-            # is valid?
-            if action.is_valid(current_state):
-                if isinstance(action, TakActionPlace):
-                    valid_place_actions.append(i)
-                else:
-                    valid_move_actions.append(i)
-                # is winning?
-                next_state = action.take(current_state, mutate=False)
-                if next_state.is_terminal():
-                    if next_state.winning_player() == current_state.current_player:
-                        winning_actions.append(action)
-                    else:
-                        losing_actions.append(action)
-                        weights[i] = 0
+            if isinstance(action, TakActionPlace):
+                valid_place_actions.append(i)
             else:
-                weights[i] = 0
+                valid_move_actions.append(i)
+            # is winning? (made and undone on the copy)
+            record = action.make(lookahead_state)
+            done, info = lookahead_state.is_terminal()
+            record.undo(lookahead_state)
+            if done:
+                if info['winning_player'] == current_state.current_player:
+                    winning_actions.append(action)
+                else:
+                    losing_actions.append(action)
+                    weights[i] = 0
 
         if len(winning_actions) > 0:
             return winning_actions, np.ones(len(winning_actions)) / len(winning_actions)
@@ -1,6 +1,7 @@
 from enum import Enum
-from typing import Tuple, List, Iterable, Dict
+from typing import Tuple, List, Iterable, Dict, Optional
 
+import numpy as np
 from more_itertools import flatten
 
 from tak_env.TakBoard import TakBoard
@@ -12,6 +13,8 @@ from utils.utils import ordered_partitions
 
 class TakAction(object):
 
+    __slots__ = ('position', 'action_id')
+
     # cache_possible_move_actions: Dict[TakState, List['TakAction']] = {}
     # cache_possible_place_actions: Dict[TakState, List['TakAction']] = {}
 
@@ -22,12 +25,41 @@ class TakAction(object):
 
     def __init__(self, position: Tuple[int, int]):
         self.position: Tuple[int, int] = position
+        # Id in the TakActionTable of the board size, set on the actions of the table
+        self.action_id: Optional[int] = None
 
     def is_valid(self, state: TakState) -> bool:
         raise NotImplementedError("Method 'is_valid' not implemented")
 
     def take(self, state: TakState, mutate: bool = False) -> TakState:
-        raise NotImplementedError("Method 'take' not implemented")
+        """
+        Takes this action on the given state and returns the state resulting from it.
+        Assumes the action is valid.
+
+        :param state: The state to take the action on
+        :param mutate: If true, mutates the state to take the action on
+        :return: The resulting state
+        """
+        next_state = state if mutate else state.copy()
+        self.make(next_state)
+        return next_state
+
+    def make(self, state: TakState) -> 'TakUndoRecord':
+        """
+        Takes this action on the given state in place (without copying it), and returns the record to undo it with.
+        Assumes the action is valid.
+        :param state: The state to take the action on
+        :return: TakUndoRecord
+        """
+        raise NotImplementedError("Method 'make' not implemented")
+
+    def unmake(self, state: TakState, record: 'TakUndoRecord') -> None:
+        """
+        Restores the state this action was made on (see make and TakUndoRecord.undo)
+        :param state: The state the action was made on, with no other changes made after it
+        :param record: the record returned by make
+        """
+        raise NotImplementedError("Method 'unmake' not implemented")
 
     def __eq__(self, other):
         raise NotImplementedError("Method '__eq__' not implemented")
@@ -134,6 +166,17 @@ class TakAction(object):
 
     @staticmethod
     def get_all_actions(board_size: int) -> List['TakAction']:
+        """
+        Returns all the actions for the given board size (the actions of its TakActionTable, in id order)
+        """
+        return list(TakActionTable.get(board_size).actions)
+
+    @staticmethod
+    def build_all_actions(board_size: int) -> List['TakAction']:
+        """
+        Builds (new objects for) all the actions for the given board size: the place actions of each piece of white
+        and then of black (for each position), and then all the move actions
+        """
         player = TakPlayer.WHITE
         w_flat_place = TakActionPlace.get_all_place_actions(board_size, TakPiece.get_flat_piece_for_player(player))
         w_stand_place = TakActionPlace.get_all_place_actions(board_size, TakPiece.get_standing_piece_for_player(player))
@@ -149,14 +192,23 @@ class TakAction(object):
 
     @staticmethod
     def get_first_actions(board_size: int, player: TakPlayer) -> List['TakAction']:
-        return TakActionPlace.get_all_place_actions(board_size, TakPiece.get_flat_piece_for_player(player.other()))
+        table = TakActionTable.get(board_size)
+        piece = TakPiece.get_flat_piece_for_player(player.other())
+        return [table.place_action(position, piece) for position in TakBoard.get_all_positions(board_size)]
 
 
 class TakActionPlace(TakAction):
 
+    __slots__ = ('piece', '_hash')
+
     def __init__(self, position, piece: TakPiece):
         super().__init__(position)
         self.piece = piece
+        self._hash: int = hash((position, piece))
+
+    def __reduce__(self):
+        # Rebuilt from the arguments, since the cached hash of the enums is not the same in other processes
+        return TakActionPlace, (self.position, self.piece)
 
     def is_valid(self, state: TakState) -> bool:
         place_at_file, place_at_rank = self.position
@@ -190,26 +242,31 @@ class TakActionPlace(TakAction):
         # Place action is valid
         return True
 
-    def take(self, state: TakState, mutate: bool = False) -> TakState:
-        """
-        Takes this action on the given state and returns the state resulting from it.
-        Assumes the action is valid.
-
-        :param state: The state to take the action on
-        :param mutate: If true, mutates the state to take the action on
-        :return: The resulting state
-        """
-        next_state: TakState = state if mutate else state.copy()
-        next_state.board.place_piece(self.position, self.piece)
+    def make(self, state: TakState) -> 'TakUndoRecord':
+        board_key = state.board.key
+        state.board.place_piece(self.position, self.piece)
+        state.update_roads((self.position,), board_key)
 
         if self.piece.is_capstone():
-            next_state.remove_capstone_for_player(self.piece.player())
+            state.remove_capstone_for_player(self.piece.player())
         else:
-            next_state.remove_piece_for_player(self.piece.player())
+            state.remove_piece_for_player(self.piece.player())
 
-        next_state.current_player = next_state.current_player.other()
+        state.current_player = state.current_player.other()
 
-        return next_state
+        return TakUndoRecord(self)
+
+    def unmake(self, state: TakState, record: 'TakUndoRecord') -> None:
+        state.current_player = state.current_player.other()
+
+        if self.piece.is_capstone():
+            state.add_capstone_for_player(self.piece.player())
+        else:
+            state.add_piece_for_player(self.piece.player())
+
+        board_key = state.board.key
+        state.board.pick_up(self.position, 1)
+        state.update_roads((self.position,), board_key)
 
     def __str__(self) -> str:
         """
@@ -236,13 +293,14 @@ class TakActionPlace(TakAction):
             return []
         if not state.current_player_has_pieces_available():
             return []
-        return [TakActionPlace(pos, piece) for pos in state.board.get_empty_positions()]
+        table = TakActionTable.get(state.board_size)
+        return [table.place_action(pos, piece) for pos in state.board.get_empty_positions()]
 
     def __eq__(self, other):
         return isinstance(other, TakActionPlace) and self.position == other.position and self.piece == other.piece
 
     def __hash__(self):
-        return hash((self.position, self.piece))
+        return self._hash
 
     @staticmethod
     def get_all_place_actions(board_size: int, piece: TakPiece) -> List['TakAction']:
@@ -279,6 +337,12 @@ class TakActionMoveDir(Enum):
 
 class TakActionMove(TakAction):
 
+    __slots__ = ('direction', 'drop_order', '_hash')
+
+    # Memoized drop orders, by pick up count and by (pick up count, squares to the edge of the board)
+    _drop_orders: Dict[int, Tuple[Tuple[int, ...], ...]] = {}
+    _drop_orders_within: Dict[Tuple[int, int], Tuple[Tuple[int, ...], ...]] = {}
+
     def __init__(self, position: Tuple[int, int], direction: TakActionMoveDir, drop_order: Tuple[int, ...]):
         """
         TODO: docs
@@ -286,6 +350,11 @@ class TakActionMove(TakAction):
         super().__init__(position)
         self.direction: TakActionMoveDir = direction
         self.drop_order: Tuple[int, ...] = drop_order
+        self._hash: int = hash((position, direction, drop_order))
+
+    def __reduce__(self):
+        # Rebuilt from the arguments, like TakActionPlace (the cached hash is not pickled)
+        return TakActionMove, (self.position, self.direction, self.drop_order)
 
     def is_valid(self, state: TakState) -> bool:
         from_file, from_rank = self.position
@@ -295,7 +364,7 @@ class TakActionMove(TakAction):
             return False
 
         # Can only move if there is enough pieces to move from the position
-        if state.board.get_stack(from_file, from_rank).height() < self.pick_up_count():
+        if state.board.position_height(from_file, from_rank) < self.pick_up_count():
             return False
 
         # Can only move if the position is controlled by the current player
@@ -315,16 +384,16 @@ class TakActionMove(TakAction):
             return False
 
         # Can only move if for each drop position it: is empty, has a flat stone, or flattening a standing piece
-        can_flatten = self.drop_order[-1] == 1 and state.board.get_stack(from_file, from_rank).top().is_capstone()
+        can_flatten = self.drop_order[-1] == 1 and state.board.top_piece(from_file, from_rank).is_capstone()
         drop_file, drop_rank = from_file, from_rank
         delta_file, delta_rank = self.direction.get_delta()
-        for i, drop_n in enumerate(self.drop_order):
-            drop_file, drop_rank = drop_file + delta_file * drop_n, drop_rank + delta_rank * drop_n
+        # Each drop is on the next position in the direction (whatever the number of pieces dropped)
+        for i in range(len(self.drop_order)):
+            drop_file, drop_rank = drop_file + delta_file, drop_rank + delta_rank
             if not state.board.is_position_in_board((drop_file, drop_rank)):
                 return False
-            position_stack = state.board.get_stack(drop_file, drop_rank)
-            if not position_stack.is_empty():
-                top_piece = position_stack.top()
+            top_piece = state.board.top_piece(drop_file, drop_rank)
+            if top_piece is not None:
                 # Cannot flatten if not the last drop in the move or if the piece being dropped is not a capstone
                 if top_piece.is_standing() and (i + 1 != len(self.drop_order) or not can_flatten):
                     return False
@@ -346,38 +415,45 @@ class TakActionMove(TakAction):
         delta_x, delta_y = self.direction.get_delta(len(self.drop_order))
         return from_x + delta_x, from_y + delta_y
 
-    def take(self, state: TakState, mutate: bool = False) -> TakState:
-        """
-        Takes this action on the given state and returns the state resulting from it.
-        Assumes the action is valid.
-
-        :param state: The state to take the action on
-        :param mutate: If true, mutates the state to take the action on
-        :return: The resulting state
-        """
-        next_state = state if mutate else state.copy()
-
-        from_x, from_y = self.position
+    def make(self, state: TakState) -> 'TakUndoRecord':
+        board_key = state.board.key
+        # Whether the last drop flattens a standing piece (only a capstone can be dropped on one)
+        ending_file, ending_rank = self.get_ending_position()
+        ending_top_piece = state.board.top_piece(ending_file, ending_rank)
+        flattened = ending_top_piece is not None and ending_top_piece.is_standing()
 
-        # Pick up the pieces to move
-        from_stack = next_state.board.get_stack(from_x, from_y)
-        picked_up_pieces = []
-        for i in range(sum(self.drop_order)):
-            picked_up_pieces.append(from_stack.pop())
+        # Pick up the pieces to move (ordered from the bottom of the stack to the top)
+        picked_up_pieces = state.board.pick_up(self.position, self.pick_up_count())
 
+        drop_positions = []
         drop_x, drop_y = self.position
         delta_x, delta_y = self.direction.get_delta()
+        dropped = 0
         for drop_n in self.drop_order:
             drop_x, drop_y = drop_x + delta_x, drop_y + delta_y
-            drop_stack = next_state.board.get_stack(drop_x, drop_y)
-            for _ in range(drop_n):
-                # The push method will automatically flatten the piece if it is standing
-                # Since we assume the move is valid, no need to check the types pieces
-                drop_stack.push(picked_up_pieces.pop())
+            # The board will automatically flatten the piece if it is standing
+            # Since we assume the move is valid, no need to check the types pieces
+            state.board.drop((drop_x, drop_y), picked_up_pieces[dropped:dropped + drop_n])
+            drop_positions.append((drop_x, drop_y))
+            dropped += drop_n
+        state.update_roads([self.position] + drop_positions, board_key)
 
-        next_state.current_player = next_state.current_player.other()
+        state.current_player = state.current_player.other()
 
-        return next_state
+        return TakUndoRecord(self, drop_positions, flattened)
+
+    def unmake(self, state: TakState, record: 'TakUndoRecord') -> None:
+        state.current_player = state.current_player.other()
+        board_key = state.board.key
+
+        # Pick the dropped pieces back up, from the last drop to the first
+        picked_up_pieces = []
+        for position, drop_n in zip(reversed(record.drop_positions), reversed(self.drop_order)):
+            picked_up_pieces = state.board.pick_up(position, drop_n) + picked_up_pieces
+            if record.flattened and position == record.drop_positions[-1]:
+                state.board.unflatten(position)
+        state.board.drop(self.position, picked_up_pieces)
+        state.update_roads([self.position] + record.drop_positions, board_key)
 
     def pick_up_count(self) -> int:
         """
@@ -418,7 +494,7 @@ class TakActionMove(TakAction):
         Returns the hash of this action
         :return: The hash of this action
         """
-        return hash((self.position, self.direction, self.drop_order))
+        return self._hash
 
     @staticmethod
     def get_possible_move_actions(state: TakState, player: TakPlayer) -> List['TakAction']:
@@ -447,9 +523,12 @@ class TakActionMove(TakAction):
         if max_pickup_size == 0:
             return []
 
+        table = TakActionTable.get(state.board_size)
+
         def possible_actions_for_direction(direction: TakActionMoveDir) -> List[TakActionMove]:
-            drop_orders = TakActionMove.get_possible_drop_orders(max_pickup_size)
-            actions = [TakActionMove(from_position, direction, drop_order) for drop_order in drop_orders]
+            distance = TakActionMove.get_distance_to_edge(state.board_size, from_position, direction)
+            drop_orders = TakActionMove.get_drop_orders_within(max_pickup_size, distance)
+            actions = [table.move_action(from_position, direction, drop_order) for drop_order in drop_orders]
             return [action for action in actions if action.is_valid(state)]
 
         up_actions = possible_actions_for_direction(TakActionMoveDir.UP)
@@ -462,12 +541,61 @@ class TakActionMove(TakAction):
     @staticmethod
     def get_possible_drop_orders(max_pickup_size: int) -> Iterable[Tuple[int, ...]]:
         """
-        Returns a list of all possible drop orders that can be performed in this state.
-        #ODO: move to TakActionMove
-        :param max_pickup_size:
-        :return:
+        Returns all the possible drop orders for the given number of pieces picked up (the ordered partitions of the
+        number). They are computed once for each number and memoized.
+        :param max_pickup_size: the number of pieces picked up
+        :return: tuple of drop orders
+        """
+        drop_orders = TakActionMove._drop_orders.get(max_pickup_size)
+        if drop_orders is None:
+            drop_orders = tuple(set(ordered_partitions(max_pickup_size)))
+            TakActionMove._drop_orders[max_pickup_size] = drop_orders
+        return drop_orders
+
+    @staticmethod
+    def get_drop_orders_within(pick_up_count: int, distance: int) -> Tuple[Tuple[int, ...], ...]:
+        """
+        Returns the possible drop orders for the given number of pieces picked up that drop on at most the given
+        number of squares (the ones that fit before the edge of the board), memoized
+        :param pick_up_count: the number of pieces picked up
+        :param distance: the number of squares from the position to the edge of the board
+        :return: tuple of drop orders, in the order of get_possible_drop_orders
+        """
+        key = (pick_up_count, distance)
+        drop_orders = TakActionMove._drop_orders_within.get(key)
+        if drop_orders is None:
+            drop_orders = tuple(
+                drop_order for drop_order in TakActionMove.get_possible_drop_orders(pick_up_count)
+                if len(drop_order) <= distance
+            )
+            TakActionMove._drop_orders_within[key] = drop_orders
+        return drop_orders
+
+    @staticmethod
+    def precompute_drop_orders(board_size: int) -> None:
+        """
+        Computes the drop orders of every pick up count and distance to the edge of the given board size, so move
+        generation does not enumerate partitions
+        :param board_size: the size of the board
         """
-        return set(ordered_partitions(max_pickup_size))
+        for pick_up_count in range(1, board_size + 1):
+            for distance in range(board_size):
+                TakActionMove.get_drop_orders_within(pick_up_count, distance)
+
+    @staticmethod
+    def get_distance_to_edge(board_size: int, position: Tuple[int, int], direction: TakActionMoveDir) -> int:
+        """
+        Returns the number of squares from the given position (excluded) to the edge of the board in the given direction
+        :param board_size: the size of the board
+        :param position: the position
+        :param direction: the direction
+        :return: the number of squares
+        """
+        file, rank = position
+        delta_file, delta_rank = direction.get_delta()
+        if delta_file != 0:
+            return board_size - 1 - file if delta_file > 0 else file
+        return board_size - 1 - rank if delta_rank > 0 else rank
 
     @staticmethod
     def get_all_move_actions(board_size: int) -> List['TakAction']:
@@ -481,3 +609,130 @@ class TakActionMove(TakAction):
                     actions += [TakActionMove(pos, direction, drop_order) for drop_order in drop_orders]
         return actions
 
+
+class TakUndoRecord(object):
+    """
+    TakUndoRecord class.
+    What making an action (TakAction.make) changed on a state, so undo can restore the state exactly: the action
+    (which gives the piece placed and the pieces given back to the reserve of the player), the positions the pieces of
+    a move were dropped on, and whether the last drop of a move flattened a standing piece.
+    """
+
+    __slots__ = ('action', 'drop_positions', 'flattened')
+
+    def __init__(self, action: TakAction, drop_positions: Tuple = (), flattened: bool = False):
+        self.action: TakAction = action
+        self.drop_positions: List[Tuple[int, int]] = drop_positions
+        self.flattened: bool = flattened
+
+    def undo(self, state: TakState) -> None:
+        """
+        Restores the state the action was made on. Records have to be undone in the reverse order they were made in.
+        :param state: the state the action was made on
+        """
+        self.action.unmake(state, self)
+
+
+class TakActionTable(object):
+    """
+    TakActionTable class.
+    Immutable table of all the actions of a board size (see TakAction.build_all_actions): the id of an action is its
+    index in the table. The actions of the table are shared by everything that gets actions from it (they are
+    interned: the same object for the same id, which knows its id), so Q-tables, MCTS edges and NumPy policies can
+    keep action ids instead of action objects.
+
+    Alongside the actions, the table keeps NumPy arrays (indexed by action id) describing them, for batched code:
+    whether it is a place action, its square (file * board_size + rank), the value of the piece placed (0 for moves),
+    the value of the direction moved (0 for places) and the number of pieces picked up (0 for places).
+    """
+
+    _instances: Dict[int, 'TakActionTable'] = {}
+
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        TakActionMove.precompute_drop_orders(board_size)
+        self.actions: Tuple[TakAction, ...] = tuple(TakAction.build_all_actions(board_size))
+        self.ids: Dict[TakAction, int] = {}
+        self._place_ids: Dict[Tuple[Tuple[int, int], TakPiece], int] = {}
+        self._move_ids: Dict[Tuple[Tuple[int, int], TakActionMoveDir, Tuple[int, ...]], int] = {}
+        for action_id, action in enumerate(self.actions):
+            action.action_id = action_id
+            self.ids[action] = action_id
+            if isinstance(action, TakActionPlace):
+                self._place_ids[(action.position, action.piece)] = action_id
+            else:
+                self._move_ids[(action.position, action.direction, action.drop_order)] = action_id
+
+        self.is_place = np.array([isinstance(action, TakActionPlace) for action in self.actions], dtype=bool)
+        self.squares = np.array(
+            [action.position[0] * board_size + action.position[1] for action in self.actions], dtype=np.int64
+        )
+        self.pieces = np.array(
+            [action.piece.value if isinstance(action, TakActionPlace) else 0 for action in self.actions], dtype=np.int8
+        )
+        self.directions = np.array(
+            [action.direction.value if isinstance(action, TakActionMove) else 0 for action in self.actions],
+            dtype=np.int8
+        )
+        self.pick_up_counts = np.array(
+            [action.pick_up_count() if isinstance(action, TakActionMove) else 0 for action in self.actions],
+            dtype=np.int8
+        )
+        for array in [self.is_place, self.squares, self.pieces, self.directions, self.pick_up_counts]:
+            array.flags.writeable = False
+
+    @classmethod
+    def get(cls, board_size: int) -> 'TakActionTable':
+        """
+        Returns the (shared) action table for the given board size
+        :param board_size: the size of the board
+        :return: TakActionTable
+        """
+        if board_size not in cls._instances:
+            cls._instances[board_size] = TakActionTable(board_size)
+        return cls._instances[board_size]
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def action(self, action_id: int) -> TakAction:
+        return self.actions[action_id]
+
+    def id_of(self, action: TakAction) -> int:
+        """
+        Returns the id of the given action (which does not need to be the object of the table)
+        :raises KeyError: if the action is not an action of the board size
+        """
+        action_id = action.action_id
+        if action_id is not None and action_id < len(self.actions) and self.actions[action_id] is action:
+            return action_id
+        return self.ids[action]
+
+    def place_action(self, position: Tuple[int, int], piece: TakPiece) -> 'TakActionPlace':
+        """
+        Returns the (interned) action placing the given piece on the given position
+        """
+        return self.actions[self._place_ids[(position, piece)]]
+
+    def move_action(
+            self,
+            position: Tuple[int, int],
+            direction: TakActionMoveDir,
+            drop_order: Tuple[int, ...]
+    ) -> 'TakActionMove':
+        """
+        Returns the (interned) action moving from the given position in the given direction with the given drop order
+        """
+        return self.actions[self._move_ids[(position, direction, drop_order)]]
+
+    def is_valid(self, state: TakState, action_id: int) -> bool:
+        """
+        Returns whether the action with the given id is valid on the given state
+        """
+        return self.actions[action_id].is_valid(state)
+
+    def take(self, state: TakState, action_id: int, mutate: bool = False) -> TakState:
+        """
+        Takes the action with the given id on the given state (see TakAction.take)
+        """
+        return self.actions[action_id].take(state, mutate=mutate)
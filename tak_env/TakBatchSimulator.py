@@ -0,0 +1,442 @@
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+
+from tak_env.TakAction import TakActionMove, TakActionMoveDir, TakActionTable
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+
+
+class TakStateBatch(object):
+    """
+    TakStateBatch class.
+    A batch of games held as NumPy arrays, indexed by game first:
+        - stacks[game, square, depth]: the value of the piece (see TakPiece) at each depth of each stack, from the
+          bottom (0 for no piece), with squares in get_all_positions order (file * board_size + rank)
+        - heights[game, square]: the height of each stack
+        - pieces[game, player] and capstones[game, player]: the pieces and capstone available to each player (0 for
+          white, 1 for black)
+        - players[game]: the player to move (1 for white, -1 for black, like the sign of the values of their pieces)
+        - done[game] and winners[game]: whether the game is over, and its winner (1, -1 or 0 for a tie or no winner yet)
+    """
+
+    def __init__(self, board_size: int, games: int, max_height: int):
+        self.board_size: int = board_size
+        self.stacks: np.ndarray = np.zeros((games, board_size * board_size, max_height), dtype=np.int8)
+        self.heights: np.ndarray = np.zeros((games, board_size * board_size), dtype=np.int16)
+        self.pieces: np.ndarray = np.zeros((games, 2), dtype=np.int16)
+        self.capstones: np.ndarray = np.zeros((games, 2), dtype=bool)
+        self.players: np.ndarray = np.ones(games, dtype=np.int8)
+        self.done: np.ndarray = np.zeros(games, dtype=bool)
+        self.winners: np.ndarray = np.zeros(games, dtype=np.int8)
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    @staticmethod
+    def from_states(states: List[TakState]) -> 'TakStateBatch':
+        """
+        Builds a batch with one game per given state (all of the same board size). The stacks are deep enough to hold
+        every piece of the game
+        :param states: the states to start the games from
+        :return: TakStateBatch
+        """
+        board_size = states[0].board_size
+        state_tuples = [state.as_tuple() for state in states]
+        max_height = max(
+            sum(len(stack) for stack in board_tuple) + white_pieces + black_pieces + white_capstone + black_capstone
+            for _, board_tuple, white_pieces, black_pieces, white_capstone, black_capstone, _ in state_tuples
+        )
+        batch = TakStateBatch(board_size, len(states), max(max_height, 1))
+        for game, state_tuple in enumerate(state_tuples):
+            _, board_tuple, white_pieces, black_pieces, white_capstone, black_capstone, player = state_tuple
+            for square, stack in enumerate(board_tuple):
+                batch.stacks[game, square, :len(stack)] = stack
+                batch.heights[game, square] = len(stack)
+            batch.pieces[game] = white_pieces, black_pieces
+            batch.capstones[game] = white_capstone, black_capstone
+            batch.players[game] = 1 if TakPlayer(player) == TakPlayer.WHITE else -1
+        return batch
+
+    @staticmethod
+    def from_state(state: TakState, games: int) -> 'TakStateBatch':
+        """
+        Builds a batch of the given number of games, all starting from the given state
+        :param state: the state to start the games from
+        :param games: the number of games
+        :return: TakStateBatch
+        """
+        single = TakStateBatch.from_states([state])
+        batch = TakStateBatch(single.board_size, games, single.stacks.shape[2])
+        for name in ['stacks', 'heights', 'pieces', 'capstones', 'players']:
+            getattr(batch, name)[:] = getattr(single, name)
+        return batch
+
+    def state(self, game: int, board_class: Type[TakBoard] = TakBoard) -> TakState:
+        """
+        Builds the TakState of the given game of the batch
+        :param game: the index of the game
+        :param board_class: the board representation to use (TakBoard or a subclass)
+        :return: TakState
+        """
+        board_tuple = tuple(
+            tuple(int(value) for value in self.stacks[game, square, :self.heights[game, square]])
+            for square in range(self.board_size * self.board_size)
+        )
+        player = TakPlayer.WHITE if self.players[game] == 1 else TakPlayer.BLACK
+        return TakState.from_tuple((
+            self.board_size,
+            board_tuple,
+            int(self.pieces[game, 0]),
+            int(self.pieces[game, 1]),
+            bool(self.capstones[game, 0]),
+            bool(self.capstones[game, 1]),
+            player.value
+        ), board_class)
+
+    def top_pieces(self, games: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the value of the top piece of each stack of the given games (0 for empty stacks)
+        :param games: the indices of the games (all of them if not given)
+        :return: array of shape (games, squares)
+        """
+        games = np.arange(len(self)) if games is None else games
+        heights = self.heights[games]
+        top_depths = np.maximum(heights - 1, 0).astype(np.int64)
+        tops = self.stacks[games[:, np.newaxis], np.arange(heights.shape[1])[np.newaxis, :], top_depths]
+        return np.where(heights > 0, tops, 0).astype(np.int8)
+
+
+class TakBatchSimulator(object):
+    """
+    TakBatchSimulator class.
+    Plays a batch of games (TakStateBatch) in lock-step with random actions, for rollouts: every step finds the legal
+    actions of all the games at once (as a mask over the ids of the global action table, TakActionTable), samples one
+    action per game with the same distribution as RandomPolicyEff, applies them and checks the roads of every game.
+
+    The rules are the ones of TakState and TakMoveGenerator (legal_action_indices), including how the game ends (see
+    TakState.is_terminal) and how the winner is decided (see TakState.winning_player).
+
+    Legal moves are found from the reach of each ray (the number of squares a move can travel from a square in a
+    direction before an standing stone or capstone), so no move is checked square by square. Roads are found with a
+    flood fill of all the games, players and road directions at once.
+    """
+
+    _instances: Dict[int, 'TakBatchSimulator'] = {}
+
+    def __init__(self, board_size: int):
+        self.board_size: int = board_size
+        self.squares: int = board_size * board_size
+        self.action_table: TakActionTable = TakActionTable.get(board_size)
+        table = self.action_table
+
+        self.place_ids: np.ndarray = np.flatnonzero(table.is_place)
+        self.place_squares: np.ndarray = table.squares[self.place_ids]
+        self.place_pieces: np.ndarray = table.pieces[self.place_ids]
+
+        # ray_squares[square, direction] = the squares from the square (excluded) to the edge of the board, padded
+        # with the index `squares` (a square that blocks every move) up to board_size, so every ray ends blocked
+        self.ray_squares: np.ndarray = np.full((self.squares, 4, board_size), self.squares, dtype=np.int64)
+        for file, rank in TakBoard.get_all_positions(board_size):
+            for direction in TakActionMoveDir:
+                direction_index, (delta_file, delta_rank) = direction.value - 1, direction.get_delta()
+                ray_file, ray_rank, travelled = file + delta_file, rank + delta_rank, 0
+                while 0 <= ray_file < board_size and 0 <= ray_rank < board_size:
+                    self.ray_squares[file * board_size + rank, direction_index, travelled] = \
+                        ray_file * board_size + ray_rank
+                    ray_file, ray_rank, travelled = ray_file + delta_file, ray_rank + delta_rank, travelled + 1
+
+        self.move_ids: np.ndarray = np.flatnonzero(~table.is_place)
+        move_actions: List[TakActionMove] = [table.action(action_id) for action_id in self.move_ids]
+        self.move_squares: np.ndarray = table.squares[self.move_ids]
+        self.move_rays: np.ndarray = self.move_squares * 4 + table.directions[self.move_ids].astype(np.int64) - 1
+        self.move_counts: np.ndarray = table.pick_up_counts[self.move_ids].astype(np.int16)
+        self.move_travelled: np.ndarray = np.array([len(action.drop_order) for action in move_actions], dtype=np.int16)
+        self.move_drops_one_last: np.ndarray = np.array([action.drop_order[-1] == 1 for action in move_actions])
+        # move_targets[move, piece] = the square each picked up piece (from the bottom) is dropped on
+        self.move_targets: np.ndarray = np.zeros((len(move_actions), board_size), dtype=np.int64)
+        for move, action in enumerate(move_actions):
+            targets = [
+                self.ray_squares[self.move_squares[move], action.direction.value - 1, travelled]
+                for travelled, drop_n in enumerate(action.drop_order) for _ in range(drop_n)
+            ]
+            self.move_targets[move, :len(targets)] = targets
+
+        # Each ray (square and direction) of a game gets a code from the stack on its square and the squares the ray
+        # crosses: 0 if the player cannot move the stack, else 1 + reach + board_size * flattens +
+        # 2 * board_size * (min(height, board_size) - 1), where reach is the number of squares before the first
+        # standing stone or capstone, and flattens whether it is a standing stone that the stack's capstone can flatten.
+        # move_legal[move, code] = whether the move is legal for a ray with the code
+        codes = np.arange(1, 1 + 2 * board_size * board_size)
+        code_reach = (codes - 1) % board_size
+        code_flattens = ((codes - 1) // board_size) % 2 == 1
+        code_height = (codes - 1) // (2 * board_size) + 1
+        self.move_legal: np.ndarray = np.zeros((len(self.move_ids), len(codes) + 1), dtype=bool)
+        self.move_legal[:, 1:] = (self.move_counts[:, np.newaxis] <= code_height[np.newaxis, :]) & (
+            (self.move_travelled[:, np.newaxis] <= code_reach[np.newaxis, :]) | (
+                (self.move_travelled[:, np.newaxis] == code_reach[np.newaxis, :] + 1) &
+                self.move_drops_one_last[:, np.newaxis] &
+                code_flattens[np.newaxis, :]
+            )
+        )
+        self.move_legal_offsets: np.ndarray = np.arange(len(self.move_ids)) * self.move_legal.shape[1]
+
+        # Index of each action id among the place or move actions
+        self.kind_index: np.ndarray = np.zeros(len(table), dtype=np.int64)
+        self.kind_index[self.place_ids] = np.arange(len(self.place_ids))
+        self.kind_index[self.move_ids] = np.arange(len(self.move_ids))
+
+    @classmethod
+    def get(cls, board_size: int) -> 'TakBatchSimulator':
+        """
+        Returns the (shared) batch simulator for the given board size
+        :param board_size: the size of the board
+        :return: TakBatchSimulator
+        """
+        if board_size not in cls._instances:
+            cls._instances[board_size] = TakBatchSimulator(board_size)
+        return cls._instances[board_size]
+
+    def legal_mask(self, batch: TakStateBatch, games: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the legal actions of the given games of the batch (see TakMoveGenerator.legal_action_indices)
+        :param batch: the batch of games
+        :param games: the indices of the games (all of them if not given)
+        :return: boolean array of shape (games, actions), indexed by action id
+        """
+        games = np.arange(len(batch)) if games is None else games
+        heights = batch.heights[games]
+        tops = batch.top_pieces(games)
+        players = batch.players[games].astype(np.int8)
+        player_index = (players < 0).astype(np.int64)
+        has_pieces = batch.pieces[games, player_index] > 0
+        has_capstone = batch.capstones[games, player_index]
+        empty = heights == 0
+        first_action = heights.sum(axis=1) <= 1
+
+        mask = np.zeros((len(games), len(self.action_table)), dtype=bool)
+
+        # Places: on an empty square, a piece of the player that they have left (a flat of the opponent on the first
+        # action of each player)
+        piece_players = np.sign(self.place_pieces)[np.newaxis, :]
+        piece_is_capstone = (np.abs(self.place_pieces) == 3)[np.newaxis, :]
+        piece_is_flat = (np.abs(self.place_pieces) == 1)[np.newaxis, :]
+        regular_places = (piece_players == players[:, np.newaxis]) & np.where(
+            piece_is_capstone, has_capstone[:, np.newaxis], has_pieces[:, np.newaxis]
+        )
+        first_places = (piece_players == -players[:, np.newaxis]) & piece_is_flat & has_pieces[:, np.newaxis]
+        mask[:, self.place_ids] = empty[:, self.place_squares] & np.where(
+            first_action[:, np.newaxis], first_places, regular_places
+        )
+
+        # Moves: from a stack the player controls, travelling over empty squares and flat stones, or on to a standing
+        # stone with a capstone dropped alone
+        kinds = np.abs(tops)
+        blocking = np.concatenate([kinds >= 2, np.ones((len(games), 1), dtype=bool)], axis=1)
+        standing = np.concatenate([kinds == 2, np.zeros((len(games), 1), dtype=bool)], axis=1)
+        ray_blocking = blocking[:, self.ray_squares]
+        reach = np.argmax(ray_blocking, axis=3)
+        blocker = np.take_along_axis(
+            np.broadcast_to(self.ray_squares, ray_blocking.shape), reach[:, :, :, np.newaxis], axis=3
+        )[:, :, :, 0]
+        flattens = np.take_along_axis(standing, blocker.reshape(len(games), -1), axis=1).reshape(blocker.shape)
+        flattens &= (kinds == 3)[:, :, np.newaxis]
+        movable = (np.sign(tops) == players[:, np.newaxis]) & ~first_action[:, np.newaxis]
+        ray_codes = 1 + reach + self.board_size * flattens + \
+            2 * self.board_size * (np.minimum(heights, self.board_size) - 1)[:, :, np.newaxis]
+        ray_codes = np.where(movable[:, :, np.newaxis], ray_codes, 0).reshape(len(games), -1)
+
+        mask[:, self.move_ids] = self.move_legal.ravel()[self.move_legal_offsets + ray_codes[:, self.move_rays]]
+        return mask
+
+    def sample_actions(
+            self,
+            mask: np.ndarray,
+            place_action_prob: float = 0.5,
+            rng: Optional[np.random.RandomState] = None
+    ) -> np.ndarray:
+        """
+        Samples one legal action per game like RandomPolicyEff: a place action with probability place_action_prob
+        (1 if there are no legal moves, 0 if there are no legal places), uniformly among the legal ones of its kind
+        :param mask: the legal actions of the games (see legal_mask)
+        :param place_action_prob: the probability of placing a piece
+        :param rng: the random number generator to use (np.random if not given)
+        :return: the sampled action id of each game (-1 for games without legal actions)
+        """
+        rng = rng if rng is not None else np.random
+        place_mask, move_mask = mask[:, self.place_ids], mask[:, self.move_ids]
+        place_counts, move_counts = place_mask.sum(axis=1), move_mask.sum(axis=1)
+        places = np.where(
+            move_counts == 0, True, np.where(place_counts == 0, False, rng.random_sample(len(mask)) < place_action_prob)
+        )
+
+        action_ids = np.full(len(mask), -1, dtype=np.int64)
+        for is_place, kind_mask, kind_counts, kind_ids in [
+            (True, place_mask, place_counts, self.place_ids),
+            (False, move_mask, move_counts, self.move_ids),
+        ]:
+            games = np.flatnonzero((places == is_place) & (kind_counts > 0))
+            if len(games) == 0:
+                continue
+            # The nth legal action of its kind, for a uniformly random n
+            nth = (rng.random_sample(len(games)) * kind_counts[games]).astype(np.int64)
+            picks = np.argmax(np.cumsum(kind_mask[games], axis=1, dtype=np.int32) > nth[:, np.newaxis], axis=1)
+            action_ids[games] = kind_ids[picks]
+        return action_ids
+
+    def apply(self, batch: TakStateBatch, games: np.ndarray, action_ids: np.ndarray) -> None:
+        """
+        Takes the given (legal) actions on the given games of the batch, in place, and passes the turn
+        :param batch: the batch of games
+        :param games: the indices of the games
+        :param action_ids: the id of the action to take on each game
+        """
+        is_place = self.action_table.is_place[action_ids]
+
+        place_games, place_ids = games[is_place], self.kind_index[action_ids[is_place]]
+        squares, pieces = self.place_squares[place_ids], self.place_pieces[place_ids]
+        batch.stacks[place_games, squares, batch.heights[place_games, squares]] = pieces
+        batch.heights[place_games, squares] += 1
+        piece_players = (pieces < 0).astype(np.int64)
+        is_capstone = np.abs(pieces) == 3
+        batch.capstones[place_games[is_capstone], piece_players[is_capstone]] = False
+        batch.pieces[place_games[~is_capstone], piece_players[~is_capstone]] -= 1
+
+        move_games, move_ids = games[~is_place], self.kind_index[action_ids[~is_place]]
+        origins, counts = self.move_squares[move_ids], self.move_counts[move_ids]
+        origin_heights = batch.heights[move_games, origins]
+        for piece_index in range(self.board_size):
+            picking = counts > piece_index
+            picking_games, picking_moves = move_games[picking], move_ids[picking]
+            if len(picking_games) == 0:
+                break
+            depths = origin_heights[picking] - counts[picking] + piece_index
+            pieces = batch.stacks[picking_games, origins[picking], depths]
+            batch.stacks[picking_games, origins[picking], depths] = 0
+
+            targets = self.move_targets[picking_moves, piece_index]
+            target_heights = batch.heights[picking_games, targets]
+            # A capstone dropped on a standing stone flattens it
+            below = batch.stacks[picking_games, targets, np.maximum(target_heights - 1, 0)]
+            flattening = (np.abs(pieces) == 3) & (target_heights > 0) & (np.abs(below) == 2)
+            batch.stacks[picking_games[flattening], targets[flattening], target_heights[flattening] - 1] = \
+                np.sign(below[flattening])
+            batch.stacks[picking_games, targets, target_heights] = pieces
+            batch.heights[picking_games, targets] += 1
+        batch.heights[move_games, origins] -= counts
+
+        batch.players[games] *= -1
+
+    def roads(self, batch: TakStateBatch, games: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns whether each player has a road (see TakBoard.has_path_for_player) in the given games of the batch
+        :param batch: the batch of games
+        :param games: the indices of the games (all of them if not given)
+        :return: boolean array of shape (games, 2), with the roads of white and black
+        """
+        games = np.arange(len(batch)) if games is None else games
+        tops = batch.top_pieces(games).reshape(len(games), 1, self.board_size, self.board_size)
+        road_pieces = np.abs(tops) != 2
+        # squares[game, player, file, rank], for white and black
+        squares = road_pieces & (np.sign(tops) == np.array([1, -1]).reshape(1, 2, 1, 1))
+        # Flood fill from the first rank (roads[:, :, 0]) and from the first file (roads[:, :, 1])
+        roads = np.zeros((len(games), 2, 2, self.board_size, self.board_size), dtype=bool)
+        roads[:, :, 0, :, 0] = squares[:, :, :, 0]
+        roads[:, :, 1, 0, :] = squares[:, :, 0, :]
+        squares = squares[:, :, np.newaxis]
+        while True:
+            grown = roads.copy()
+            grown[..., 1:, :] |= roads[..., :-1, :]
+            grown[..., :-1, :] |= roads[..., 1:, :]
+            grown[..., :, 1:] |= roads[..., :, :-1]
+            grown[..., :, :-1] |= roads[..., :, 1:]
+            grown &= squares
+            if np.array_equal(grown, roads):
+                break
+            roads = grown
+        return roads[:, :, 0, :, -1].any(axis=2) | roads[:, :, 1, -1, :].any(axis=2)
+
+    def update_terminal(self, batch: TakStateBatch, games: np.ndarray) -> None:
+        """
+        Checks whether the given games of the batch are over (see TakState.is_terminal), and sets their winners
+        (see TakState.winning_player)
+        :param batch: the batch of games
+        :param games: the indices of the games
+        """
+        roads = self.roads(batch, games)
+        pieces_left = (batch.pieces[games] > 0) | batch.capstones[games]
+        spaces_left = (batch.heights[games] == 0).any(axis=1)
+        done = (roads[:, 0] & roads[:, 1]) | ~(pieces_left[:, 0] & pieces_left[:, 1]) | ~spaces_left
+
+        # The last player to play wins with a road, then the other player, then whoever has more flat stones on top
+        last_players = -batch.players[games]
+        last_player_road = roads[np.arange(len(games)), (last_players < 0).astype(np.int64)]
+        tops = batch.top_pieces(games)
+        flats = np.sum(tops == 1, axis=1) - np.sum(tops == -1, axis=1)
+        winners = np.where(
+            last_player_road, last_players,
+            np.where(roads[:, 0], 1, np.where(roads[:, 1], -1, np.sign(flats)))
+        )
+
+        batch.done[games] = done
+        batch.winners[games] = np.where(done, winners, 0)
+
+    def play_out(
+            self,
+            batch: TakStateBatch,
+            place_action_prob: float = 0.5,
+            rng: Optional[np.random.RandomState] = None
+    ) -> None:
+        """
+        Plays every game of the batch to the end, in place
+        :param batch: the batch of games
+        :param place_action_prob: the probability of placing a piece on each action (see sample_actions)
+        :param rng: the random number generator to use (np.random if not given)
+        """
+        self.update_terminal(batch, np.arange(len(batch)))
+        games = np.flatnonzero(~batch.done)
+        while len(games) > 0:
+            action_ids = self.sample_actions(self.legal_mask(batch, games), place_action_prob, rng)
+            # No legal actions only happens without pieces left, which ends the game anyway
+            stuck = action_ids < 0
+            batch.done[games[stuck]] = True
+            games, action_ids = games[~stuck], action_ids[~stuck]
+            self.apply(batch, games, action_ids)
+            self.update_terminal(batch, games)
+            games = games[~batch.done[games]]
+
+    def rollout(
+            self,
+            state: TakState,
+            games: int,
+            player: TakPlayer,
+            discount: bool = False,
+            place_action_prob: float = 0.5,
+            rng: Optional[np.random.RandomState] = None
+    ) -> np.ndarray:
+        """
+        Plays the given number of random games from a (non terminal) state, and returns their rewards for the given
+        player, like the rollouts of TakMCTSPlayerAgent with the default scoring (TakScorerDefault): the score of the
+        game if the player won, minus the score if they lost (0 when the winner did not make the last action, unless
+        discounting), and 0 for ties
+        :param state: the state to start the games from
+        :param games: the number of games
+        :param player: the player to compute the rewards for
+        :param discount: whether scores are discounted (see TakEnvironment.scoring_discount)
+        :param place_action_prob: the probability of placing a piece on each action (see sample_actions)
+        :param rng: the random number generator to use (np.random if not given)
+        :return: array with the reward of each game
+        """
+        batch = TakStateBatch.from_state(state, games)
+        self.play_out(batch, place_action_prob, rng)
+
+        last_players = -batch.players
+        last_player_index = (last_players < 0).astype(np.int64)
+        last_player_pieces_left = (batch.pieces[np.arange(games), last_player_index] > 0) | \
+            batch.capstones[np.arange(games), last_player_index]
+        scores = self.squares + last_player_pieces_left.astype(float)
+        scores = np.where((batch.winners == last_players) | discount, scores, 0.0)
+        scores = np.where(batch.winners == 0, 0.0, scores)
+        player_sign = 1 if player == TakPlayer.WHITE else -1
+        return np.where(batch.winners == player_sign, scores, -scores)
@@ -0,0 +1,298 @@
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakStack import PieceStack
+
+
+class TakBitBoard(TakBoard):
+    """
+    TakBitBoard class.
+    Same API as TakBoard, but the board is represented with integer bitboards (one bit per square) instead of a grid
+    of PieceStacks.
+
+    Square (file, rank) is bit `file * board_size + rank`. The board keeps:
+        - The squares where the top piece belongs to white / black
+        - The squares where the top piece is a flat / standing / capstone piece
+        - The height of each stack
+        - The contents of each stack, encoded as an int with PIECE_BITS bits per piece (bottom piece in the lowest bits)
+    """
+
+    PIECE_BITS = 3
+    PIECE_MASK = (1 << PIECE_BITS) - 1
+
+    # Piece codes are never 0, so an encoded stack only decodes to the pieces it has
+    PIECES: Tuple[Optional[TakPiece], ...] = (None,) + tuple(TakPiece.get_all_pieces())
+    PIECE_CODES = {piece: code for code, piece in enumerate(PIECES) if piece is not None}
+
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        self.full = (1 << (board_size * board_size)) - 1
+
+        self.white = 0
+        self.black = 0
+        self.flats = 0
+        self.standing = 0
+        self.capstones = 0
+
+        self.heights: List[int] = [0] * (board_size * board_size)
+        self.stacks: List[int] = [0] * (board_size * board_size)
+
+        self._init_shared()
+
+    def copy(self) -> 'TakBitBoard':
+        """
+        Returns a copy of the board
+        :return: TakBitBoard
+        """
+        copied_board = TakBitBoard.__new__(TakBitBoard)
+        copied_board.__dict__.update(self.__dict__)
+        copied_board.heights = list(self.heights)
+        copied_board.stacks = list(self.stacks)
+        return copied_board
+
+    def square(self, file: int, rank: int) -> int:
+        """
+        Returns the index of the bit for the given position
+        :param file: int
+        :param rank: int
+        :return: int
+        """
+        return file * self.board_size + rank
+
+    def occupied(self) -> int:
+        """
+        Returns the bitboard of the non-empty squares
+        :return: int
+        """
+        return self.white | self.black
+
+    def empty(self) -> int:
+        """
+        Returns the bitboard of the empty squares
+        :return: int
+        """
+        return self.full & ~(self.white | self.black)
+
+    def controlled_by_mask(
+            self,
+            player: TakPlayer,
+            only_flat_pieces: bool = False,
+            only_road_pieces: bool = False
+    ) -> int:
+        """
+        Returns the bitboard of the squares controlled by the given player
+        :param player: TakPlayer
+        :param only_flat_pieces: whether to only count squares with flat pieces
+        :param only_road_pieces: whether to only count squares with road pieces (flat or capstone)
+        :return: int
+        """
+        mask = self.white if player == TakPlayer.WHITE else self.black
+        if only_road_pieces:
+            return mask & (self.flats | self.capstones)
+        elif only_flat_pieces:
+            return mask & self.flats
+        return mask
+
+    def mask_positions(self, mask: int) -> List[Tuple[int, int]]:
+        """
+        Returns the positions of the set bits of the given bitboard, in the same order as TakBoard lists them
+        :param mask: a bitboard
+        :return: List of (x, y) tuples
+        """
+        positions = []
+        while mask:
+            low_bit = mask & -mask
+            positions.append(self._positions_iterable[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return positions
+
+    def road_mask(
+            self,
+            player: TakPlayer,
+            only_low_road: bool = False,
+            only_high_road: bool = False
+    ) -> int:
+        mask = self.controlled_by_mask(player, only_road_pieces=True)
+        if only_low_road:
+            for file, rank in self.mask_positions(mask):
+                if self.heights[file * self.board_size + rank] != 1:
+                    mask &= ~(1 << (file * self.board_size + rank))
+        # Every controlled square has a height of 1 or more, so only_high_road does not filter any square
+        return mask
+
+    def total_pieces(self) -> int:
+        return sum(self.heights)
+
+    def get_stack(self, file: int, rank: int) -> PieceStack:
+        """
+        Returns a (detached) PieceStack with the contents of the stack at the given position.
+        Changes to the returned stack are not reflected on the board.
+        :param file: int
+        :param rank: int
+        :return: PieceStack
+        """
+        idx = self.square(file, rank)
+        return PieceStack(self._decode(self.stacks[idx], self.heights[idx]))
+
+    @property
+    def board(self) -> List[List[PieceStack]]:
+        return [[self.get_stack(file, rank) for rank in range(self.board_size)] for file in range(self.board_size)]
+
+    def is_position_empty(self, file: int, rank: int) -> bool:
+        return self.heights[file * self.board_size + rank] == 0
+
+    def position_controlled_by(self, file: int, rank: int) -> Optional[TakPlayer]:
+        bit = 1 << (file * self.board_size + rank)
+        if self.white & bit:
+            return TakPlayer.WHITE
+        if self.black & bit:
+            return TakPlayer.BLACK
+        return None
+
+    def is_position_controlled_by(
+            self,
+            file: int,
+            rank: int,
+            player: TakPlayer,
+            only_flat_pieces: bool = False,
+            only_road_pieces: bool = False
+    ) -> bool:
+        bit = 1 << (file * self.board_size + rank)
+        return bool(self.controlled_by_mask(player, only_flat_pieces, only_road_pieces) & bit)
+
+    def get_empty_positions(self) -> List[Tuple[int, int]]:
+        return self.mask_positions(self.empty())
+
+    def get_positions_controlled_by_player(
+            self,
+            player: TakPlayer,
+            only_flat_pieces: bool = False,
+            only_road_pieces: bool = False
+    ) -> List[Tuple[int, int]]:
+        return self.mask_positions(self.controlled_by_mask(player, only_flat_pieces, only_road_pieces))
+
+    def position_height(self, file: int, rank: int) -> int:
+        return self.heights[file * self.board_size + rank]
+
+    def spaces_left(self) -> bool:
+        return self.empty() != 0
+
+    def top_piece(self, file: int, rank: int) -> Optional[TakPiece]:
+        idx = file * self.board_size + rank
+        height = self.heights[idx]
+        if height == 0:
+            return None
+        return self.PIECES[(self.stacks[idx] >> (self.PIECE_BITS * (height - 1))) & self.PIECE_MASK]
+
+    def place_piece(self, position: Tuple[int, int], piece: TakPiece) -> None:
+        self.drop(position, [piece])
+
+    def pick_up(self, position: Tuple[int, int], count: int) -> List[TakPiece]:
+        idx = self.square(*position)
+        height = self.heights[idx]
+        if count > height:
+            raise ValueError("Cannot pop from empty position")
+        remaining = height - count
+        shift = self.PIECE_BITS * remaining
+        picked_up_pieces = self._decode(self.stacks[idx] >> shift, count)
+        for depth, piece in enumerate(picked_up_pieces, start=remaining):
+            self.key ^= self._zobrist.piece_key(idx, depth, piece)
+        self.stacks[idx] &= (1 << shift) - 1
+        self.heights[idx] = remaining
+        self._update_top(idx)
+        return picked_up_pieces
+
+    def drop(self, position: Tuple[int, int], pieces: List[TakPiece]) -> None:
+        idx = self.square(*position)
+        stack, height = self.stacks[idx], self.heights[idx]
+        for piece in pieces:
+            # If placing capstone on a standing piece, we need to flatten that piece
+            if piece.is_capstone() and height > 0:
+                shift = self.PIECE_BITS * (height - 1)
+                top = self.PIECES[(stack >> shift) & self.PIECE_MASK]
+                if top.is_standing():
+                    stack ^= (self.PIECE_CODES[top] ^ self.PIECE_CODES[top.flatten()]) << shift
+                    self.key ^= self._zobrist.piece_key(idx, height - 1, top) ^ \
+                        self._zobrist.piece_key(idx, height - 1, top.flatten())
+            stack |= self.PIECE_CODES[piece] << (self.PIECE_BITS * height)
+            self.key ^= self._zobrist.piece_key(idx, height, piece)
+            height += 1
+        self.stacks[idx], self.heights[idx] = stack, height
+        self._update_top(idx)
+
+    def _update_top(self, idx: int) -> None:
+        """
+        Updates the ownership and piece type bitboards for the given square from its stack
+        :param idx: the index of the square
+        """
+        bit = 1 << idx
+        clear = ~bit
+        self.white &= clear
+        self.black &= clear
+        self.flats &= clear
+        self.standing &= clear
+        self.capstones &= clear
+
+        height = self.heights[idx]
+        if height == 0:
+            return
+        top = self.PIECES[(self.stacks[idx] >> (self.PIECE_BITS * (height - 1))) & self.PIECE_MASK]
+        if top.value > 0:
+            self.white |= bit
+        else:
+            self.black |= bit
+        if top.is_flat():
+            self.flats |= bit
+        elif top.is_standing():
+            self.standing |= bit
+        else:
+            self.capstones |= bit
+
+    def _decode(self, stack: int, height: int) -> List[TakPiece]:
+        """
+        Decodes an encoded stack
+        :param stack: the encoded stack
+        :param height: the number of pieces in the stack
+        :return: the pieces in the stack, from the bottom to the top
+        """
+        pieces = []
+        for _ in range(height):
+            pieces.append(self.PIECES[stack & self.PIECE_MASK])
+            stack >>= self.PIECE_BITS
+        return pieces
+
+    def as_3d_matrix(self) -> (np.ndarray, int):
+        max_height = max(1, max(self.heights))
+
+        board_matrix = np.zeros((self.board_size, self.board_size, max_height), dtype=int)
+
+        for idx, (file, rank) in enumerate(self._positions_iterable):
+            stack = self.stacks[idx]
+            for i in range(self.heights[idx]):
+                board_matrix[file, rank, i] = self.PIECES[stack & self.PIECE_MASK].value
+                stack >>= self.PIECE_BITS
+
+        return board_matrix, max_height
+
+    def __str__(self) -> str:
+        return '\n'.join([
+            ' '.join([
+                '_' if self.is_position_empty(file, rank) else self.top_piece(file, rank).view_str()
+                for file in range(self.board_size)
+            ])
+            for rank in range(self.board_size - 1, -1, -1)
+        ])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TakBitBoard):
+            return self.board_size == other.board_size and \
+                   self.heights == other.heights and \
+                   self.stacks == other.stacks
+        return super().__eq__(other)
+
+    def __hash__(self) -> int:
+        return self.key
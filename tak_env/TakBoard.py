@@ -1,49 +1,101 @@
-from typing import List, Tuple, Optional, Set
+from typing import List, Tuple, Optional, Dict, Any
 
 import numpy as np
 
 from tak_env import TakStack
+from tak_env.TakCacheStats import TakCacheStats
 from tak_env.TakPiece import TakPiece
 from tak_env.TakPlayer import TakPlayer
+from tak_env.TakRoads import TakRoads
 from tak_env.TakStack import PieceStack
+from tak_env.TakZobrist import TakZobrist
 
 
 class TakBoard(object):
     """
     TakBoard class
     TODO: docs
-    """
 
-    # cache_has_path_for_player = {}
-    #
-    # @classmethod
-    # def wipe_cache(cls):
-    #     cls.cache_has_path_for_player = {}
+    Copies of a board share its files and stacks (copy-on-write): a board only changes the files and stacks it owns,
+    and copies a file or stack before its first change after a copy (see _writable_stack). Copying takes O(board size)
+    time and memory, and changes then copy only the stacks they touch, so the boards of states reached from each other
+    share most of their stacks.
+    NOTE: stacks returned by get_stack may be shared, and must not be changed directly.
+    """
 
     def __init__(self, board_size: int):
         self.board_size = board_size
         self.board = [[PieceStack() for _ in range(board_size)] for _ in range(board_size)]
 
+        # Bitmasks of the files (bit file) and stacks (bit file * board_size + rank) only this board has
+        self._owned_files: int = (1 << board_size) - 1
+        self._owned_stacks: int = (1 << (board_size * board_size)) - 1
+
+        self._init_shared()
+
+    def _init_shared(self) -> None:
+        """
+        Initializes the attributes shared by all board engines
+        """
         self._positions_iterable = [(file, rank) for file in range(self.board_size) for rank in range(self.board_size)]
 
-        self.vertical_road_start_positions = [(file, 0) for file in range(self.board_size)]
-        self.vertical_road_end_positions = [(file, self.board_size - 1) for file in range(self.board_size)]
-        self.horizontal_road_start_positions = [(0, rank) for rank in range(self.board_size)]
-        self.horizontal_road_end_positions = [(self.board_size - 1, rank) for rank in range(self.board_size)]
+        # Zobrist key of the pieces on the board, kept up to date by drop and pick_up
+        self._zobrist = TakZobrist.get(self.board_size)
+        self.key: int = 0
+
+        # Results of the scans of the board (empty and controlled positions), for the board with the key they are for
+        self._scans: Dict[Any, List[Tuple[int, int]]] = {}
+        self._scans_key: Optional[int] = None
+
+    def _cached_scan(self, scan: Any, cache: str) -> Optional[List[Tuple[int, int]]]:
+        """
+        Returns the cached result of the given scan of the board, or None if it was not done since the board changed
+        :param scan: the key of the scan
+        :param cache: the name of the cache (see TakCacheStats)
+        :return: a copy of the result of the scan, or None
+        """
+        if self._scans_key != self.key:
+            # A new dict, since copies of the board share it
+            self._scans, self._scans_key = {}, self.key
+        positions = self._scans.get(scan)
+        if positions is None:
+            TakCacheStats.miss(cache)
+            return None
+        TakCacheStats.hit(cache)
+        return list(positions)
 
     def copy(self):
         """
-        Returns a copy of the board
+        Returns a copy of the board (sharing the files and stacks of this board until either board changes them)
         :return: TakBoard
         """
-        copied_board = TakBoard(self.board_size)
+        copied_board = self.__class__.__new__(self.__class__)
+        copied_board.__dict__.update(self.__dict__)
+        copied_board.board = list(self.board)
 
-        for file in range(self.board_size):
-            for rank in range(self.board_size):
-                copied_board.board[file][rank] = self.board[file][rank].copy()
+        # Both boards share all the files and stacks now
+        self._owned_files, self._owned_stacks = 0, 0
+        copied_board._owned_files, copied_board._owned_stacks = 0, 0
 
         return copied_board
 
+    def _writable_stack(self, file: int, rank: int) -> PieceStack:
+        """
+        Returns the stack at the given position to change it, first copying it (and its file) if other boards share it
+        :param file: int
+        :param rank: int
+        :return: PieceStack
+        """
+        stack_bit = 1 << (file * self.board_size + rank)
+        if not self._owned_stacks & stack_bit:
+            file_bit = 1 << file
+            if not self._owned_files & file_bit:
+                self.board[file] = list(self.board[file])
+                self._owned_files |= file_bit
+            self.board[file][rank] = self.board[file][rank].copy()
+            self._owned_stacks |= stack_bit
+        return self.board[file][rank]
+
     def total_pieces(self) -> int:
         """
         Returns the total number of pieces on the board
@@ -110,7 +162,11 @@ class TakBoard(object):
         Returns a list of empty positions on the board
         :return: List of (x, y) tuples
         """
-        return [(file, rank) for file, rank in self._positions_iterable if self.is_position_empty(file, rank)]
+        positions = self._cached_scan('empty', 'empty_positions')
+        if positions is None:
+            positions = [(file, rank) for file, rank in self._positions_iterable if self.is_position_empty(file, rank)]
+            self._scans['empty'] = list(positions)
+        return positions
 
     def get_positions_controlled_by_player(
             self,
@@ -125,14 +181,19 @@ class TakBoard(object):
         :param only_road_pieces: whether to only return positions with road pieces (flat or capstone)
         :return: List of (x, y) tuples
         """
-        return [
-            (file, rank) for file, rank in self._positions_iterable
-            if self.is_position_controlled_by(
-                file, rank,
-                player,
-                only_flat_pieces=only_flat_pieces, only_road_pieces=only_road_pieces
-            )
-        ]
+        scan = (player, only_flat_pieces, only_road_pieces)
+        positions = self._cached_scan(scan, 'controlled_positions')
+        if positions is None:
+            positions = [
+                (file, rank) for file, rank in self._positions_iterable
+                if self.is_position_controlled_by(
+                    file, rank,
+                    player,
+                    only_flat_pieces=only_flat_pieces, only_road_pieces=only_road_pieces
+                )
+            ]
+            self._scans[scan] = list(positions)
+        return positions
 
     def position_height(self, file: int, rank: int) -> int:
         """
@@ -150,8 +211,64 @@ class TakBoard(object):
         :param position: the position to place the piece at
         :param piece: the piece to place
         """
+        self.drop(position, [piece])
+
+    def top_piece(self, file: int, rank: int) -> Optional[TakPiece]:
+        """
+        Returns the piece on top of the stack at the given position (or None if the position is empty)
+        :param file: int
+        :param rank: int
+        :return: TakPiece or None
+        """
+        stack = self.get_stack(file, rank)
+        return None if stack.is_empty() else stack.top()
+
+    def pick_up(self, position: Tuple[int, int], count: int) -> List[TakPiece]:
+        """
+        Removes the top count pieces of the stack at the given position
+        :param position: the position to pick up the pieces from
+        :param count: the number of pieces to pick up
+        :return: the picked up pieces, ordered from the bottom of the stack to the top
+        """
+        file, rank = position
+        stack = self._writable_stack(file, rank)
+        picked_up_pieces = [stack.pop() for _ in range(count)]
+        picked_up_pieces.reverse()
+
+        square, depth = file * self.board_size + rank, stack.height()
+        for piece in picked_up_pieces:
+            self.key ^= self._zobrist.piece_key(square, depth, piece)
+            depth += 1
+        return picked_up_pieces
+
+    def drop(self, position: Tuple[int, int], pieces: List[TakPiece]) -> None:
+        """
+        Drops the given pieces (ordered from the bottom to the top) on the stack at the given position.
+        A capstone dropped on a standing piece flattens it.
+        :param position: the position to drop the pieces on
+        :param pieces: the pieces to drop
+        """
         file, rank = position
-        self.get_stack(file, rank).push(piece)
+        stack = self._writable_stack(file, rank)
+        square = file * self.board_size + rank
+        for piece in pieces:
+            depth = stack.height()
+            if piece.is_capstone() and depth > 0 and stack.top().is_standing():
+                standing_piece = stack.top()
+                self.key ^= self._zobrist.piece_key(square, depth - 1, standing_piece) ^ \
+                    self._zobrist.piece_key(square, depth - 1, standing_piece.flatten())
+            # The push method will automatically flatten the piece if it is standing
+            stack.push(piece)
+            self.key ^= self._zobrist.piece_key(square, depth, piece)
+
+    def unflatten(self, position: Tuple[int, int]) -> None:
+        """
+        Turns the flat piece on top of the stack at the given position back into a standing piece (undoes the
+        flattening of a capstone dropped on it, see drop)
+        :param position: the position of the stack
+        """
+        piece = self.pick_up(position, 1)[0]
+        self.drop(position, [TakPiece.get_standing_piece_for_player(piece.player())])
 
     def get_board_names_str(self) -> str:
         """
@@ -238,85 +355,27 @@ class TakBoard(object):
         """
         return self.get_positions_controlled_by_player(player, only_road_pieces=True)
 
-    def get_connected_positions(
-            self,
-            road_positions_controlled: List[Tuple[int, int]],
-            position: Tuple[int, int],
-            allowed_dirs: str = 'URDL',
-            only_low_road: bool = False,
-            only_high_road: bool = False
-    ) -> Set[Tuple[int, int]]:
-        up = (position[0], position[1] + 1) if 'U' in allowed_dirs else None
-        right = (position[0] + 1, position[1]) if 'R' in allowed_dirs else None
-        down = (position[0], position[1] - 1) if 'D' in allowed_dirs else None
-        left = (position[0] - 1, position[1]) if 'L' in allowed_dirs else None
-        return {
-            pos
-            for pos in [up, right, down, left]
-            if (
-                    pos is not None  # None means not considering going in that direction
-                    and self.is_position_in_board(pos)  # Position must be in the board
-                    and (not only_low_road or self.position_height(pos[0], pos[1]) == 1)  # only low road
-                    and (not only_high_road or self.position_height(pos[0], pos[1]) >= 1)  # only high road
-                    and pos in road_positions_controlled  # Position must be controlled by the player
-            )
-        }
-
-    def has_path(
-            self,
-            road_positions_controlled: List[Tuple[int, int]],
-            start_positions: Set[Tuple[int, int]],
-            end_positions: Set[Tuple[int, int]],
-            _max_steps: int, _step: int = 0,
-            allowed_dirs: Optional[str] = 'URDL',
-            only_low_road: bool = False,
-            only_high_road: bool = False
-    ) -> bool:
-        allowed_dirs = allowed_dirs if allowed_dirs is not None else 'URDL'
-        for current_position in start_positions:
-            if current_position in end_positions:
-                return True
-            if _step > _max_steps:
-                break
-            if self.has_path(
-                    road_positions_controlled,
-                    self.get_connected_positions(
-                        road_positions_controlled,
-                        current_position,
-                        allowed_dirs=allowed_dirs,
-                        only_low_road=only_low_road,
-                        only_high_road=only_high_road
-                    ),
-                    end_positions,
-                    _max_steps=_max_steps,
-                    _step=_step + 1
-            ):
-                return True
-        return False
-
-    def has_path_for_player(
+    def road_mask(
             self,
             player: TakPlayer,
             only_low_road: bool = False,
-            only_high_road: bool = False,
-            only_straight_road: bool = False,
-    ) -> bool:
+            only_high_road: bool = False
+    ) -> int:
         """
-        Memo _has_path_for_player
+        Returns the bitboard (bit file * board_size + rank) of the squares that can be part of a road for the player
+        :param player: the player to build the road for
+        :param only_low_road: whether to only count stacks of height 1
+        :param only_high_road: whether to only count stacks of height 1 or more
+        :return: int
         """
-        return self._has_path_for_player(
-            player,
-            only_low_road=only_low_road, only_high_road=only_high_road, only_straight_road=only_straight_road
-        )
-        # params = (self, player, only_low_road, only_high_road, only_straight_road)
-        # if params not in self.__class__.cache_has_path_for_player:
-        #     self.__class__.cache_has_path_for_player[params] = self._has_path_for_player(
-        #         player,
-        #         only_low_road=only_low_road, only_high_road=only_high_road, only_straight_road=only_straight_road
-        #     )
-        # return self.__class__.cache_has_path_for_player[params]
-
-    def _has_path_for_player(
+        mask = 0
+        for file, rank in self.controlled_road_spaces(player):
+            height = self.position_height(file, rank)
+            if (not only_low_road or height == 1) and (not only_high_road or height >= 1):
+                mask |= 1 << (file * self.board_size + rank)
+        return mask
+
+    def has_path_for_player(
             self,
             player: TakPlayer,
             only_low_road: bool = False,
@@ -324,69 +383,22 @@ class TakBoard(object):
             only_straight_road: bool = False,
     ) -> bool:
         """
-        Returns whether there is a path for the given player
-        TODO: docs
-        TODO: tests!
-        :param player:
-        :param only_low_road:
-        :param only_high_road:
-        :param only_straight_road:
-        :return:
+        Returns whether there is a path (road) connecting two opposite edges of the board for the given player
+        :param player: the player to check the path for
+        :param only_low_road: whether the path can only use stacks of height 1
+        :param only_high_road: whether the path can only use stacks of height 1 or more
+        :param only_straight_road: whether the path has to be along a single file or rank
+        :return: True if the player has a path
         """
         assert not (only_low_road and only_high_road), "Only accepts only_high_road or only_low_road, not both"
 
-        road_positions_controlled = self.controlled_road_spaces(player)
-        max_steps = len(road_positions_controlled)
-
-        # Cannot possibly have path if there are not enough controlled spaces for the shortest possible road (straight)
-        if max_steps < self.board_size:
-            return False
-
-        controlled_vertical_start_positions = {
-            pos for pos in self.vertical_road_start_positions
-            if pos in road_positions_controlled
-        }
-
-        controlled_vertical_end_positions = {
-            pos for pos in self.vertical_road_end_positions
-            if pos in road_positions_controlled
-        }
-
-        allowed_dirs_vertical = 'UD' if only_straight_road else None
-        v_possible = len(controlled_vertical_start_positions) > 0 and len(controlled_vertical_end_positions) > 0
-        if v_possible and self.has_path(
-                road_positions_controlled,
-                controlled_vertical_start_positions, controlled_vertical_end_positions,
-                max_steps,
-                allowed_dirs=allowed_dirs_vertical, only_low_road=only_low_road, only_high_road=only_high_road
-        ):
-            return True
-
-        controlled_horizontal_start_positions = {
-            pos for pos in self.horizontal_road_start_positions
-            if pos in road_positions_controlled
-        }
-
-        controlled_horizontal_end_positions = {
-            pos for pos in self.horizontal_road_end_positions
-            if pos in road_positions_controlled
-        }
-
-        allowed_dirs_horizontal = 'RL' if only_straight_road else None
-        h_possible = len(controlled_horizontal_start_positions) > 0 and len(controlled_horizontal_end_positions) > 0
-        if h_possible and self.has_path(
-                road_positions_controlled,
-                controlled_horizontal_start_positions,
-                controlled_horizontal_end_positions,
-                max_steps,
-                allowed_dirs=allowed_dirs_horizontal, only_low_road=only_low_road, only_high_road=only_high_road
-        ):
-            return True
-
-        return False
+        return TakRoads.get(self.board_size).has_road(
+            self.road_mask(player, only_low_road=only_low_road, only_high_road=only_high_road),
+            only_straight_road=only_straight_road
+        )
 
-    @staticmethod
-    def from_3d_matrix(board_matrix: np.ndarray, board_size: int) -> 'TakBoard':
+    @classmethod
+    def from_3d_matrix(cls, board_matrix: np.ndarray, board_size: int) -> 'TakBoard':
         """
         Builds a board with the pieces on the given matrix
         :param board_matrix: the matrix representation of the board
@@ -395,21 +407,46 @@ class TakBoard(object):
         """
         stack_height = int(board_matrix.shape[0] / (board_size * board_size))
         board_matrix = board_matrix.reshape((board_size, board_size, stack_height))
-        board = TakBoard(board_size)
+        board = cls(board_size)
 
         for file in range(board_size):
             for rank in range(board_size):
                 for i in range(board_matrix.shape[2]):
                     piece_value = board_matrix[file, rank, i]
                     if piece_value != 0:
-                        board.get_stack(file, rank).push(TakPiece(piece_value))
+                        board.place_piece((file, rank), TakPiece(piece_value))
+        return board
+
+    def as_tuple(self) -> Tuple[Tuple[int, ...], ...]:
+        """
+        Returns a compact (and picklable) representation of the board: for each position (in get_all_positions
+        order), the values of the pieces in its stack from the bottom to the top
+        :return: tuple of tuples of piece values
+        """
+        return tuple(
+            tuple(piece.value for piece in self.get_stack(file, rank).as_list())
+            for file, rank in self._positions_iterable
+        )
+
+    @classmethod
+    def from_tuple(cls, board_tuple: Tuple[Tuple[int, ...], ...], board_size: int) -> 'TakBoard':
+        """
+        Builds a board from its compact representation (see as_tuple)
+        :param board_tuple: the compact representation of the board
+        :param board_size: the size of the board
+        :return: a TakBoard with the same pieces
+        """
+        board = cls(board_size)
+        for position, stack in zip(TakBoard.get_all_positions(board_size), board_tuple):
+            if len(stack) > 0:
+                board.drop(position, [TakPiece(piece_value) for piece_value in stack])
         return board
 
     def __eq__(self, other) -> bool:
         return self.board_size == other.board_size and self.board == other.board
 
     def __hash__(self) -> int:
-        return hash((self.board_size, tuple(tuple(stack for stack in row) for row in self.board)))
+        return self.key
 
     @staticmethod
     def get_all_positions(board_size: int) -> List[Tuple[int, int]]:
@@ -0,0 +1,46 @@
+from typing import Dict
+
+
+class TakCacheStats(object):
+    """
+    TakCacheStats class.
+    Hit and miss counters of the caches of the states and boards (terminal info, winning player, empty and controlled
+    positions), shared by all the states and boards of the process.
+    """
+
+    hits: Dict[str, int] = {}
+    misses: Dict[str, int] = {}
+
+    @classmethod
+    def hit(cls, cache: str) -> None:
+        cls.hits[cache] = cls.hits.get(cache, 0) + 1
+
+    @classmethod
+    def miss(cls, cache: str) -> None:
+        cls.misses[cache] = cls.misses.get(cache, 0) + 1
+
+    @classmethod
+    def hit_rate(cls, cache: str) -> float:
+        """
+        Returns the fraction of the lookups of the given cache that were hits (0 if it was never looked up)
+        :param cache: the name of the cache
+        :return: float
+        """
+        hits, misses = cls.hits.get(cache, 0), cls.misses.get(cache, 0)
+        return hits / (hits + misses) if hits + misses > 0 else 0.0
+
+    @classmethod
+    def summary(cls) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the hits, misses and hit rate of each cache
+        :return: dict of cache name to its counters
+        """
+        return {
+            cache: {'hits': cls.hits.get(cache, 0), 'misses': cls.misses.get(cache, 0), 'hit_rate': cls.hit_rate(cache)}
+            for cache in sorted(set(cls.hits) | set(cls.misses))
+        }
+
+    @classmethod
+    def reset(cls) -> None:
+        cls.hits = {}
+        cls.misses = {}
@@ -1,9 +1,10 @@
-from typing import Optional, Union
+from typing import Optional, Union, Dict, Type
 
 import numpy as np
 import pandas as pd
 from gym import Env
 from tak_env.TakAction import TakAction
+from tak_env.TakBitBoard import TakBitBoard
 from tak_env.TakPiece import TakPiece
 from tak_env.TakScorer import TakScorer
 from tak_env.TakState import TakState
@@ -20,6 +21,11 @@ class TakEnvironment(Env):
 
     ENV_NAME = "TakEnvironment-v0"
 
+    board_engines: Dict[str, Type[TakBoard]] = {
+        'stack': TakBoard,
+        'bitboard': TakBitBoard,
+    }
+
     def __init__(
             self,
             board_size,
@@ -27,7 +33,8 @@ class TakEnvironment(Env):
             init_pieces: Optional[int] = None,
             init_player: TakPlayer = TakPlayer.WHITE,
             scoring_discount: bool = False,
-            scoring_metric: Union[str, TakScorer] = 'default'
+            scoring_metric: Union[str, TakScorer] = 'default',
+            board_engine: str = 'stack'
     ):
         """
         Initialize the tak_env
@@ -38,7 +45,10 @@ class TakEnvironment(Env):
         :param init_player:
         :param scoring_discount:
         :param scoring_metric:
+        :param board_engine: the board representation to use, one of TakEnvironment.board_engines
         """
+        if board_engine not in TakEnvironment.board_engines:
+            raise ValueError(f"Unknown board engine: {board_engine} (options: {list(TakEnvironment.board_engines)})")
 
         self.board_size: int = board_size
         self.use_capstone: bool = use_capstone if use_capstone is not None \
@@ -48,6 +58,7 @@ class TakEnvironment(Env):
         self.init_player: TakPlayer = init_player
         self.scoring_discount = scoring_discount
         self.scoring_metric = scoring_metric if isinstance(scoring_metric, TakScorer) else TakScorer.get(scoring_metric)
+        self.board_engine: str = board_engine
 
         self.state: TakState = self.reset()
 
@@ -128,7 +139,7 @@ class TakEnvironment(Env):
 
         self.state = TakState(
                  self.board_size,
-                 TakBoard(self.board_size),
+                 self.make_board(),
                  self.init_pieces,
                  self.init_pieces,
                  self.use_capstone,
@@ -138,6 +149,13 @@ class TakEnvironment(Env):
 
         return self.state
 
+    def make_board(self) -> TakBoard:
+        """
+        Makes an empty board using the board engine of the environment
+        :return: an empty TakBoard
+        """
+        return TakEnvironment.board_engines[self.board_engine](self.board_size)
+
     def render_image(self) -> None:
         """
         Render the current state of the game as an image
@@ -259,7 +277,8 @@ class TakEnvironment(Env):
             init_pieces=self.init_pieces,
             init_player=self.init_player,
             scoring_discount=self.scoring_discount,
-            scoring_metric=self.scoring_metric
+            scoring_metric=self.scoring_metric,
+            board_engine=self.board_engine
         )
         new_env.state = leaf.copy()
         return new_env
@@ -0,0 +1,123 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakRoads import TakRoads
+from tak_env.TakState import TakState
+
+
+class TakFeatures(object):
+    """
+    TakFeatures class.
+    Fixed length feature vector of a state (from the board matrix, see TakBoard.as_3d_matrix), from the point of view
+    of the player to move ("own" pieces are the ones of the player to move). In order:
+        - top piece planes: 6 planes of board_size^2 squares, one per type of top piece (own flat, standing and
+          capstone, then the opponent's), 1 where the top piece of the square is of that type
+        - stack heights: board_size^2 squares, the height of each stack divided by board_size, positive for own stacks
+          and negative for the opponent's
+        - reserves: own and opponent pieces left (divided by board_size^2), and own and opponent capstone available
+        - road progress, own and then opponent's: files and ranks with at least one road square (flat or capstone on
+          top), and the most files or ranks spanned by a connected group of road squares, divided by board_size
+        - bias: always 1
+    The squares of the planes are in the order of the squares of the boards (file * board_size + rank).
+    """
+
+    PIECE_PLANES = (1, 2, 3, -1, -2, -3)
+
+    _instances: Dict[int, 'TakFeatures'] = {}
+
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        self.roads: TakRoads = TakRoads.get(board_size)
+        squares = board_size * board_size
+        # (start, end) of each group of features
+        self.slices: Dict[str, Tuple[int, int]] = {}
+        size = 0
+        for name, length in [
+            ('top_pieces', len(TakFeatures.PIECE_PLANES) * squares),
+            ('heights', squares),
+            ('reserves', 4),
+            ('roads', 6),
+            ('bias', 1),
+        ]:
+            self.slices[name] = (size, size + length)
+            size += length
+        self.size: int = size
+        self._square_bits: List[int] = [1 << square for square in range(squares)]
+
+    @classmethod
+    def get(cls, board_size: int) -> 'TakFeatures':
+        """
+        Returns the (shared) feature extractor for the given board size
+        :param board_size: the size of the board
+        :return: TakFeatures
+        """
+        if board_size not in cls._instances:
+            cls._instances[board_size] = TakFeatures(board_size)
+        return cls._instances[board_size]
+
+    def extract(self, state: TakState) -> np.ndarray:
+        """
+        Returns the features of the given state
+        :param state: the state
+        :return: array of self.size floats
+        """
+        board_matrix, _ = state.board.as_3d_matrix()
+        board_matrix = board_matrix.reshape(self.board_size * self.board_size, -1)
+        heights = np.count_nonzero(board_matrix, axis=1)
+        tops = board_matrix[np.arange(len(heights)), np.maximum(heights - 1, 0)]
+        own, other = state.current_player, state.current_player.other()
+        if own == TakPlayer.BLACK:
+            tops = -tops
+
+        features = np.empty(self.size, dtype=np.float64)
+        start, end = self.slices['top_pieces']
+        features[start:end] = (tops[None, :] == np.array(TakFeatures.PIECE_PLANES)[:, None]).reshape(-1)
+        start, end = self.slices['heights']
+        features[start:end] = heights * np.sign(tops) / self.board_size
+        start, end = self.slices['reserves']
+        features[start:end] = [
+            self._pieces_available(state, own) / len(heights),
+            self._pieces_available(state, other) / len(heights),
+            self._capstone_available(state, own),
+            self._capstone_available(state, other),
+        ]
+        start, end = self.slices['roads']
+        features[start:end] = self.road_progress((tops == 1) | (tops == 3)) + \
+            self.road_progress((tops == -1) | (tops == -3))
+        features[self.slices['bias'][0]] = 1.0
+        return features
+
+    def road_progress(self, road_squares: np.ndarray) -> List[float]:
+        """
+        Returns the road progress features of the given road squares (see the class docs)
+        :param road_squares: array of board_size^2 bools, whether each square (file * board_size + rank) can be part
+        of a road
+        :return: [files with road squares, ranks with road squares, most lines spanned by a group], over board_size
+        """
+        road_lines = road_squares.reshape(self.board_size, self.board_size)
+        files = int(road_lines.any(axis=1).sum())
+        ranks = int(road_lines.any(axis=0).sum())
+        best_span = 0
+        remaining = 0
+        for square in np.flatnonzero(road_squares).tolist():
+            remaining |= self._square_bits[square]
+        # Only groups spanning more lines than the best so far can improve it
+        while remaining and best_span < max(files, ranks):
+            group = self.roads.connected(remaining, remaining & -remaining)
+            remaining &= ~group
+            best_span = max(
+                best_span,
+                sum(1 for line in self.roads.files if group & line),
+                sum(1 for line in self.roads.ranks if group & line)
+            )
+        return [files / self.board_size, ranks / self.board_size, best_span / self.board_size]
+
+    @staticmethod
+    def _pieces_available(state: TakState, player: TakPlayer) -> int:
+        return state.white_pieces_available if player == TakPlayer.WHITE else state.black_pieces_available
+
+    @staticmethod
+    def _capstone_available(state: TakState, player: TakPlayer) -> bool:
+        return state.white_capstone_available if player == TakPlayer.WHITE else state.black_capstone_available
@@ -0,0 +1,138 @@
+from typing import Dict, List, Tuple
+
+from tak_env.TakAction import TakAction, TakActionMove, TakActionMoveDir, TakActionTable
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPiece import TakPiece
+from tak_env.TakState import TakState
+
+
+class TakMoveGenerator(object):
+    """
+    TakMoveGenerator class.
+    Generates the legal actions of a state directly from the occupied squares and stack heights, as indices into the
+    global action table (TakActionTable, with its actions in `actions`), instead of checking is_valid on every action
+    of the table.
+
+    The legal actions are the actions of the table that are valid (see is_valid), except on the first action of each
+    player, where only placing a flat stone of the opponent is legal.
+
+    For each square, direction, number of pieces picked up and number of squares travelled, the indices of the move
+    actions are precomputed (and the ones that drop a single piece last, which are the only ones that can flatten a
+    standing stone with a capstone). A move from a square can travel over the empty squares and flat stones of its
+    ray, and only on to a standing stone to flatten it.
+    """
+
+    _instances: Dict[int, 'TakMoveGenerator'] = {}
+
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        self.action_table: TakActionTable = TakActionTable.get(board_size)
+        self.actions: List[TakAction] = list(self.action_table.actions)
+        positions = TakBoard.get_all_positions(board_size)
+        self.directions: List[TakActionMoveDir] = list(TakActionMoveDir)
+
+        # place_indices[piece][square]
+        self.place_indices: Dict[TakPiece, List[int]] = {
+            piece: [self.action_table.place_action(position, piece).action_id for position in positions]
+            for piece in TakPiece.get_all_pieces()
+        }
+
+        # ray_positions[square][direction] = the positions from the square (excluded) to the edge of the board
+        self.ray_positions: List[List[List[Tuple[int, int]]]] = []
+        # move_indices[square][direction][pick up count][squares travelled] = indices of the moves
+        self.move_indices: List[List[List[List[List[int]]]]] = []
+        # flatten_move_indices[square][direction][pick up count][squares travelled] = the ones dropping 1 piece last
+        self.flatten_move_indices: List[List[List[List[List[int]]]]] = []
+        for position in positions:
+            square_rays, square_moves, square_flatten_moves = [], [], []
+            for direction in self.directions:
+                delta_file, delta_rank = direction.get_delta()
+                ray, (file, rank) = [], position
+                while 0 <= file + delta_file < board_size and 0 <= rank + delta_rank < board_size:
+                    file, rank = file + delta_file, rank + delta_rank
+                    ray.append((file, rank))
+                square_rays.append(ray)
+
+                moves = [[[] for _ in range(board_size + 1)] for _ in range(board_size + 1)]
+                flatten_moves = [[[] for _ in range(board_size + 1)] for _ in range(board_size + 1)]
+                for count in range(1, board_size + 1):
+                    for drop_order in sorted(TakActionMove.get_drop_orders_within(count, len(ray))):
+                        index = self.action_table.move_action(position, direction, drop_order).action_id
+                        moves[count][len(drop_order)].append(index)
+                        if drop_order[-1] == 1:
+                            flatten_moves[count][len(drop_order)].append(index)
+                square_moves.append(moves)
+                square_flatten_moves.append(flatten_moves)
+            self.ray_positions.append(square_rays)
+            self.move_indices.append(square_moves)
+            self.flatten_move_indices.append(square_flatten_moves)
+
+    @classmethod
+    def get(cls, board_size: int) -> 'TakMoveGenerator':
+        """
+        Returns the (shared) move generator for the given board size
+        :param board_size: the size of the board
+        :return: TakMoveGenerator
+        """
+        if board_size not in cls._instances:
+            cls._instances[board_size] = TakMoveGenerator(board_size)
+        return cls._instances[board_size]
+
+    def legal_action_indices(self, state: TakState) -> List[int]:
+        """
+        Returns the indices (into `actions`) of the legal actions of the given state, in increasing order
+        :param state: the state
+        :return: list of action indices
+        """
+        board = state.board
+        player = state.current_player
+        empty_squares = [file * self.board_size + rank for file, rank in board.get_empty_positions()]
+
+        if state.first_action():
+            if not state.current_player_has_pieces_available():
+                return []
+            place_indices = self.place_indices[TakPiece.get_flat_piece_for_player(player.other())]
+            return sorted(place_indices[square] for square in empty_squares)
+
+        indices = []
+        place_pieces = []
+        if state.current_player_has_pieces_available():
+            place_pieces += [TakPiece.get_flat_piece_for_player(player), TakPiece.get_standing_piece_for_player(player)]
+        if state.current_player_has_capstone_available():
+            place_pieces.append(TakPiece.get_capstone_piece_for_player(player))
+        for piece in place_pieces:
+            place_indices = self.place_indices[piece]
+            indices.extend(place_indices[square] for square in empty_squares)
+
+        max_pick_up_number = min(state.max_pick_up_number(), self.board_size)
+        for file, rank in board.get_positions_controlled_by_player(player):
+            square = file * self.board_size + rank
+            max_count = min(board.position_height(file, rank), max_pick_up_number)
+            is_capstone = board.top_piece(file, rank).is_capstone()
+            for direction_index, ray in enumerate(self.ray_positions[square]):
+                # Squares the pieces can be dropped on, and whether the capstone can flatten the square after them
+                reach, can_flatten = 0, False
+                for ray_file, ray_rank in ray:
+                    top_piece = board.top_piece(ray_file, ray_rank)
+                    if top_piece is not None and not top_piece.is_flat():
+                        can_flatten = is_capstone and top_piece.is_standing()
+                        break
+                    reach += 1
+
+                moves = self.move_indices[square][direction_index]
+                flatten_moves = self.flatten_move_indices[square][direction_index]
+                for count in range(1, max_count + 1):
+                    for travelled in range(1, min(reach, count) + 1):
+                        indices.extend(moves[count][travelled])
+                    if can_flatten and reach + 1 <= count:
+                        indices.extend(flatten_moves[count][reach + 1])
+        indices.sort()
+        return indices
+
+    def legal_actions(self, state: TakState) -> List[TakAction]:
+        """
+        Returns the legal actions of the given state, in the order of the global action table
+        :param state: the state
+        :return: list of actions
+        """
+        return [self.actions[i] for i in self.legal_action_indices(state)]
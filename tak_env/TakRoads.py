@@ -0,0 +1,242 @@
+from typing import Dict, List, Tuple
+
+
+class TakRoads(object):
+    """
+    TakRoads class.
+    Road detection on bitboards, where square (file, rank) is bit `file * board_size + rank`.
+    Connectivity is found with an iterative flood fill over the bitboard, so each check does at most board_size^2
+    expansion steps (each a handful of integer operations) and never visits a square twice.
+    """
+
+    EDGE_FIRST_RANK = 1
+    EDGE_LAST_RANK = 2
+    EDGE_FIRST_FILE = 4
+    EDGE_LAST_FILE = 8
+
+    _instances: Dict[int, 'TakRoads'] = {}
+
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        self.full = (1 << (board_size * board_size)) - 1
+
+        file_mask = (1 << board_size) - 1
+        rank_mask = sum(1 << (file * board_size) for file in range(board_size))
+
+        # Squares of each file (a vertical straight road) and of each rank (a horizontal straight road)
+        self.files: List[int] = [file_mask << (file * board_size) for file in range(board_size)]
+        self.ranks: List[int] = [rank_mask << rank for rank in range(board_size)]
+
+        # (start, end) edges of vertical and horizontal roads
+        self.edges: List[Tuple[int, int]] = [
+            (self.ranks[0], self.ranks[-1]),
+            (self.files[0], self.files[-1]),
+        ]
+
+        self._not_first_rank = self.full & ~self.ranks[0]
+        self._not_last_rank = self.full & ~self.ranks[-1]
+
+        # Per square: the adjacent squares and the board edges it touches (as TakRoads.EDGE_* flags)
+        self.adjacent: List[List[int]] = []
+        self.square_edges: List[int] = []
+        for file in range(board_size):
+            for rank in range(board_size):
+                self.adjacent.append([
+                    adjacent_file * board_size + adjacent_rank
+                    for adjacent_file, adjacent_rank in [
+                        (file, rank + 1), (file + 1, rank), (file, rank - 1), (file - 1, rank)
+                    ]
+                    if 0 <= adjacent_file < board_size and 0 <= adjacent_rank < board_size
+                ])
+                self.square_edges.append(
+                    (TakRoads.EDGE_FIRST_RANK if rank == 0 else 0) |
+                    (TakRoads.EDGE_LAST_RANK if rank == board_size - 1 else 0) |
+                    (TakRoads.EDGE_FIRST_FILE if file == 0 else 0) |
+                    (TakRoads.EDGE_LAST_FILE if file == board_size - 1 else 0)
+                )
+
+    @classmethod
+    def get(cls, board_size: int) -> 'TakRoads':
+        """
+        Returns the (shared) road detector for the given board size
+        :param board_size: the size of the board
+        :return: TakRoads
+        """
+        if board_size not in cls._instances:
+            cls._instances[board_size] = TakRoads(board_size)
+        return cls._instances[board_size]
+
+    def neighbours(self, mask: int) -> int:
+        """
+        Returns the squares adjacent (up, right, down or left) to any square in the given bitboard
+        :param mask: a bitboard
+        :return: a bitboard
+        """
+        return ((mask << 1) & self._not_first_rank) | \
+               ((mask >> 1) & self._not_last_rank) | \
+               ((mask << self.board_size) & self.full) | \
+               (mask >> self.board_size)
+
+    def connected(self, mask: int, start: int) -> int:
+        """
+        Returns the squares of the given bitboard that are connected to the start squares
+        :param mask: the squares that can be part of the road
+        :param start: the squares to start from
+        :return: a bitboard
+        """
+        reached = mask & start
+        while True:
+            grown = reached | (self.neighbours(reached) & mask)
+            if grown == reached:
+                return reached
+            reached = grown
+
+    def has_road(self, mask: int, only_straight_road: bool = False) -> bool:
+        """
+        Returns whether the given squares connect two opposite edges of the board
+        :param mask: the squares that can be part of the road
+        :param only_straight_road: whether to only count roads along a single file or rank
+        :return: True if there is a road
+        """
+        # Cannot possibly have a road if there are not enough squares for the shortest possible road (straight)
+        if bin(mask).count("1") < self.board_size:
+            return False
+
+        if only_straight_road:
+            return any(mask & line == line for line in self.files) or any(mask & line == line for line in self.ranks)
+
+        for start, end in self.edges:
+            if mask & start and mask & end and self.connected(mask, start) & end:
+                return True
+        return False
+
+
+class TakRoadTracker(object):
+    """
+    TakRoadTracker class.
+    Keeps the connected components of the road squares of one player in a union-find, together with the board edges
+    each component touches, so it can tell whether the player has a road without searching the board.
+
+    Squares that become road squares are merged with their neighbours in (almost) constant time. Union-find cannot
+    split components, so when a square stops being a road square only the component it belonged to is recomputed.
+    """
+
+    VERTICAL_ROAD = TakRoads.EDGE_FIRST_RANK | TakRoads.EDGE_LAST_RANK
+    HORIZONTAL_ROAD = TakRoads.EDGE_FIRST_FILE | TakRoads.EDGE_LAST_FILE
+
+    def __init__(self, board_size: int, road_squares: int = 0):
+        """
+        :param board_size: the size of the board
+        :param road_squares: the bitboard (bit file * board_size + rank) of the road squares of the player
+        """
+        self.roads = TakRoads.get(board_size)
+        self.road_squares = 0
+        self.parent: List[int] = list(range(board_size * board_size))
+        self.edges: List[int] = list(self.roads.square_edges)
+        self.has_road = False
+        self._add_all(road_squares)
+
+    def copy(self) -> 'TakRoadTracker':
+        """
+        Returns a copy of this tracker
+        :return: TakRoadTracker
+        """
+        copied_tracker = TakRoadTracker.__new__(TakRoadTracker)
+        copied_tracker.roads = self.roads
+        copied_tracker.road_squares = self.road_squares
+        copied_tracker.parent = list(self.parent)
+        copied_tracker.edges = list(self.edges)
+        copied_tracker.has_road = self.has_road
+        return copied_tracker
+
+    def find(self, square: int) -> int:
+        """
+        Returns the representative square of the component of the given square
+        :param square: the index of the square
+        :return: the index of the representative square
+        """
+        parent = self.parent
+        root = square
+        while parent[root] != root:
+            root = parent[root]
+        while parent[square] != root:
+            parent[square], square = root, parent[square]
+        return root
+
+    def add(self, square: int) -> None:
+        """
+        Adds a road square, merging it with the adjacent road squares
+        :param square: the index of the square
+        """
+        bit = 1 << square
+        if self.road_squares & bit:
+            return
+        self.road_squares |= bit
+        self.parent[square] = square
+        self.edges[square] = self.roads.square_edges[square]
+
+        root = square
+        for adjacent in self.roads.adjacent[square]:
+            if self.road_squares & (1 << adjacent):
+                adjacent_root = self.find(adjacent)
+                if adjacent_root != root:
+                    self.parent[adjacent_root] = root
+                    self.edges[root] |= self.edges[adjacent_root]
+
+        edges = self.edges[root]
+        if edges & self.VERTICAL_ROAD == self.VERTICAL_ROAD or edges & self.HORIZONTAL_ROAD == self.HORIZONTAL_ROAD:
+            self.has_road = True
+
+    def update(self, square: int, is_road_square: bool) -> None:
+        """
+        Updates whether the given square is a road square of the player
+        :param square: the index of the square
+        :param is_road_square: whether the square is now a road square
+        """
+        bit = 1 << square
+        if is_road_square:
+            self.add(square)
+        elif self.road_squares & bit:
+            self._remove(square)
+
+    def _remove(self, square: int) -> None:
+        """
+        Removes a road square, recomputing the component it belonged to
+        :param square: the index of the square
+        """
+        root = self.find(square)
+        members = []
+        remaining = self.road_squares
+        while remaining:
+            low_bit = remaining & -remaining
+            if self.find(low_bit.bit_length() - 1) == root:
+                members.append(low_bit.bit_length() - 1)
+            remaining ^= low_bit
+
+        component = 0
+        for member in members:
+            component |= 1 << member
+            self.parent[member] = member
+            self.edges[member] = self.roads.square_edges[member]
+
+        self.road_squares &= ~component
+        self._add_all(component & ~(1 << square))
+
+        self.has_road = False
+        remaining = self.road_squares
+        while remaining and not self.has_road:
+            low_bit = remaining & -remaining
+            edges = self.edges[self.find(low_bit.bit_length() - 1)]
+            self.has_road = edges & self.VERTICAL_ROAD == self.VERTICAL_ROAD or \
+                edges & self.HORIZONTAL_ROAD == self.HORIZONTAL_ROAD
+            remaining ^= low_bit
+
+    def _add_all(self, road_squares: int) -> None:
+        """
+        Adds all the road squares of the given bitboard
+        :param road_squares: a bitboard
+        """
+        while road_squares:
+            low_bit = road_squares & -road_squares
+            self.add(low_bit.bit_length() - 1)
+            road_squares ^= low_bit
@@ -1,6 +1,9 @@
-from typing import List, Tuple, Set, Optional, Any, Dict
+from typing import List, Tuple, Set, Optional, Any, Dict, Iterable, Type
 from tak_env.TakBoard import TakBoard
+from tak_env.TakCacheStats import TakCacheStats
 from tak_env.TakPlayer import TakPlayer
+from tak_env.TakRoads import TakRoadTracker
+from tak_env.TakZobrist import TakZobrist
 
 
 class TakState(object):
@@ -13,6 +16,9 @@ class TakState(object):
         - Whether the the white player has a capstone available to place
         - Whether the the black player has a capstone available to place
         - Which player's turn it is
+
+    The terminal info and the winning player of a state are cached for the key of the state (see key), so they are
+    computed again if the state changes (with take(mutate=True), make/undo or changes to its board).
     """
 
     # cache_state_is_terminal: Dict['TakState', Tuple[bool, Dict[str, Any]]] = {}
@@ -42,8 +48,17 @@ class TakState(object):
 
         self.current_player: TakPlayer = current_player
 
+        # Cached results, for the state with the key in _cache_key
+        self._cache_key: Optional[int] = None
         self.cache_is_terminal: Optional[bool] = None
         self.cache_is_terminal_info: Optional[Dict[str, Any]] = None
+        self._cache_has_winning_player: bool = False
+        self._cache_winning_player: Optional[TakPlayer] = None
+
+        # Road components of each player, built on the first road check and then updated by TakAction.make/unmake,
+        # for the board with the key in _road_trackers_key (built again if the board changed in any other way)
+        self._road_trackers: Optional[Dict[TakPlayer, TakRoadTracker]] = None
+        self._road_trackers_key: Optional[int] = None
 
         # if self in TakState.cache_state_is_terminal:
         #     self.cache_is_terminal, self.cache_is_terminal_info = TakState.cache_state_is_terminal[self]
@@ -113,6 +128,81 @@ class TakState(object):
             else:
                 raise ValueError(f"No capstone available for player {player}")
 
+    def add_piece_for_player(self, player: TakPlayer) -> None:
+        """
+        Gives back a piece to the given player (undoes remove_piece_for_player)
+        :param player:
+        """
+        if player == TakPlayer.WHITE:
+            self.white_pieces_available += 1
+        else:
+            self.black_pieces_available += 1
+
+    def add_capstone_for_player(self, player: TakPlayer) -> None:
+        """
+        Gives back the capstone to the given player (undoes remove_capstone_for_player)
+        :param player:
+        """
+        if player == TakPlayer.WHITE:
+            self.white_capstone_available = True
+        else:
+            self.black_capstone_available = True
+
+    def has_path_for_player(
+            self,
+            player: TakPlayer,
+            only_low_road: bool = False,
+            only_high_road: bool = False,
+            only_straight_road: bool = False,
+    ) -> bool:
+        """
+        Returns whether the given player has a path (road) on the board
+        :param player: the player to check the path for
+        :param only_low_road: whether the path can only use stacks of height 1
+        :param only_high_road: whether the path can only use stacks of height 1 or more
+        :param only_straight_road: whether the path has to be along a single file or rank
+        :return: True if the player has a path
+        """
+        if not (only_low_road or only_high_road or only_straight_road):
+            return self.road_trackers()[player].has_road
+        return self.board.has_path_for_player(
+            player,
+            only_low_road=only_low_road, only_high_road=only_high_road, only_straight_road=only_straight_road
+        )
+
+    def road_trackers(self) -> Dict[TakPlayer, TakRoadTracker]:
+        """
+        Returns the road components of each player, building them from the board if needed (the first time, or if
+        the board changed without update_roads, e.g. with direct changes to the board).
+        :return: a TakRoadTracker for each player
+        """
+        if self._road_trackers is None or self._road_trackers_key != self.board.key:
+            self._road_trackers = {
+                player: TakRoadTracker(self.board_size, self.board.road_mask(player)) for player in TakPlayer
+            }
+            self._road_trackers_key = self.board.key
+        return self._road_trackers
+
+    def update_roads(self, positions: Iterable[Tuple[int, int]], previous_board_key: int) -> None:
+        """
+        Updates the road components of each player after the given positions of the board changed (TakAction.make and
+        unmake do it), or drops them if they were not up to date with the board before the change
+        :param positions: the positions that changed
+        :param previous_board_key: the key of the board before the change
+        """
+        if self._road_trackers is None:
+            return
+        if self._road_trackers_key != previous_board_key:
+            self._road_trackers = None
+            return
+        for player, tracker in self._road_trackers.items():
+            for file, rank in positions:
+                tracker.update(
+                    file * self.board_size + rank,
+                    self.board.is_position_controlled_by(file, rank, player, only_road_pieces=True)
+                )
+        self._road_trackers_key = self.board.key
+
     def pieces_left_player(self, player: TakPlayer) -> bool:
         """
         Returns whether there are pieces left for the given player
@@ -144,7 +234,7 @@ class TakState(object):
         Returns a copy of this state
         :return:
         """
-        return TakState(
+        copied_state = TakState(
             self.board_size,
             self.board.copy(),
             self.white_pieces_available,
@@ -153,6 +243,60 @@ class TakState(object):
             self.black_capstone_available,
             self.current_player
         )
+        if self._road_trackers is not None:
+            copied_state._road_trackers = {player: tracker.copy() for player, tracker in self._road_trackers.items()}
+            copied_state._road_trackers_key = self._road_trackers_key
+        copied_state._cache_key = self._cache_key
+        copied_state.cache_is_terminal = self.cache_is_terminal
+        copied_state.cache_is_terminal_info = self.cache_is_terminal_info
+        copied_state._cache_has_winning_player = self._cache_has_winning_player
+        copied_state._cache_winning_player = self._cache_winning_player
+        return copied_state
+
+    def _validate_cache(self) -> None:
+        """
+        Drops the cached results if the state changed since they were computed
+        """
+        key = self.key
+        if key != self._cache_key:
+            self._cache_key = key
+            self.cache_is_terminal = None
+            self.cache_is_terminal_info = None
+            self._cache_has_winning_player = False
+
+    def as_tuple(self) -> Tuple:
+        """
+        Returns a compact (and picklable) representation of this state, used to send states between processes
+        :return: tuple with the board (see TakBoard.as_tuple), the pieces available and the current player
+        """
+        return (
+            self.board_size,
+            self.board.as_tuple(),
+            self.white_pieces_available,
+            self.black_pieces_available,
+            self.white_capstone_available,
+            self.black_capstone_available,
+            self.current_player.value
+        )
+
+    @staticmethod
+    def from_tuple(state_tuple: Tuple, board_class: Type[TakBoard] = TakBoard) -> 'TakState':
+        """
+        Builds a state from its compact representation (see as_tuple)
+        :param state_tuple: the compact representation of the state
+        :param board_class: the board representation to use (TakBoard or a subclass)
+        :return: TakState
+        """
+        board_size, board_tuple, white_pieces, black_pieces, white_capstone, black_capstone, player = state_tuple
+        return TakState(
+            board_size,
+            board_class.from_tuple(board_tuple, board_size),
+            white_pieces,
+            black_pieces,
+            white_capstone,
+            black_capstone,
+            TakPlayer(player)
+        )
 
     # def is_terminal(self) -> Tuple[bool, Optional[Dict[str, Any]]]:
     #     """
@@ -186,42 +330,62 @@ class TakState(object):
     def is_terminal(self) -> Tuple[bool, Optional[Dict[str, Any]]]:
         """
         Returns whether this state is terminal (and extra info)
-        :return: True if this state is terminal, False otherwise, and extra info as a dictionary
+        :return: True if this state is terminal, False otherwise, and extra info as a dictionary (a new one each call)
         """
-        has_path_for_white = self.board.has_path_for_player(TakPlayer.WHITE)
-        has_path_for_black = self.board.has_path_for_player(TakPlayer.BLACK)
+        self._validate_cache()
+        if self.cache_is_terminal is not None:
+            TakCacheStats.hit('is_terminal')
+            return self.cache_is_terminal, dict(self.cache_is_terminal_info)
+        TakCacheStats.miss('is_terminal')
+
+        has_path_for_white = self.has_path_for_player(TakPlayer.WHITE)
+        has_path_for_black = self.has_path_for_player(TakPlayer.BLACK)
 
         has_path = has_path_for_white and has_path_for_black
 
         has_pieces_left = self.pieces_left()
         has_spaces_left = self.spaces_left()
 
-        winning_player = self.winning_player(has_path_for_white, has_path_for_black)
-
         done = has_path or not has_pieces_left or not has_spaces_left
+        info = {}
         if done:
-            return done, {
-                    "ended_with_path": has_path,
-                    "ended_with_no_pieces_left": not has_pieces_left,
-                    "ended_with_no_spaces_left": not has_spaces_left,
-                    "winning_player": winning_player,
-                }
-        return done, {}
+            info = {
+                "ended_with_path": has_path,
+                "ended_with_no_pieces_left": not has_pieces_left,
+                "ended_with_no_spaces_left": not has_spaces_left,
+                "winning_player": self.winning_player(has_path_for_white, has_path_for_black),
+            }
+        self.cache_is_terminal, self.cache_is_terminal_info = done, info
+        return done, dict(info)
 
     def winning_player(self, has_path_for_white: bool = None, has_path_for_black: bool = None) \
             -> Optional[TakPlayer]:
         """
         Determines which player won the game. Assumes that the game is over.
 
-        :param has_path_for_white: Whether white has a path
-        :param has_path_for_black: Whether black has a path
+        :param has_path_for_white: Whether white has a path (if already known, only saves checking it again)
+        :param has_path_for_black: Whether black has a path (if already known, only saves checking it again)
         :return: The winning player
         """
+        self._validate_cache()
+        if self._cache_has_winning_player:
+            TakCacheStats.hit('winning_player')
+            return self._cache_winning_player
+        TakCacheStats.miss('winning_player')
+        self._cache_winning_player = self._compute_winning_player(has_path_for_white, has_path_for_black)
+        self._cache_has_winning_player = True
+        return self._cache_winning_player
+
+    def _compute_winning_player(
+            self,
+            has_path_for_white: Optional[bool],
+            has_path_for_black: Optional[bool]
+    ) -> Optional[TakPlayer]:
         last_play_by: TakPlayer = self.current_player.other()
         if has_path_for_white is None:
-            has_path_for_white = self.board.has_path_for_player(TakPlayer.WHITE)
+            has_path_for_white = self.has_path_for_player(TakPlayer.WHITE)
         if has_path_for_black is None:
-            has_path_for_black = self.board.has_path_for_player(TakPlayer.BLACK)
+            has_path_for_black = self.has_path_for_player(TakPlayer.BLACK)
 
         # Did the last player to play win?
         if last_play_by == TakPlayer.WHITE and has_path_for_white:
@@ -262,14 +426,27 @@ class TakState(object):
                self.black_capstone_available == other.black_capstone_available and \
                self.current_player == other.current_player
 
+    @property
+    def key(self) -> int:
+        """
+        Zobrist key of this state: the (incrementally updated) key of the board combined with the keys of the player
+        to move and the pieces each player has left.
+        Equal states always have the same key.
+        :return: 64-bit int
+        """
+        zobrist = TakZobrist.get(self.board_size)
+        key = self.board.key ^ zobrist.player_keys[self.current_player] ^ \
+            zobrist.reserve_key(TakPlayer.WHITE, self.white_pieces_available) ^ \
+            zobrist.reserve_key(TakPlayer.BLACK, self.black_pieces_available)
+        if self.white_capstone_available:
+            key ^= zobrist.capstone_keys[TakPlayer.WHITE]
+        if self.black_capstone_available:
+            key ^= zobrist.capstone_keys[TakPlayer.BLACK]
+        return key
+
     def __hash__(self) -> int:
         """
         Gets the hash of this state
         :return: int hash value
         """
-        return hash((
-            self.board_size, self.board,
-            self.white_pieces_available, self.black_pieces_available,
-            self.white_capstone_available, self.black_capstone_available,
-            self.current_player
-        ))
\ No newline at end of file
+        return self.key
@@ -0,0 +1,189 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tak_env.TakAction import TakAction, TakActionMove, TakActionMoveDir, TakActionPlace, TakActionTable
+from tak_env.TakBoard import TakBoard
+from tak_env.TakState import TakState
+
+
+class TakSymmetry(object):
+    """
+    TakSymmetry class.
+    The 8 symmetries of the square board (the dihedral group: 4 rotations, each optionally after mirroring the files),
+    applied to positions, move directions, actions and states. Transform t mirrors if t >= 4 and then rotates by
+    t % 4 quarter turns; transform 0 is the identity.
+
+    The canonical form of a state is its transform with the smallest board (comparing the compact representation of
+    the boards, see TakBoard.as_tuple), so all the rotated and mirrored versions of a position have the same canonical
+    state. Rotations and mirrors do not change the pieces left or the player to move.
+    """
+
+    TRANSFORMS = 8
+
+    _instances: Dict[int, 'TakSymmetry'] = {}
+
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        self.action_table: TakActionTable = TakActionTable.get(board_size)
+        positions = TakBoard.get_all_positions(board_size)
+
+        # position_maps[t][position] = transformed position
+        self.position_maps: List[Dict[Tuple[int, int], Tuple[int, int]]] = [
+            {position: self._transform(position, t, board_size - 1) for position in positions}
+            for t in range(TakSymmetry.TRANSFORMS)
+        ]
+        # square_sources[t][square] = square (index in get_all_positions order) that is moved to the square by t
+        self.square_sources: List[List[int]] = []
+        for position_map in self.position_maps:
+            sources = [0] * len(positions)
+            for square, position in enumerate(positions):
+                to_file, to_rank = position_map[position]
+                sources[to_file * board_size + to_rank] = square
+            self.square_sources.append(sources)
+        # direction_maps[t][direction] = transformed direction (the deltas transform without the offsets)
+        deltas = {direction.get_delta(): direction for direction in TakActionMoveDir}
+        self.direction_maps: List[Dict[TakActionMoveDir, TakActionMoveDir]] = [
+            {direction: deltas[self._transform(direction.get_delta(), t, 0)] for direction in TakActionMoveDir}
+            for t in range(TakSymmetry.TRANSFORMS)
+        ]
+        self.inverses: List[int] = [
+            next(u for u in range(TakSymmetry.TRANSFORMS) if all(
+                self.position_maps[u][self.position_maps[t][position]] == position for position in positions
+            ))
+            for t in range(TakSymmetry.TRANSFORMS)
+        ]
+        self._action_maps: List[Dict[TakAction, TakAction]] = []
+        # _action_id_maps[t][action id] = id of the transformed action
+        self._action_id_maps: Optional[np.ndarray] = None
+
+    @classmethod
+    def get(cls, board_size: int) -> 'TakSymmetry':
+        """
+        Returns the (shared) symmetries for the given board size
+        :param board_size: the size of the board
+        :return: TakSymmetry
+        """
+        if board_size not in cls._instances:
+            cls._instances[board_size] = TakSymmetry(board_size)
+        return cls._instances[board_size]
+
+    @staticmethod
+    def _transform(position: Tuple[int, int], t: int, last: int) -> Tuple[int, int]:
+        file, rank = position
+        if t >= 4:
+            file = last - file
+        for _ in range(t % 4):
+            file, rank = rank, last - file
+        return file, rank
+
+    def inverse(self, t: int) -> int:
+        """
+        Returns the transform that undoes the given one
+        :param t: the transform
+        :return: the inverse transform
+        """
+        return self.inverses[t]
+
+    def transform_position(self, position: Tuple[int, int], t: int) -> Tuple[int, int]:
+        return self.position_maps[t][position]
+
+    def transform_direction(self, direction: TakActionMoveDir, t: int) -> TakActionMoveDir:
+        return self.direction_maps[t][direction]
+
+    def transform_action(self, action: TakAction, t: int) -> TakAction:
+        """
+        Returns the action that does on the transformed state what the given action does on the state
+        :param action: a TakActionPlace or TakActionMove
+        :param t: the transform
+        :return: the transformed action
+        """
+        if t == 0:
+            return action
+        if not self._action_maps:
+            all_actions = self.action_table.actions
+            self._action_maps = [
+                {a: self._transform_action(a, u) for a in all_actions} for u in range(TakSymmetry.TRANSFORMS)
+            ]
+        transformed = self._action_maps[t].get(action)
+        return transformed if transformed is not None else self._transform_action(action, t)
+
+    def transform_action_ids(self, action_ids: np.ndarray, t: int) -> np.ndarray:
+        """
+        Returns the ids (in the action table) of the transformed actions of the given ids (see transform_action)
+        :param action_ids: array of action ids
+        :param t: the transform
+        :return: array of the ids of the transformed actions
+        """
+        if t == 0:
+            return action_ids
+        if self._action_id_maps is None:
+            self._action_id_maps = np.array([
+                [self._transform_action(action, u).action_id for action in self.action_table.actions]
+                for u in range(TakSymmetry.TRANSFORMS)
+            ], dtype=np.int64)
+        return self._action_id_maps[t][action_ids]
+
+    def _transform_action(self, action: TakAction, t: int) -> TakAction:
+        position = self.position_maps[t][action.position]
+        if isinstance(action, TakActionPlace):
+            return self.action_table.place_action(position, action.piece)
+        if isinstance(action, TakActionMove):
+            return self.action_table.move_action(position, self.direction_maps[t][action.direction], action.drop_order)
+        raise ValueError(f"Unknown action type: {type(action)}")
+
+    def transform_board_tuple(self, board_tuple: Tuple[Tuple[int, ...], ...], t: int) -> Tuple[Tuple[int, ...], ...]:
+        """
+        Transforms the compact representation of a board (see TakBoard.as_tuple)
+        :param board_tuple: the compact representation of the board
+        :param t: the transform
+        :return: the compact representation of the transformed board
+        """
+        return tuple(board_tuple[square] for square in self.square_sources[t])
+
+    def transform_state(self, state: TakState, t: int) -> TakState:
+        """
+        Returns the transformed state (a copy, with the same board representation)
+        :param state: the state
+        :param t: the transform
+        :return: TakState
+        """
+        state_tuple = state.as_tuple()
+        return self._state_from_tuple(state, state_tuple, self.transform_board_tuple(state_tuple[1], t))
+
+    def canonical_transform(self, state: TakState) -> int:
+        """
+        Returns the transform that takes the given state to its canonical form (the first one on ties)
+        :param state: the state
+        :return: the transform
+        """
+        return self._canonical_board_tuple(state.board.as_tuple())[1]
+
+    def canonical(self, state: TakState) -> Tuple[TakState, int]:
+        """
+        Returns the canonical form of the given state (the state itself if it is already canonical), and the transform
+        that takes the state to it. Actions of the state are transformed to actions of the canonical state with
+        transform_action(action, t), and back with transform_action(action, inverse(t)).
+        :param state: the state
+        :return: the canonical state, and the transform
+        """
+        state_tuple = state.as_tuple()
+        board_tuple, t = self._canonical_board_tuple(state_tuple[1])
+        if t == 0:
+            return state, 0
+        return self._state_from_tuple(state, state_tuple, board_tuple), t
+
+    def _canonical_board_tuple(
+            self,
+            board_tuple: Tuple[Tuple[int, ...], ...]
+    ) -> Tuple[Tuple[Tuple[int, ...], ...], int]:
+        best_board_tuple, best_t = board_tuple, 0
+        for t in range(1, TakSymmetry.TRANSFORMS):
+            transformed = self.transform_board_tuple(board_tuple, t)
+            if transformed < best_board_tuple:
+                best_board_tuple, best_t = transformed, t
+        return best_board_tuple, best_t
+
+    @staticmethod
+    def _state_from_tuple(state: TakState, state_tuple: Tuple, board_tuple: Tuple[Tuple[int, ...], ...]) -> TakState:
+        return TakState.from_tuple(state_tuple[:1] + (board_tuple,) + state_tuple[2:], type(state.board))
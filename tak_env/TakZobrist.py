@@ -0,0 +1,92 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+
+
+class TakZobrist(object):
+    """
+    TakZobrist class.
+    Random 64-bit keys used to build Zobrist hashes of boards and states: the key of a board is the XOR of the keys of
+    each (square, depth in the stack, piece) on it, so placing or removing a piece updates it with a single XOR.
+    The key of a state also folds in the player to move and the pieces each player has left.
+
+    Keys are generated from a fixed seed (and lazily, in order, for deeper stacks and larger reserves), so the same
+    position gets the same key in every run and process.
+    """
+
+    SEED = 4180
+
+    PIECE_INDEX: Dict[TakPiece, int] = {piece: i for i, piece in enumerate(TakPiece.get_all_pieces())}
+
+    _instances: Dict[int, 'TakZobrist'] = {}
+
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        self._piece_rng = np.random.RandomState((TakZobrist.SEED, board_size, 0))
+        self._reserve_rng = np.random.RandomState((TakZobrist.SEED, board_size, 1))
+
+        # _piece_keys[depth][square][piece index]
+        self._piece_keys: List[List[List[int]]] = []
+        # _reserve_keys[pieces left] = (key for white, key for black)
+        self._reserve_keys: List[Tuple[int, int]] = []
+
+        player_keys = self._random_keys(self._reserve_rng, 4)
+        self.player_keys: Dict[TakPlayer, int] = {TakPlayer.WHITE: player_keys[0], TakPlayer.BLACK: player_keys[1]}
+        self.capstone_keys: Dict[TakPlayer, int] = {TakPlayer.WHITE: player_keys[2], TakPlayer.BLACK: player_keys[3]}
+
+    @classmethod
+    def get(cls, board_size: int) -> 'TakZobrist':
+        """
+        Returns the (shared) keys for the given board size
+        :param board_size: the size of the board
+        :return: TakZobrist
+        """
+        if board_size not in cls._instances:
+            cls._instances[board_size] = TakZobrist(board_size)
+        return cls._instances[board_size]
+
+    @staticmethod
+    def _random_keys(rng: np.random.RandomState, count: int) -> List[int]:
+        return rng.randint(0, 2 ** 64, size=count, dtype=np.uint64).tolist()
+
+    def piece_key(self, square: int, depth: int, piece: TakPiece) -> int:
+        """
+        Returns the key of a piece at the given depth (0 is the bottom) of the stack of the given square
+        :param square: the index of the square (file * board_size + rank)
+        :param depth: the position of the piece in the stack
+        :param piece: the piece
+        :return: int
+        """
+        while depth >= len(self._piece_keys):
+            keys = self._random_keys(self._piece_rng, self.board_size * self.board_size * len(self.PIECE_INDEX))
+            self._piece_keys.append([
+                keys[square_keys:square_keys + len(self.PIECE_INDEX)]
+                for square_keys in range(0, len(keys), len(self.PIECE_INDEX))
+            ])
+        return self._piece_keys[depth][square][self.PIECE_INDEX[piece]]
+
+    def reserve_key(self, player: TakPlayer, pieces_available: int) -> int:
+        """
+        Returns the key of the given player having the given number of (non capstone) pieces left
+        :param player: the player
+        :param pieces_available: the number of pieces left
+        :return: int
+        """
+        while pieces_available >= len(self._reserve_keys):
+            self._reserve_keys.append(tuple(self._random_keys(self._reserve_rng, 2)))
+        return self._reserve_keys[pieces_available][0 if player == TakPlayer.WHITE else 1]
+
+    def board_key(self, board) -> int:
+        """
+        Computes the key of the given board from scratch
+        :param board: a TakBoard
+        :return: int
+        """
+        key = 0
+        for file, rank in board.get_all_positions(self.board_size):
+            for depth, piece in enumerate(board.get_stack(file, rank).as_list()):
+                key ^= self.piece_key(file * self.board_size + rank, depth, piece)
+        return key
@@ -0,0 +1,114 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from agents.MCTSPlayerArrayKnowledgeGraph import MCTSPlayerArrayKnowledgeGraph
+from agents.TakMCTSPlayerAgent import MCTSPlayerKnowledgeGraph, TakMCTSPlayerAgent
+from tak_env.TakAction import TakAction
+from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakPlayer import TakPlayer
+
+
+class TestAgentsMCTSPlayerArrayKnowledgeGraphMethods(unittest.TestCase):
+
+    @staticmethod
+    def chain_graph(graph_class):
+        # The initial state (0), a child of it (1) and a grandchild (2) that is also reached from a second child (3)
+        with TakEnvironment(board_size=3) as env:
+            initial_state = env.reset()
+        graph = graph_class(initial_state)
+        actions = TakAction.get_possible_actions(initial_state)
+        child = actions[0].take(initial_state)
+        graph.add_state(0, child, actions[0])
+        grandchild_action = TakAction.get_possible_actions(child)[0]
+        grandchild = grandchild_action.take(child)
+        graph.add_state(1, grandchild, grandchild_action)
+        other_child = actions[1].take(initial_state)
+        graph.add_state(0, other_child, actions[1])
+        graph.add_state(3, grandchild, grandchild_action)
+        return graph, actions
+
+    def test_same_search_as_knowledge_graph(self):
+        for backup_mode in ['dag', 'path', 'bounded']:
+            graphs, actions = [], []
+            for graph_class in [MCTSPlayerKnowledgeGraph, MCTSPlayerArrayKnowledgeGraph]:
+                np.random.seed(6)
+                with TakEnvironment(board_size=3) as env:
+                    state = env.reset()
+                    graph = graph_class(state)
+                    agent = TakMCTSPlayerAgent(
+                        env, TakPlayer.WHITE, graph, mcts_iterations=15, rollout_runs=3, parallel_rollouts=False,
+                        backup_mode=backup_mode, backup_depth=2
+                    )
+                    actions.append([str(agent.select_action(state)) for _ in range(3)])
+                graphs.append(graph)
+
+            graph, array_graph = graphs
+            self.assertEqual(actions[0], actions[1])
+            self.assertEqual(graph.total_nodes(), array_graph.total_nodes())
+            self.assertEqual(graph.total_rollouts(), array_graph.total_rollouts())
+            for node_id in range(graph.total_nodes()):
+                self.assertEqual(graph.get_state(node_id), array_graph.get_state(node_id))
+                self.assertEqual(graph.g.vs[node_id]['visits'], array_graph.visits[node_id])
+                self.assertAlmostEqual(graph.get_state_value(node_id), array_graph.get_state_value(node_id))
+                self.assertEqual(
+                    [(str(action), target) for action, target in graph.get_children(node_id)],
+                    [(str(action), target) for action, target in array_graph.get_children(node_id)]
+                )
+
+    def test_add_stats(self):
+        graph, _ = self.chain_graph(MCTSPlayerArrayKnowledgeGraph)
+        graph.add_stats([0, 2], 3, 1.5)
+        # Negative values take them back (e.g. a virtual loss)
+        graph.add_stats(np.array([2]), -1, -1.5)
+        self.assertEqual([3, 0, 2, 0], list(graph.visits[:4]))
+        self.assertEqual([1.5, 0.0, 0.0, 0.0], list(graph.sum_reward[:4]))
+        self.assertEqual(0.0, graph.get_state_value(2))
+        self.assertEqual(0.5, graph.get_state_value(0))
+        self.assertEqual(5, graph.total_rollouts())
+
+    def test_get_ancestors(self):
+        graph, _ = self.chain_graph(MCTSPlayerArrayKnowledgeGraph)
+        self.assertEqual([], graph.get_ancestors(0))
+        self.assertEqual([1, 3], graph.get_ancestors(2, max_depth=1))
+        # The initial state is reached from both parents, but is only returned once
+        self.assertEqual([1, 3, 0], graph.get_ancestors(2))
+        self.assertEqual([1, 3, 0], graph.get_ancestors(2, max_depth=5))
+        self.assertEqual([], graph.get_ancestors(2, max_depth=0))
+
+    def test_get_best_child_action(self):
+        graph, actions = self.chain_graph(MCTSPlayerArrayKnowledgeGraph)
+        self.assertIsNone(graph.get_best_child_action(2))
+        # Ties go to the first child
+        self.assertEqual(actions[0], graph.get_best_child_action(0))
+        self.assertEqual(actions[0], graph.get_best_child_action(0, maximize=False))
+        graph.add_stats([3], 2, 1.0)
+        self.assertEqual(actions[1], graph.get_best_child_action(0))
+        self.assertEqual(actions[0], graph.get_best_child_action(0, maximize=False))
+        graph.add_stats([1], 1, 0.5)
+        self.assertEqual(actions[0], graph.get_best_child_action(0))
+
+    def test_save_load_stats(self):
+        graph, actions = self.chain_graph(MCTSPlayerArrayKnowledgeGraph)
+        graph.add_stats([0, 1, 2], 4, 2.0)
+        graph.add_stats([3], 1, -1.0)
+        with tempfile.TemporaryDirectory() as path:
+            graph.save_stats(path)
+
+            # Nodes in the graph get their stats on load, the others when they are added
+            loaded_graph = MCTSPlayerArrayKnowledgeGraph(graph.get_state(0))
+            loaded_graph.load_stats(path)
+            self.assertEqual(4, loaded_graph.visits[0])
+            self.assertEqual(1, loaded_graph.total_nodes())
+            node_id = loaded_graph.add_state(0, graph.get_state(3), actions[1])
+            self.assertEqual(1, loaded_graph.visits[node_id])
+            self.assertEqual(-1.0, loaded_graph.get_state_value(node_id))
+            self.assertEqual(5, loaded_graph.total_rollouts())
+
+            with self.assertRaises(ValueError):
+                MCTSPlayerArrayKnowledgeGraph(graph.get_state(0), canonical_states=True).load_stats(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
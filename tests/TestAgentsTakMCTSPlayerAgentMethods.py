@@ -0,0 +1,114 @@
+import unittest
+
+import numpy as np
+
+from agents.MCTSPlayerArrayKnowledgeGraph import MCTSPlayerArrayKnowledgeGraph
+from agents.TakMCTSPlayerAgent import MCTSPlayerKnowledgeGraph, TakMCTSPlayerAgent
+from agents.TakMCTSPlayerAgent2 import TakMCTSPlayerAgent2
+from tak_env.TakAction import TakAction
+from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakPlayer import TakPlayer
+
+
+class TestAgentsTakMCTSPlayerAgentMethods(unittest.TestCase):
+
+    @staticmethod
+    def dag_graph(graph_class, env: TakEnvironment):
+        # The initial state (0), two children of it (1 and 3) and a grandchild (2) reached from both, and a child of
+        # the grandchild (4)
+        initial_state = env.reset()
+        graph = graph_class(initial_state)
+        actions = TakAction.get_possible_actions(initial_state)
+        child = actions[0].take(initial_state)
+        graph.add_state(0, child, actions[0])
+        grandchild_action = TakAction.get_possible_actions(child)[0]
+        grandchild = grandchild_action.take(child)
+        graph.add_state(1, grandchild, grandchild_action)
+        graph.add_state(0, actions[1].take(initial_state), actions[1])
+        graph.add_state(3, grandchild, grandchild_action)
+        leaf_action = TakAction.get_possible_actions(grandchild)[0]
+        graph.add_state(2, leaf_action.take(grandchild), leaf_action)
+        return graph
+
+    @staticmethod
+    def node_stats(graph):
+        node_ids = range(graph.total_nodes())
+        if isinstance(graph, MCTSPlayerArrayKnowledgeGraph):
+            return [int(graph.visits[node_id]) for node_id in node_ids], \
+                [float(graph.sum_reward[node_id]) for node_id in node_ids]
+        return [graph.g.vs[node_id]['visits'] for node_id in node_ids], \
+            [float(graph.g.vs[node_id]['sum_reward']) for node_id in node_ids]
+
+    def backed_up(self, backup_mode: str, leaf_node_id: int, path=None):
+        # The visits and total rewards of the nodes after backing up 2 rewards, and the updates of the statistics
+        # (both graphs must agree)
+        results = []
+        for graph_class in [MCTSPlayerKnowledgeGraph, MCTSPlayerArrayKnowledgeGraph]:
+            with TakEnvironment(board_size=3) as env:
+                graph = self.dag_graph(graph_class, env)
+                agent = TakMCTSPlayerAgent(
+                    env, TakPlayer.WHITE, graph, parallel_rollouts=False, backup_mode=backup_mode, backup_depth=1
+                )
+                updates = []
+                add_stats_name = 'add_stats' if graph_class is MCTSPlayerArrayKnowledgeGraph else '_add_visits_to_nodes'
+                add_stats = getattr(graph, add_stats_name)
+
+                def recording_add_stats(node_ids, visits, sum_reward):
+                    updates.append((sorted(int(node_id) for node_id in node_ids), visits, sum_reward))
+                    add_stats(node_ids, visits, sum_reward)
+
+                setattr(graph, add_stats_name, recording_add_stats)
+                agent.backup(graph.get_state(leaf_node_id), [1.0, -0.5], path)
+                results.append((self.node_stats(graph), updates))
+        self.assertEqual(results[0], results[1])
+        return results[0]
+
+    def test_backup_dag(self):
+        (visits, sum_rewards), updates = self.backed_up('dag', 4)
+        # Every ancestor once (the initial state is reached from two children), with one visit per reward
+        self.assertEqual([2, 2, 2, 2, 2], visits)
+        self.assertEqual([0.5] * 5, sum_rewards)
+        self.assertEqual([([0, 1, 2, 3, 4], 2, 0.5)], updates)
+
+    def test_backup_path(self):
+        # A path that goes through node 2 twice
+        (visits, sum_rewards), updates = self.backed_up('path', 4, [0, 3, 2, 3, 2, 4])
+        self.assertEqual([2, 0, 2, 2, 2], visits)
+        self.assertEqual([0.5, 0.0, 0.5, 0.5, 0.5], sum_rewards)
+        self.assertEqual([([0, 2, 3, 4], 2, 0.5)], updates)
+
+    def test_backup_bounded(self):
+        # Only the parents of the expanded node (backup_depth 1)
+        (visits, _), _ = self.backed_up('bounded', 4)
+        self.assertEqual([0, 0, 2, 0, 2], visits)
+        (visits, _), updates = self.backed_up('bounded', 2)
+        self.assertEqual([0, 2, 2, 2, 0], visits)
+        self.assertEqual([([1, 2, 3], 2, 0.5)], updates)
+
+    def test_search_backs_up_once_per_rollout(self):
+        np.random.seed(7)
+        with TakEnvironment(board_size=3) as env:
+            state = env.reset()
+            graph = MCTSPlayerArrayKnowledgeGraph(state)
+            agent = TakMCTSPlayerAgent(
+                env, TakPlayer.WHITE, graph, rollout_runs=3, parallel_rollouts=False, backup_mode='path'
+            )
+            updates = []
+            add_stats = graph.add_stats
+            graph.add_stats = lambda node_ids, visits, sum_reward: (
+                updates.append(visits), add_stats(node_ids, visits, sum_reward)
+            )
+            agent.search(state, 5)
+        self.assertEqual([3] * 5, updates)
+        self.assertEqual(15, graph.visits[graph.initial_state_node_id])
+
+    def test_unknown_backup_mode(self):
+        with TakEnvironment(board_size=3) as env:
+            graph = MCTSPlayerArrayKnowledgeGraph(env.reset())
+            for agent_class in [TakMCTSPlayerAgent, TakMCTSPlayerAgent2]:
+                with self.assertRaises(ValueError):
+                    agent_class(env, TakPlayer.WHITE, graph, backup_mode='tree')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from collections import defaultdict
+
+import numpy as np
+
+from agents.MCTSPlayerArrayKnowledgeGraph import MCTSPlayerArrayKnowledgeGraph
+from agents.TakParallelMCTSPlayerAgent import TakParallelMCTSPlayerAgent, _init_search_worker, _search_root
+from policies.RandomPolicy import RandomPolicy
+from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakPlayer import TakPlayer
+
+
+class TestAgentsTakParallelMCTSPlayerAgentMethods(unittest.TestCase):
+
+    @staticmethod
+    def root_stats(graph: MCTSPlayerArrayKnowledgeGraph):
+        # Visits and total reward of the root, and of each of its children by action
+        root_node_id = graph.initial_state_node_id
+        children = {
+            str(action): (int(graph.visits[node_id]), float(graph.sum_reward[node_id]))
+            for action, node_id in graph.get_children(root_node_id)
+        }
+        return int(graph.visits[root_node_id]), float(graph.sum_reward[root_node_id]), children
+
+    def test_root_parallel(self):
+        with TakEnvironment(board_size=3) as env:
+            state = env.reset()
+            graph = MCTSPlayerArrayKnowledgeGraph(state)
+            agent = TakParallelMCTSPlayerAgent(
+                env, TakPlayer.WHITE, graph, mcts_iterations=6, rollout_runs=2, parallel_mode='root', workers=2,
+                seed=9
+            )
+            try:
+                actions = [agent.select_action(state) for _ in range(2)]
+            finally:
+                agent.close()
+
+            # The same searches in this process: worker i of search s is seeded with seed + s * workers + i
+            _init_search_worker(env, TakPlayer.WHITE, RandomPolicy(), {
+                'mcts_expansion_depth': 3,
+                'mcts_expansion_epsilon': 0.5,
+                'rollout_runs': 2,
+                'backup_mode': 'dag',
+                'backup_depth': 3,
+                'time_budget_ms': None,
+                'node_budget': None,
+            })
+            root_visits, root_sum_reward = 0, 0.0
+            children = defaultdict(lambda: (0, 0.0))
+            for search in range(2):
+                for worker in range(2):
+                    worker_visits, worker_sum_reward, worker_children, _ = _search_root(
+                        state.as_tuple(), 3, 9 + search * 2 + worker
+                    )
+                    root_visits, root_sum_reward = root_visits + worker_visits, root_sum_reward + worker_sum_reward
+                    for action_id, visits, sum_reward in worker_children:
+                        action = str(graph.action_table.action(action_id))
+                        children[action] = (children[action][0] + visits, children[action][1] + sum_reward)
+
+        merged_visits, merged_sum_reward, merged_children = self.root_stats(graph)
+        # 2 searches of 6 iterations of 2 rollouts
+        self.assertEqual(24, merged_visits)
+        self.assertEqual(root_visits, merged_visits)
+        self.assertAlmostEqual(root_sum_reward, merged_sum_reward)
+        self.assertEqual(set(children), set(merged_children))
+        for action, (visits, sum_reward) in children.items():
+            self.assertEqual(visits, merged_children[action][0])
+            self.assertAlmostEqual(sum_reward, merged_children[action][1])
+        self.assertEqual(graph.total_nodes(), 1 + len(children))
+
+        # The same seed and number of workers give the same actions and statistics
+        with TakEnvironment(board_size=3) as env:
+            state = env.reset()
+            other_graph = MCTSPlayerArrayKnowledgeGraph(state)
+            other_agent = TakParallelMCTSPlayerAgent(
+                env, TakPlayer.WHITE, other_graph, mcts_iterations=6, rollout_runs=2, parallel_mode='root', workers=2,
+                seed=9
+            )
+            try:
+                other_actions = [other_agent.select_action(state) for _ in range(2)]
+            finally:
+                other_agent.close()
+        self.assertEqual([str(action) for action in actions], [str(action) for action in other_actions])
+        self.assertEqual(self.root_stats(graph), self.root_stats(other_graph))
+
+    def test_tree_parallel_virtual_loss(self):
+        with TakEnvironment(board_size=3) as env:
+            state = env.reset()
+            graph = MCTSPlayerArrayKnowledgeGraph(state)
+            agent = TakParallelMCTSPlayerAgent(
+                env, TakPlayer.WHITE, graph, mcts_iterations=8, rollout_runs=2, backup_mode='path',
+                parallel_mode='tree', workers=2, virtual_loss=5.0, seed=3
+            )
+            # The rewards backed up to each path
+            backups = []
+            backup = agent.backup
+
+            def recording_backup(expansion_end_state, rewards, expansion_path=None):
+                backups.append((list(expansion_path), list(rewards)))
+                backup(expansion_end_state, rewards, expansion_path)
+
+            agent.backup = recording_backup
+            try:
+                agent.select_action(state)
+                agent.select_action(state)
+            finally:
+                agent.close()
+
+        self.assertEqual(16, len(backups))
+        self.assertEqual(32, sum(len(rewards) for _, rewards in backups))
+        # Once all the simulations finished, only the real rollouts are left on the nodes
+        visits, sum_reward = np.zeros(graph.total_nodes()), np.zeros(graph.total_nodes())
+        for path, rewards in backups:
+            nodes = np.unique(path)
+            visits[nodes] += len(rewards)
+            sum_reward[nodes] += sum(rewards)
+        self.assertEqual(list(visits), list(graph.visits[:graph.total_nodes()]))
+        np.testing.assert_allclose(sum_reward, graph.sum_reward[:graph.total_nodes()])
+        self.assertEqual(32, graph.visits[graph.initial_state_node_id])
+
+    def test_invalid_arguments(self):
+        with TakEnvironment(board_size=3) as env:
+            graph = MCTSPlayerArrayKnowledgeGraph(env.reset())
+            with self.assertRaises(ValueError):
+                TakParallelMCTSPlayerAgent(env, TakPlayer.WHITE, graph, parallel_mode='leaf')
+            for workers in [0, -2]:
+                with self.assertRaises(ValueError):
+                    TakParallelMCTSPlayerAgent(env, TakPlayer.WHITE, graph, workers=workers)
+            self.assertEqual(3, TakParallelMCTSPlayerAgent(env, TakPlayer.WHITE, graph, workers=3).workers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+
+from agents.MCTSPlayerArrayKnowledgeGraph import MCTSPlayerArrayKnowledgeGraph
+from agents.TakMCTSPlayerAgent import TakMCTSPlayerAgent
+from agents.TakMCTSPlayerAgent2 import TakMCTSPlayerAgent2
+from agents.TakRolloutExecutor import TakRolloutExecutor, TakThreadRolloutExecutor, TakBatchRolloutExecutor, \
+    TakProcessRolloutExecutor
+from policies.EGreedyPolicy import EGreedyPolicy
+from policies.RandomPolicyEff import RandomPolicyEff
+from tak_env.TakAction import TakAction
+from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakPlayer import TakPlayer
+
+
+class TestAgentsTakRolloutExecutorMethods(unittest.TestCase):
+
+    # Scores of the 3x3 games (see TakScorerDefault): 9 squares, plus 1 with pieces left, 0 for ties
+    SCORES = {0.0, 9.0, 10.0, -9.0, -10.0}
+
+    @staticmethod
+    def leaf_state(env: TakEnvironment):
+        np.random.seed(8)
+        state = env.reset()
+        for _ in range(4):
+            state = np.random.choice(TakAction.get_possible_actions(state)).take(state)
+        return state
+
+    def test_rollout_executors(self):
+        with TakEnvironment(board_size=3) as env:
+            leaf = self.leaf_state(env)
+            agent = TakMCTSPlayerAgent2(
+                env, TakPlayer.WHITE, MCTSPlayerArrayKnowledgeGraph(leaf), rollout_policy=RandomPolicyEff(3)
+            )
+            for executor in [TakRolloutExecutor(), TakThreadRolloutExecutor(3), TakBatchRolloutExecutor()]:
+                with executor:
+                    rewards = executor.rollout(agent, leaf, 7)
+                    self.assertEqual(7, len(rewards))
+                    self.assertLessEqual(set(rewards), TestAgentsTakRolloutExecutorMethods.SCORES)
+                    self.assertEqual(leaf, self.leaf_state(env))
+                # The thread pool is shut down on exit
+                self.assertIsNone(getattr(executor, '_executor', None))
+
+    def test_process_rollout_executor(self):
+        with TakEnvironment(board_size=3) as env:
+            leaf = self.leaf_state(env)
+            agent = TakMCTSPlayerAgent(env, TakPlayer.BLACK, MCTSPlayerArrayKnowledgeGraph(leaf))
+            executor = TakProcessRolloutExecutor(processes=2)
+            rewards = executor.rollout(agent, leaf, 5)
+            self.assertEqual(5, len(rewards))
+            self.assertLessEqual(set(rewards), TestAgentsTakRolloutExecutorMethods.SCORES)
+            # Only bound to its agent
+            with self.assertRaises(ValueError):
+                executor.rollout(TakMCTSPlayerAgent(env, TakPlayer.WHITE, agent.graph), leaf, 1)
+
+            processes = list(executor._executor._processes.values())
+            executor.close()
+            self.assertIsNone(executor._executor)
+            self.assertTrue(all(not process.is_alive() for process in processes))
+
+    def test_process_rollout_executor_q_deltas(self):
+        with TakEnvironment(board_size=3) as env:
+            leaf = self.leaf_state(env)
+            policy = EGreedyPolicy(3, 0.5, 0.5, 0.9)
+            agent = TakMCTSPlayerAgent2(
+                env, TakPlayer.WHITE, MCTSPlayerArrayKnowledgeGraph(leaf), rollout_policy=policy
+            )
+            # The changes to the Q values merged after each batch
+            merged_q_deltas = []
+            executor = TakProcessRolloutExecutor(processes=2)
+            merge_q_deltas = executor._merge_q_deltas
+
+            def recording_merge_q_deltas(merge_agent, q_deltas):
+                merged_q_deltas.append(dict(q_deltas))
+                merge_q_deltas(merge_agent, q_deltas)
+
+            executor._merge_q_deltas = recording_merge_q_deltas
+            with executor:
+                # Two batches (one per process) for each call
+                rewards = executor.rollout(agent, leaf, 4) + executor.rollout(agent, leaf, 4)
+                synced_q_deltas = dict(executor._synced_q_deltas)
+            self.assertEqual(8, len(rewards))
+            self.assertLessEqual(set(rewards), TestAgentsTakRolloutExecutorMethods.SCORES)
+
+        self.assertEqual(4, len(merged_q_deltas))
+        total_q_deltas = {}
+        for q_deltas in merged_q_deltas:
+            self.assertGreater(len(q_deltas), 0)
+            for key, q_delta in q_deltas.items():
+                total_q_deltas[key] = total_q_deltas.get(key, 0.0) + q_delta
+        self.assertEqual(set(total_q_deltas), set(synced_q_deltas))
+        # The rollouts start from the leaf, and their updates are the only ones of the policy (all from 0)
+        self.assertIn(leaf.key, {state_key for state_key, _ in total_q_deltas})
+        self.assertEqual(len({state_key for state_key, _ in total_q_deltas}), len(policy.Q))
+        for (state_key, action_id), q_delta in total_q_deltas.items():
+            self.assertAlmostEqual(q_delta, policy.Q.get(state_key, action_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+
+import numpy as np
+
+from agents.TakSelfPlayTrainer import TakSelfPlayTrainer, _init_self_play_actor, _play_episodes
+from policies.EGreedyPolicy import EGreedyPolicy
+from tak_env.TakEnvironment import TakEnvironment
+from tak_env.TakPlayer import TakPlayer
+
+
+class TestAgentsTakSelfPlayTrainerMethods(unittest.TestCase):
+
+    @staticmethod
+    def replay_episodes(env: TakEnvironment, policy: EGreedyPolicy, episodes: int, seed: int):
+        # The (player, Q key, reward) of each step and the final score of each player, of each episode
+        np.random.seed(seed)
+        games = []
+        for _ in range(episodes):
+            state, done, info, steps = env.reset(), False, {}, []
+            while not done:
+                player = state.current_player
+                action = policy.select_action(state)
+                key = policy.q_key(state, action)
+                state, reward, done, info = env.step(action)
+                steps.append((player, key, reward))
+            scores = {player: env.compute_score(player, info['winning_player']) for player in TakPlayer}
+            games.append((steps, scores, info['winning_player']))
+        return games
+
+    def test_play_episodes(self):
+        with TakEnvironment(board_size=3) as env:
+            # Random actions (epsilon 1), so the episodes only depend on the seed
+            policy = EGreedyPolicy(3, 1.0, 0.5, 0.9)
+            games = self.replay_episodes(env, policy, 3, 7)
+            _init_self_play_actor(env, policy)
+            (keys, action_ids, rewards, next_keys, next_action_ids, dones), winners = _play_episodes(3, 7, {})
+
+        self.assertEqual([winner for _, _, winner in games], winners)
+        transitions = list(zip(zip(keys.tolist(), action_ids.tolist()), rewards.tolist(),
+                               zip(next_keys.tolist(), next_action_ids.tolist()), dones.tolist()))
+        self.assertEqual(sum(len(steps) for steps, _, _ in games), len(transitions))
+        i = 0
+        for steps, scores, _ in games:
+            last_player = steps[-1][0]
+            # A chain per player (white first), with the steps of the player in order
+            for player in [TakPlayer.WHITE, TakPlayer.BLACK]:
+                player_steps = [(key, reward) for step_player, key, reward in steps if step_player == player]
+                chain, i = transitions[i:i + len(player_steps)], i + len(player_steps)
+                self.assertEqual([key for key, _ in player_steps], [key for key, _, _, _ in chain])
+                self.assertEqual([key for key, _, _, _ in chain[1:]], [next_key for _, _, next_key, _ in chain[:-1]])
+                self.assertEqual([False] * (len(chain) - 1) + [True], [done for _, _, _, done in chain])
+                # The player that made the last action keeps the reward of the step, the other one gets its score
+                last_reward = player_steps[-1][1] if player == last_player else scores[player]
+                self.assertEqual([reward for _, reward in player_steps[:-1]] + [last_reward],
+                                 [reward for _, reward, _, _ in chain])
+
+    def test_train(self):
+        with TakEnvironment(board_size=3) as env:
+            for max_synced_q_deltas in [100000, 0]:
+                policy = EGreedyPolicy(3, 1.0, 0.5, 0.9)
+                # Batches of 2, 2 and 1 episodes, with the seeds the trainer draws in that order
+                np.random.seed(23)
+                seeds = [np.random.randint(2 ** 31) for _ in range(3)]
+                expected_transitions, expected_winners = [], []
+                _init_self_play_actor(env, policy)
+                for episodes, seed in zip([2, 2, 1], seeds):
+                    transitions, winners = _play_episodes(episodes, seed, {})
+                    expected_transitions.append(transitions)
+                    expected_winners += winners
+                played_keys = {key for transitions in expected_transitions for key in zip(*transitions[:2])}
+                final_keys = {
+                    key for transitions in expected_transitions
+                    for key, reward in zip(zip(*transitions[:2]), transitions[2]) if reward != 0
+                }
+
+                np.random.seed(23)
+                # With max_synced_q_deltas 0 the pool is restarted after every update
+                with TakSelfPlayTrainer(env, policy, 1, 2, max_synced_q_deltas) as trainer:
+                    report = trainer.train(5)
+                    synced_keys = {key for key, q_delta in trainer._synced_q_deltas.items() if q_delta != 0}
+
+                self.assertEqual(5, report['episodes'])
+                self.assertEqual(3, report['syncs'])
+                self.assertEqual(sum(len(transitions[2]) for transitions in expected_transitions), report['updates'])
+                self.assertEqual(expected_winners.count(TakPlayer.WHITE), report['white_wins'])
+                self.assertEqual(expected_winners.count(TakPlayer.BLACK), report['black_wins'])
+                self.assertEqual(expected_winners.count(None), report['ties'])
+
+                # Only the Q values of the played steps changed, at least the ones of the steps with rewards
+                updated_keys = {
+                    (state_key, action_id)
+                    for state_key, state_id in policy.Q.state_ids.items()
+                    for action_id in np.flatnonzero(policy.Q.values[state_id]).tolist()
+                }
+                self.assertLessEqual(final_keys, updated_keys)
+                self.assertLessEqual(updated_keys, played_keys)
+                # The changes are sent to the actors, until the pool is restarted
+                if max_synced_q_deltas > 0:
+                    self.assertEqual(updated_keys, synced_keys)
+                else:
+                    self.assertLessEqual(synced_keys, updated_keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
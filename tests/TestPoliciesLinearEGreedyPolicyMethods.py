@@ -0,0 +1,124 @@
+import unittest
+
+import numpy as np
+
+from policies.LinearEGreedyPolicy import LinearEGreedyPolicy
+from tak_env.TakAction import TakAction
+from tak_env.TakBoard import TakBoard
+from tak_env.TakFeatures import TakFeatures
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+
+
+class TestPoliciesLinearEGreedyPolicyMethods(unittest.TestCase):
+
+    @staticmethod
+    def random_positions(count: int, rng: np.random.RandomState):
+        # Non terminal 3x3 positions, a few random actions into random games
+        positions = []
+        while len(positions) < count:
+            state = TakState(3, TakBoard(3), 10, 10, False, False, TakPlayer.WHITE)
+            for _ in range(rng.randint(2, 8)):
+                actions = TakAction.get_possible_actions(state)
+                actions[rng.randint(len(actions))].take(state, mutate=True)
+                if state.is_terminal()[0]:
+                    break
+            else:
+                positions.append(state)
+        return positions
+
+    @staticmethod
+    def random_policy(rng: np.random.RandomState) -> LinearEGreedyPolicy:
+        policy = LinearEGreedyPolicy(3, 0.0, 0.3, 0.9)
+        policy.weights = rng.normal(size=policy.weights.shape)
+        return policy
+
+    def test_q_values(self):
+        rng = np.random.RandomState(25)
+        policy = self.random_policy(rng)
+        for state in self.random_positions(5, rng):
+            action_ids = np.array(policy.move_generator.legal_action_indices(state))
+            features = policy.features.extract(state)
+            np.testing.assert_allclose(policy.weights[action_ids] @ features, policy.q_values(state, action_ids))
+
+    def test_select_best_action(self):
+        rng = np.random.RandomState(26)
+        policy = self.random_policy(rng)
+        weights = policy.weights.copy()
+        for state in self.random_positions(10, rng):
+            action_ids = np.array(policy.move_generator.legal_action_indices(state))
+            features = policy.features.extract(state)
+            # The illegal actions have the highest values, but are never selected
+            policy.weights[:] = 100 * features
+            policy.weights[action_ids] = weights[action_ids]
+
+            action = policy.select_action(state)
+            self.assertIn(action, TakAction.get_possible_actions(state))
+            q_values = policy.q_values(state, action_ids)
+            self.assertEqual(1, np.count_nonzero(q_values == q_values.max()))
+            self.assertEqual(action_ids[np.argmax(q_values)], policy.action_table.id_of(action))
+
+    def test_update(self):
+        rng = np.random.RandomState(27)
+        policy = self.random_policy(rng)
+        state, next_state = self.random_positions(2, rng)
+        action = TakAction.get_possible_actions(state)[0]
+        next_action = TakAction.get_possible_actions(next_state)[-1]
+        action_id, next_action_id = policy.action_table.id_of(action), policy.action_table.id_of(next_action)
+        q_value = policy.q_values(state, np.array([action_id]))[0]
+        next_q_value = policy.q_values(next_state, np.array([next_action_id]))[0]
+        weights = policy.weights.copy()
+
+        policy.update(state, action, 2.0, next_state, next_action)
+        # Normalized by the norm of the features, so Q(s, a) moves by exactly alpha times the TD error
+        td_error = 2.0 + policy.gamma * next_q_value - q_value
+        self.assertAlmostEqual(q_value + policy.alpha * td_error, policy.q_values(state, np.array([action_id]))[0])
+        # Only the weights of the action change
+        changed = np.flatnonzero(np.any(weights != policy.weights, axis=1))
+        self.assertEqual([action_id], list(changed))
+
+    def test_update_batch_dones(self):
+        rng = np.random.RandomState(28)
+        weights = self.random_policy(rng).weights
+        states = self.random_positions(3, rng)
+        features = np.array([TakFeatures.get(3).extract(state) for state in states])
+        action_ids = np.array([4, 7])
+        rewards = np.array([1.0, -1.0])
+        dones = np.array([False, True])
+
+        updated_weights = []
+        # The next pair of the last step differs, but it ended the game
+        for next_features, next_action_ids in [(features[1:], np.array([7, 2])), (features[[1, 0]], np.array([7, 9]))]:
+            policy = LinearEGreedyPolicy(3, 0.0, 0.3, 0.9)
+            policy.weights = weights.copy()
+            policy.update_batch(features[:2], action_ids, rewards, next_features, next_action_ids, dones)
+            updated_weights.append(policy.weights)
+        np.testing.assert_array_equal(updated_weights[0], updated_weights[1])
+
+        # The TD error of the last step is only its reward minus its Q value
+        q_value = weights[7] @ features[1]
+        self.assertAlmostEqual(q_value + 0.3 * (-1.0 - q_value), updated_weights[0][7] @ features[1])
+
+    def test_update_batch_repeated_actions(self):
+        rng = np.random.RandomState(29)
+        policy = self.random_policy(rng)
+        weights = policy.weights.copy()
+        states = self.random_positions(4, rng)
+        features = np.array([policy.features.extract(state) for state in states])
+        action_ids = np.array([5, 5, 11])
+        next_action_ids = np.array([3, 8, 1])
+        rewards = np.array([1.0, 0.5, -2.0])
+
+        policy.update_batch(features[:3], action_ids, rewards, features[1:], next_action_ids)
+        # Every step is computed from the weights before the batch, and the ones of the same action add up
+        expected_weights = weights.copy()
+        for step in range(3):
+            td_error = rewards[step] + policy.gamma * weights[next_action_ids[step]] @ features[step + 1] - \
+                weights[action_ids[step]] @ features[step]
+            expected_weights[action_ids[step]] += \
+                policy.alpha * td_error / (features[step] @ features[step]) * features[step]
+        np.testing.assert_allclose(expected_weights, policy.weights)
+
+
+if __name__ == '__main__':
+    unittest.main()
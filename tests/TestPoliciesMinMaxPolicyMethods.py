@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+
+from policies.MinMaxPolicy import MinMaxPolicy
+from tak_env.TakAction import TakAction
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+from utils.TranspositionTable import TranspositionTable
+
+
+class FlatCountMinMaxPolicy(MinMaxPolicy):
+    """
+    MinMaxPolicy with an evaluator that is not 0 on non terminal states (the default one only scores terminal states,
+    so every search of a non terminal state gives 0): the flats of the last player to move minus the other's, with a
+    fraction from the key of the state so few actions have the same value
+    """
+
+    def state_evaluator(self, state: TakState) -> float:
+        last_player = state.current_player.other()
+        flats = len(state.board.controlled_flat_spaces(last_player)) - \
+            len(state.board.controlled_flat_spaces(last_player.other()))
+        return flats + (state.key % 1000) / 1000
+
+
+class TestPoliciesMinMaxPolicyMethods(unittest.TestCase):
+
+    @staticmethod
+    def random_positions(count: int, rng: np.random.RandomState):
+        # Non terminal 3x3 positions, a few random actions into random games
+        positions = []
+        while len(positions) < count:
+            state = TakState(3, TakBoard(3), 10, 10, False, False, TakPlayer.WHITE)
+            for _ in range(rng.randint(2, 8)):
+                actions = TakAction.get_possible_actions(state)
+                actions[rng.randint(len(actions))].take(state, mutate=True)
+                if state.is_terminal()[0]:
+                    break
+            else:
+                positions.append(state)
+        return positions
+
+    def test_min_max_policy_alpha_beta_same_as_full_search(self):
+        # Alpha-beta (with move ordering, and with a transposition table reused across the searches) gives the best
+        # actions the same values as the full search, so it selects from the same actions
+        rng = np.random.RandomState(1011)
+        full_search = FlatCountMinMaxPolicy(0)
+        alpha_beta = FlatCountMinMaxPolicy(0, alpha_beta=True)
+        transposition = FlatCountMinMaxPolicy(
+            0, alpha_beta=True, transposition_table=TranspositionTable(max_memory_mb=1)
+        )
+        for i, state in enumerate(self.random_positions(40, rng)):
+            actions = TakAction.get_possible_actions(state)
+            # The full search of depth 3 is slow, only some of the positions
+            for depth in [1, 2, 3] if i % 4 == 0 else [1, 2]:
+                values = np.array(full_search._evaluate_actions(state, actions, depth))
+                best_value = values.max()
+                for policy in [alpha_beta, transposition]:
+                    policy_values = np.array(policy._evaluate_actions(state, actions, depth))
+                    self.assertEqual(best_value, policy_values.max())
+                    self.assertEqual(list(np.flatnonzero(values == best_value)),
+                                     list(np.flatnonzero(policy_values == best_value)))
+                    # The values of the other actions may only be upper bounds
+                    self.assertTrue(np.all(values <= policy_values))
+        self.assertGreater(alpha_beta.cutoffs, 0)
+        self.assertGreater(transposition.transposition_cutoffs, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -91,6 +91,17 @@ class TestTakEnvTakActionMoveMethods(unittest.TestCase):
         action = TakActionMove((4, 4), TakActionMoveDir.LEFT, (1,))
         self.assertTrue(action.is_valid(state))
 
+        # Each drop is on the next position, whatever the number of pieces dropped
+        state = TakState(5, TakBoard(5), 10, 10, False, False, TakPlayer.WHITE)
+        state.board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+        state.board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+        state.board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+        state.board.place_piece((0, 3), TakPiece.BLACK_STANDING)
+        state.board.place_piece((2, 0), TakPiece.BLACK_FLAT)
+        self.assertTrue(TakActionMove((0, 0), TakActionMoveDir.UP, (2, 1)).is_valid(state))
+        self.assertFalse(TakActionMove((0, 0), TakActionMoveDir.UP, (1, 1, 1)).is_valid(state))
+        self.assertTrue(TakActionMove((0, 0), TakActionMoveDir.RIGHT, (1, 2)).is_valid(state))
+
         # TODO: test flattening validity check fail for flat and for standing
         # TODO: test flattening validity check fail for capstone not moving alone
 
@@ -290,6 +301,26 @@ class TestTakEnvTakActionMoveMethods(unittest.TestCase):
 
         # Wow, the count is 2^(n-1) !
 
+        self.assertIs(TakActionMove.get_possible_drop_orders(4), TakActionMove.get_possible_drop_orders(4))
+
+    def test_tak_action_move_get_drop_orders_within(self):
+        self.assertEqual((), TakActionMove.get_drop_orders_within(3, 0))
+        self.assertEqual({(3,)}, set(TakActionMove.get_drop_orders_within(3, 1)))
+        self.assertEqual({(3,), (2, 1), (1, 2)}, set(TakActionMove.get_drop_orders_within(3, 2)))
+        self.assertEqual(
+            set(TakActionMove.get_possible_drop_orders(4)),
+            set(TakActionMove.get_drop_orders_within(4, 4))
+        )
+        self.assertIs(TakActionMove.get_drop_orders_within(4, 2), TakActionMove.get_drop_orders_within(4, 2))
+
+    def test_tak_action_move_get_distance_to_edge(self):
+        self.assertEqual(4, TakActionMove.get_distance_to_edge(5, (0, 0), TakActionMoveDir.UP))
+        self.assertEqual(4, TakActionMove.get_distance_to_edge(5, (0, 0), TakActionMoveDir.RIGHT))
+        self.assertEqual(0, TakActionMove.get_distance_to_edge(5, (0, 0), TakActionMoveDir.DOWN))
+        self.assertEqual(0, TakActionMove.get_distance_to_edge(5, (0, 0), TakActionMoveDir.LEFT))
+        self.assertEqual(1, TakActionMove.get_distance_to_edge(5, (3, 1), TakActionMoveDir.RIGHT))
+        self.assertEqual(1, TakActionMove.get_distance_to_edge(5, (3, 1), TakActionMoveDir.DOWN))
+
 
 if __name__ == '__main__':
     unittest.main()
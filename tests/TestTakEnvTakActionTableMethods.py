@@ -0,0 +1,65 @@
+import pickle
+import unittest
+
+from tak_env.TakAction import TakAction, TakActionPlace, TakActionMove, TakActionMoveDir, TakActionTable
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+
+
+class TestTakEnvTakActionTableMethods(unittest.TestCase):
+
+    def test_tak_action_table_get(self):
+        self.assertIs(TakActionTable.get(3), TakActionTable.get(3))
+        table = TakActionTable.get(4)
+        self.assertEqual(len(table), len(TakAction.build_all_actions(4)))
+        self.assertEqual(TakAction.get_all_actions(4), TakAction.build_all_actions(4))
+        for action_id, action in enumerate(TakAction.get_all_actions(4)):
+            self.assertIs(action, table.action(action_id))
+            self.assertEqual(action.action_id, action_id)
+
+    def test_tak_action_table_ids(self):
+        table = TakActionTable.get(3)
+        place = TakActionPlace((1, 2), TakPiece.BLACK_STANDING)
+        self.assertIsNone(place.action_id)
+        self.assertEqual(table.action(table.id_of(place)), place)
+        self.assertIs(table.place_action((1, 2), TakPiece.BLACK_STANDING), table.action(table.id_of(place)))
+        move = TakActionMove((0, 0), TakActionMoveDir.UP, (2, 1))
+        self.assertIs(table.move_action((0, 0), TakActionMoveDir.UP, (2, 1)), table.action(table.id_of(move)))
+        with self.assertRaises(KeyError):
+            table.id_of(TakActionMove((0, 0), TakActionMoveDir.UP, (1, 1, 1, 1)))
+
+        move_id = table.id_of(move)
+        self.assertFalse(table.is_place[move_id])
+        self.assertEqual(table.squares[move_id], 0)
+        self.assertEqual(table.directions[move_id], TakActionMoveDir.UP.value)
+        self.assertEqual(table.pick_up_counts[move_id], 3)
+        place_id = table.id_of(place)
+        self.assertTrue(table.is_place[place_id])
+        self.assertEqual(table.squares[place_id], 1 * 3 + 2)
+        self.assertEqual(table.pieces[place_id], TakPiece.BLACK_STANDING.value)
+
+    def test_tak_action_table_take(self):
+        table = TakActionTable.get(3)
+        state = TakState(3, TakBoard(3), 10, 10, False, False, TakPlayer.WHITE)
+        first_actions = TakAction.get_first_actions(3, TakPlayer.WHITE)
+        for action in first_actions:
+            self.assertIs(action, table.action(action.action_id))
+        action_id = first_actions[0].action_id
+        self.assertTrue(table.is_valid(state, action_id))
+        self.assertEqual(table.take(state, action_id), first_actions[0].take(state))
+        for action in TakAction.get_possible_actions(state):
+            self.assertIs(action, table.action(action.action_id))
+
+    def test_tak_action_table_pickle(self):
+        table = TakActionTable.get(3)
+        for action in [table.action(0), table.action(len(table) - 1)]:
+            unpickled = pickle.loads(pickle.dumps(action))
+            self.assertEqual(unpickled, action)
+            self.assertEqual(hash(unpickled), hash(action))
+            self.assertEqual(table.id_of(unpickled), action.action_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+
+from tak_env.TakAction import TakActionTable
+from tak_env.TakBatchSimulator import TakBatchSimulator, TakStateBatch
+from tak_env.TakBoard import TakBoard
+from tak_env.TakMoveGenerator import TakMoveGenerator
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+
+
+class TestTakEnvTakBatchSimulatorMethods(unittest.TestCase):
+
+    def test_tak_state_batch_from_states(self):
+        state = TakState(3, TakBoard(3), 10, 9, False, True, TakPlayer.BLACK)
+        state.board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+        state.board.place_piece((0, 0), TakPiece.BLACK_STANDING)
+        batch = TakStateBatch.from_states([state, TakState(3, TakBoard(3), 10, 10, False, False, TakPlayer.WHITE)])
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(batch.stacks.shape, (2, 9, 22))
+        self.assertEqual(batch.state(0).as_tuple(), state.as_tuple())
+        self.assertEqual(list(batch.top_pieces()[0]), [-2, 0, 0, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(list(batch.players), [-1, 1])
+
+        batch = TakStateBatch.from_state(state, 3)
+        self.assertTrue(all(batch.state(game).as_tuple() == state.as_tuple() for game in range(3)))
+
+    def test_tak_batch_simulator_random_games(self):
+        # Plays random games in the batch and the same actions on TakStates, which must agree on everything
+        rng = np.random.RandomState(4020)
+        for board_size, pieces, capstone in [(3, 10, False), (4, 15, False), (5, 21, True)]:
+            simulator = TakBatchSimulator.get(board_size)
+            move_generator = TakMoveGenerator.get(board_size)
+            action_table = TakActionTable.get(board_size)
+            states = [
+                TakState(board_size, TakBoard(board_size), pieces, pieces, capstone, capstone, TakPlayer.WHITE)
+                for _ in range(8)
+            ]
+            batch = TakStateBatch.from_states(states)
+            games = np.arange(len(batch))
+            simulator.update_terminal(batch, games)
+            while len(games) > 0:
+                mask = simulator.legal_mask(batch, games)
+                action_ids = simulator.sample_actions(mask, rng=rng)
+                simulator.apply(batch, games, action_ids)
+                simulator.update_terminal(batch, games)
+                for i, game in enumerate(games):
+                    self.assertEqual(list(np.flatnonzero(mask[i])), move_generator.legal_action_indices(states[game]))
+                    states[game] = action_table.take(states[game], int(action_ids[i]))
+                    self.assertEqual(batch.state(game).as_tuple(), states[game].as_tuple())
+                    done, info = states[game].is_terminal()
+                    self.assertEqual(batch.done[game], done)
+                    if done:
+                        winning_player = {None: 0, TakPlayer.WHITE: 1, TakPlayer.BLACK: -1}[info['winning_player']]
+                        self.assertEqual(batch.winners[game], winning_player)
+                games = games[~batch.done[games]]
+
+    def test_tak_batch_simulator_roads(self):
+        simulator = TakBatchSimulator.get(3)
+        board = TakBoard(3)
+        for rank in range(3):
+            board.place_piece((1, rank), TakPiece.WHITE_FLAT)
+        board.place_piece((0, 1), TakPiece.BLACK_CAPSTONE)
+        board.place_piece((1, 1), TakPiece.BLACK_STANDING)
+        board.place_piece((2, 1), TakPiece.BLACK_FLAT)
+        batch = TakStateBatch.from_states([TakState(3, board, 10, 10, False, False, TakPlayer.WHITE)])
+        self.assertEqual(simulator.roads(batch).tolist(), [[False, False]])
+
+        board.place_piece((1, 1), TakPiece.BLACK_FLAT)
+        batch = TakStateBatch.from_states([TakState(3, board, 10, 10, False, False, TakPlayer.WHITE)])
+        self.assertEqual(simulator.roads(batch).tolist(), [[False, True]])
+
+    def test_tak_batch_simulator_rollout(self):
+        np.random.seed(4020)
+        state = TakState(4, TakBoard(4), 15, 15, False, False, TakPlayer.WHITE)
+        simulator = TakBatchSimulator.get(4)
+        rewards = simulator.rollout(state, 50, TakPlayer.WHITE, discount=True)
+        self.assertEqual(rewards.shape, (50,))
+        # Every game ends with a winner getting 16 (plus 1 if they had pieces left) or a tie
+        self.assertTrue(set(np.abs(rewards).tolist()) <= {0.0, 16.0, 17.0})
+        black_rewards = simulator.rollout(state, 50, TakPlayer.BLACK, discount=True)
+        self.assertEqual(black_rewards.shape, (50,))
+
+
+if __name__ == '__main__':
+    unittest.main()
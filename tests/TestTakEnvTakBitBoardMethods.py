@@ -0,0 +1,130 @@
+import unittest
+
+import numpy as np
+
+from tak_env.TakAction import TakAction
+from tak_env.TakBitBoard import TakBitBoard
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+
+
+class TestTakEnvTakBitBoardMethods(unittest.TestCase):
+
+    def assertSameBoard(self, expected: TakBoard, actual: TakBitBoard):
+        self.assertEqual(expected.total_pieces(), actual.total_pieces())
+        self.assertEqual(expected.get_empty_positions(), actual.get_empty_positions())
+        self.assertEqual(expected.spaces_left(), actual.spaces_left())
+        self.assertEqual(str(expected), str(actual))
+        for player in TakPlayer:
+            self.assertEqual(
+                expected.get_positions_controlled_by_player(player),
+                actual.get_positions_controlled_by_player(player)
+            )
+            self.assertEqual(expected.controlled_flat_spaces(player), actual.controlled_flat_spaces(player))
+            self.assertEqual(expected.controlled_road_spaces(player), actual.controlled_road_spaces(player))
+            self.assertEqual(expected.has_path_for_player(player), actual.has_path_for_player(player))
+            for variant in ['only_low_road', 'only_high_road', 'only_straight_road']:
+                self.assertEqual(
+                    expected.has_path_for_player(player, **{variant: True}),
+                    actual.has_path_for_player(player, **{variant: True})
+                )
+        for file, rank in TakBoard.get_all_positions(expected.board_size):
+            self.assertEqual(expected.position_height(file, rank), actual.position_height(file, rank))
+            self.assertEqual(expected.position_controlled_by(file, rank), actual.position_controlled_by(file, rank))
+            self.assertEqual(expected.top_piece(file, rank), actual.top_piece(file, rank))
+            self.assertEqual(expected.get_stack(file, rank), actual.get_stack(file, rank))
+        np.testing.assert_array_equal(expected.as_3d_matrix()[0], actual.as_3d_matrix()[0])
+        self.assertEqual(expected, actual)
+        self.assertEqual(actual, expected)
+
+    def test_tak_bit_board_init(self):
+        for board_size in range(3, 10):
+            board = TakBitBoard(board_size)
+            self.assertEqual(len(board.board), board_size)
+            self.assertTrue(all([len(board.board[i]) == board_size for i in range(len(board.board))]))
+            self.assertEqual(len(board.get_empty_positions()), board_size * board_size)
+            self.assertEqual(board.total_pieces(), 0)
+            self.assertSameBoard(TakBoard(board_size), board)
+
+    def test_tak_bit_board_place_piece(self):
+        board, bit_board = TakBoard(3), TakBitBoard(3)
+        for position, piece in [
+            ((0, 0), TakPiece.WHITE_FLAT),
+            ((1, 0), TakPiece.WHITE_FLAT),
+            ((1, 0), TakPiece.BLACK_FLAT),
+            ((2, 2), TakPiece.BLACK_STANDING),
+            ((1, 0), TakPiece.WHITE_STANDING),
+            ((1, 0), TakPiece.BLACK_CAPSTONE),
+            ((1, 1), TakPiece.WHITE_CAPSTONE),
+        ]:
+            board.place_piece(position, piece)
+            bit_board.place_piece(position, piece)
+            self.assertSameBoard(board, bit_board)
+        self.assertEqual(
+            bit_board.get_stack(1, 0).as_list(),
+            [TakPiece.WHITE_FLAT, TakPiece.BLACK_FLAT, TakPiece.WHITE_FLAT, TakPiece.BLACK_CAPSTONE]
+        )
+
+    def test_tak_bit_board_pick_up_and_drop(self):
+        board, bit_board = TakBoard(4), TakBitBoard(4)
+        for piece in [TakPiece.WHITE_FLAT, TakPiece.BLACK_FLAT, TakPiece.WHITE_CAPSTONE]:
+            board.place_piece((0, 0), piece)
+            bit_board.place_piece((0, 0), piece)
+        board.place_piece((0, 2), TakPiece.BLACK_STANDING)
+        bit_board.place_piece((0, 2), TakPiece.BLACK_STANDING)
+
+        self.assertEqual(bit_board.pick_up((0, 0), 2), [TakPiece.BLACK_FLAT, TakPiece.WHITE_CAPSTONE])
+        self.assertEqual(board.pick_up((0, 0), 2), [TakPiece.BLACK_FLAT, TakPiece.WHITE_CAPSTONE])
+        self.assertSameBoard(board, bit_board)
+
+        bit_board.drop((0, 1), [TakPiece.BLACK_FLAT])
+        board.drop((0, 1), [TakPiece.BLACK_FLAT])
+        bit_board.drop((0, 2), [TakPiece.WHITE_CAPSTONE])
+        board.drop((0, 2), [TakPiece.WHITE_CAPSTONE])
+        self.assertSameBoard(board, bit_board)
+        self.assertEqual(bit_board.get_stack(0, 2).as_list(), [TakPiece.BLACK_FLAT, TakPiece.WHITE_CAPSTONE])
+
+        self.assertRaises(ValueError, lambda: bit_board.pick_up((3, 3), 1))
+
+    def test_tak_bit_board_copy(self):
+        bit_board = TakBitBoard(3)
+        bit_board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+        copied_board = bit_board.copy()
+        self.assertEqual(bit_board, copied_board)
+        copied_board.place_piece((0, 0), TakPiece.BLACK_FLAT)
+        self.assertNotEqual(bit_board, copied_board)
+        self.assertEqual(bit_board.top_piece(0, 0), TakPiece.WHITE_FLAT)
+        self.assertEqual(copied_board.top_piece(0, 0), TakPiece.BLACK_FLAT)
+
+    def test_tak_bit_board_from_3d_matrix(self):
+        board = TakBoard(3)
+        board.place_piece((1, 1), TakPiece.WHITE_FLAT)
+        board.place_piece((1, 1), TakPiece.BLACK_STANDING)
+        board.place_piece((2, 0), TakPiece.WHITE_CAPSTONE)
+        board_matrix, _ = board.as_3d_matrix()
+        bit_board = TakBitBoard.from_3d_matrix(board_matrix.flatten(), 3)
+        self.assertIsInstance(bit_board, TakBitBoard)
+        self.assertSameBoard(board, bit_board)
+
+    def test_tak_bit_board_random_games(self):
+        rng = np.random.RandomState(4180)
+        for board_size, pieces, capstone in [(3, 10, False), (4, 15, False), (5, 21, True)]:
+            state = TakState(board_size, TakBoard(board_size), pieces, pieces, capstone, capstone, TakPlayer.WHITE)
+            bit_state = TakState(
+                board_size, TakBitBoard(board_size), pieces, pieces, capstone, capstone, TakPlayer.WHITE
+            )
+            actions = TakAction.get_possible_actions(state)
+            while len(actions) > 0:
+                self.assertEqual(set(actions), set(TakAction.get_possible_actions(bit_state)))
+                action = actions[rng.randint(len(actions))]
+                state = action.take(state)
+                bit_state = action.take(bit_state)
+                self.assertSameBoard(state.board, bit_state.board)
+                self.assertEqual(state.is_terminal(), bit_state.is_terminal())
+                actions = TakAction.get_possible_actions(state)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -35,6 +35,32 @@ class TestTakEnvTakBoardMethods(unittest.TestCase):
         board.place_piece((1, 1), TakPiece.WHITE_CAPSTONE)
         self.assertEqual(board.total_pieces(), 8)
 
+    def test_tak_board_copy(self):
+        board = TakBoard(3)
+        board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+        board.place_piece((1, 1), TakPiece.BLACK_STANDING)
+        copied_board = board.copy()
+        self.assertEqual(copied_board, board)
+        self.assertEqual(copied_board.key, board.key)
+        # The stacks are shared until they change
+        self.assertIs(copied_board.get_stack(1, 1), board.get_stack(1, 1))
+
+        copied_board.place_piece((1, 1), TakPiece.WHITE_CAPSTONE)
+        copied_board.pick_up((0, 0), 1)
+        self.assertEqual(board.top_piece(1, 1), TakPiece.BLACK_STANDING)
+        self.assertEqual(board.top_piece(0, 0), TakPiece.WHITE_FLAT)
+        self.assertEqual(copied_board.top_piece(1, 1), TakPiece.WHITE_CAPSTONE)
+        self.assertTrue(copied_board.is_position_empty(0, 0))
+        self.assertIs(copied_board.get_stack(1, 0), board.get_stack(1, 0))
+
+        # Changes to the original board after copying do not change the copy either
+        second_copy = board.copy()
+        board.place_piece((2, 2), TakPiece.BLACK_FLAT)
+        self.assertTrue(second_copy.is_position_empty(2, 2))
+        self.assertTrue(copied_board.is_position_empty(2, 2))
+        self.assertEqual(board.total_pieces(), 3)
+        self.assertEqual(second_copy.total_pieces(), 2)
+
     def test_tak_board_get_board_names_str(self):
         self.assertEqual(
             TakBoard(3).get_board_names_str(),
@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+
+from tak_env.TakBitBoard import TakBitBoard
+from tak_env.TakBoard import TakBoard
+from tak_env.TakFeatures import TakFeatures
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+
+
+class TestTakEnvTakFeaturesMethods(unittest.TestCase):
+
+    def test_tak_features_get(self):
+        self.assertIs(TakFeatures.get(3), TakFeatures.get(3))
+        self.assertEqual(TakFeatures.get(3).size, 7 * 9 + 11)
+        self.assertEqual(TakFeatures.get(5).size, 7 * 25 + 11)
+        self.assertEqual(TakFeatures.get(5).slices['bias'], (185, 186))
+
+    def test_tak_features_extract(self):
+        features = TakFeatures.get(3)
+        for board_class in [TakBoard, TakBitBoard]:
+            board = board_class(3)
+            board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+            board.place_piece((0, 1), TakPiece.WHITE_FLAT)
+            board.place_piece((2, 2), TakPiece.BLACK_FLAT)
+            board.place_piece((2, 2), TakPiece.WHITE_STANDING)
+            board.place_piece((1, 1), TakPiece.BLACK_CAPSTONE)
+            white_features = features.extract(TakState(3, board, 7, 8, False, True, TakPlayer.WHITE))
+
+            start, _ = features.slices['top_pieces']
+            planes = white_features[start:start + 6 * 9].reshape(6, 9)
+            self.assertEqual(list(np.flatnonzero(planes[0])), [0, 1])  # own flats
+            self.assertEqual(list(np.flatnonzero(planes[1])), [8])  # own standing
+            self.assertEqual(list(np.flatnonzero(planes[5])), [4])  # opponent capstone
+            self.assertEqual(planes.sum(), 4)
+            start, end = features.slices['heights']
+            self.assertEqual(list(white_features[start:end] * 3), [1, 1, 0, 0, -1, 0, 0, 0, 2])
+            start, end = features.slices['reserves']
+            self.assertEqual(list(white_features[start:end]), [7 / 9, 8 / 9, 0, 1])
+            start, end = features.slices['roads']
+            # White has road squares in file 0 (ranks 0 and 1) in one group, black in file 1 and rank 1
+            self.assertEqual(list(white_features[start:end] * 3), [1, 2, 2, 1, 1, 1])
+            self.assertEqual(white_features[features.slices['bias'][0]], 1)
+
+            # Black to move sees the same board with own and opponent swapped
+            black_features = features.extract(TakState(3, board, 7, 8, False, True, TakPlayer.BLACK))
+            start, _ = features.slices['top_pieces']
+            self.assertEqual(list(black_features[start:start + 3 * 9]), list(planes[3:].reshape(-1)))
+            self.assertEqual(list(black_features[start + 3 * 9:start + 6 * 9]), list(planes[:3].reshape(-1)))
+            start, end = features.slices['reserves']
+            self.assertEqual(list(black_features[start:end]), [8 / 9, 7 / 9, 1, 0])
+
+    def test_tak_features_road_progress(self):
+        features = TakFeatures.get(4)
+        road_squares = np.zeros(16, dtype=bool)
+        self.assertEqual(features.road_progress(road_squares), [0, 0, 0])
+        # An L of 4 squares (file 0, ranks 0 to 2, and file 1 rank 2) and a separate square in file 3
+        road_squares[[0, 1, 2, 6, 13]] = True
+        self.assertEqual(features.road_progress(road_squares), [3 / 4, 3 / 4, 3 / 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from tak_env.TakAction import TakAction, TakActionMove, TakActionMoveDir
+from tak_env.TakBitBoard import TakBitBoard
+from tak_env.TakBoard import TakBoard
+from tak_env.TakMoveGenerator import TakMoveGenerator
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+
+
+class TestTakEnvTakMoveGeneratorMethods(unittest.TestCase):
+
+    def test_tak_move_generator_get(self):
+        self.assertIs(TakMoveGenerator.get(3), TakMoveGenerator.get(3))
+        self.assertEqual(TakMoveGenerator.get(4).actions, TakAction.get_all_actions(4))
+
+    def test_tak_move_generator_first_actions(self):
+        state = TakState(3, TakBoard(3), 10, 10, False, False, TakPlayer.WHITE)
+        generator = TakMoveGenerator.get(3)
+        self.assertEqual(set(generator.legal_actions(state)), set(TakAction.get_first_actions(3, TakPlayer.WHITE)))
+        state = TakAction.get_first_actions(3, TakPlayer.WHITE)[0].take(state)
+        # The black flat stone placed by white can not be moved by black on its first action
+        self.assertEqual(
+            set(generator.legal_actions(state)),
+            set(TakAction.get_first_actions(3, TakPlayer.BLACK)[1:])
+        )
+
+    def test_tak_move_generator_flatten(self):
+        for board_class in [TakBoard, TakBitBoard]:
+            state = TakState(4, board_class(4), 10, 10, False, False, TakPlayer.WHITE)
+            state.board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+            state.board.place_piece((0, 0), TakPiece.WHITE_CAPSTONE)
+            state.board.place_piece((0, 2), TakPiece.BLACK_STANDING)
+            state.board.place_piece((3, 3), TakPiece.BLACK_FLAT)
+            moves = {action for action in TakMoveGenerator.get(4).legal_actions(state) if action.position == (0, 0)}
+            self.assertEqual(moves, {
+                TakActionMove((0, 0), TakActionMoveDir.UP, (1,)),
+                TakActionMove((0, 0), TakActionMoveDir.UP, (2,)),
+                TakActionMove((0, 0), TakActionMoveDir.UP, (1, 1)),
+                TakActionMove((0, 0), TakActionMoveDir.RIGHT, (1,)),
+                TakActionMove((0, 0), TakActionMoveDir.RIGHT, (2,)),
+                TakActionMove((0, 0), TakActionMoveDir.RIGHT, (1, 1)),
+            })
+
+    def test_tak_move_generator_random_games(self):
+        rng = np.random.RandomState(4180)
+        for board_class in [TakBoard, TakBitBoard]:
+            for board_size, pieces, capstone in [(3, 10, False), (4, 15, False), (5, 21, True)]:
+                generator = TakMoveGenerator.get(board_size)
+                state = TakState(
+                    board_size, board_class(board_size), pieces, pieces, capstone, capstone, TakPlayer.WHITE
+                )
+                while not state.is_terminal()[0]:
+                    indices = generator.legal_action_indices(state)
+                    if not state.first_action():
+                        valid_indices = [i for i, action in enumerate(generator.actions) if action.is_valid(state)]
+                        self.assertEqual(indices, valid_indices)
+                        possible_actions = set(TakAction.get_possible_actions(state))
+                        self.assertTrue(possible_actions <= set(generator.legal_actions(state)))
+                    state = generator.actions[indices[rng.randint(len(indices))]].take(state)
+
+
+if __name__ == '__main__':
+    unittest.main()
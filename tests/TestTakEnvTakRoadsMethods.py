@@ -0,0 +1,167 @@
+import unittest
+
+import numpy as np
+
+from tak_env.TakAction import TakAction
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakRoads import TakRoads, TakRoadTracker
+from tak_env.TakState import TakState
+
+
+def mask_of(board_size, positions):
+    return sum(1 << (file * board_size + rank) for file, rank in positions)
+
+
+def has_road_reference(board_size, positions):
+    """
+    Simple breadth first search over positions, used to check the bitboard flood fill
+    """
+    positions = set(positions)
+    for start, is_end in [
+        ({pos for pos in positions if pos[1] == 0}, lambda pos: pos[1] == board_size - 1),
+        ({pos for pos in positions if pos[0] == 0}, lambda pos: pos[0] == board_size - 1),
+    ]:
+        visited, frontier = set(start), list(start)
+        while frontier:
+            file, rank = frontier.pop()
+            if is_end((file, rank)):
+                return True
+            for neighbour in [(file, rank + 1), (file + 1, rank), (file, rank - 1), (file - 1, rank)]:
+                if neighbour in positions and neighbour not in visited:
+                    visited.add(neighbour)
+                    frontier.append(neighbour)
+    return False
+
+
+class TestTakEnvTakRoadsMethods(unittest.TestCase):
+
+    def test_tak_roads_get(self):
+        self.assertIs(TakRoads.get(3), TakRoads.get(3))
+        self.assertEqual(TakRoads.get(5).board_size, 5)
+
+    def test_tak_roads_neighbours(self):
+        roads = TakRoads.get(3)
+        self.assertEqual(roads.neighbours(mask_of(3, [(1, 1)])), mask_of(3, [(1, 2), (2, 1), (1, 0), (0, 1)]))
+        self.assertEqual(roads.neighbours(mask_of(3, [(0, 0)])), mask_of(3, [(0, 1), (1, 0)]))
+        # Does not wrap around from the top of a file to the bottom of the next one
+        self.assertEqual(roads.neighbours(mask_of(3, [(0, 2)])), mask_of(3, [(0, 1), (1, 2)]))
+        self.assertEqual(roads.neighbours(mask_of(3, [(2, 0)])), mask_of(3, [(2, 1), (1, 0)]))
+
+    def test_tak_roads_has_road(self):
+        roads = TakRoads.get(4)
+        self.assertFalse(roads.has_road(0))
+        self.assertTrue(roads.has_road(mask_of(4, [(1, 0), (1, 1), (1, 2), (1, 3)])))
+        self.assertTrue(roads.has_road(mask_of(4, [(0, 2), (1, 2), (2, 2), (3, 2)])))
+        self.assertTrue(roads.has_road(mask_of(4, [(0, 0), (0, 1), (1, 1), (1, 2), (2, 2), (2, 3)])))
+        self.assertFalse(roads.has_road(mask_of(4, [(0, 0), (0, 1), (1, 2), (2, 2), (2, 3)])))
+        # A winding road that goes back towards its starting edge
+        self.assertTrue(roads.has_road(mask_of(4, [
+            (0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0), (3, 0)
+        ])))
+
+    def test_tak_roads_has_road_straight(self):
+        roads = TakRoads.get(4)
+        self.assertTrue(roads.has_road(mask_of(4, [(1, 0), (1, 1), (1, 2), (1, 3)]), only_straight_road=True))
+        self.assertTrue(roads.has_road(mask_of(4, [(0, 2), (1, 2), (2, 2), (3, 2)]), only_straight_road=True))
+        self.assertFalse(roads.has_road(
+            mask_of(4, [(0, 0), (0, 1), (1, 1), (1, 2), (1, 3)]), only_straight_road=True
+        ))
+
+    def test_tak_roads_has_road_random(self):
+        rng = np.random.RandomState(4180)
+        for board_size in range(3, 9):
+            roads = TakRoads.get(board_size)
+            positions = TakBoard.get_all_positions(board_size)
+            for _ in range(200):
+                selected = [pos for pos in positions if rng.rand() < 0.55]
+                self.assertEqual(
+                    has_road_reference(board_size, selected),
+                    roads.has_road(mask_of(board_size, selected)),
+                    selected
+                )
+
+    def test_tak_board_has_path_for_player_variants(self):
+        board = TakBoard(3)
+        for rank in range(3):
+            board.place_piece((0, rank), TakPiece.WHITE_FLAT)
+        self.assertTrue(board.has_path_for_player(TakPlayer.WHITE))
+        self.assertTrue(board.has_path_for_player(TakPlayer.WHITE, only_low_road=True))
+        self.assertTrue(board.has_path_for_player(TakPlayer.WHITE, only_high_road=True))
+        self.assertTrue(board.has_path_for_player(TakPlayer.WHITE, only_straight_road=True))
+        self.assertFalse(board.has_path_for_player(TakPlayer.BLACK))
+
+        board.place_piece((0, 1), TakPiece.BLACK_FLAT)
+        board.place_piece((0, 1), TakPiece.WHITE_FLAT)
+        self.assertTrue(board.has_path_for_player(TakPlayer.WHITE))
+        self.assertFalse(board.has_path_for_player(TakPlayer.WHITE, only_low_road=True))
+
+        board.place_piece((0, 1), TakPiece.WHITE_STANDING)
+        self.assertFalse(board.has_path_for_player(TakPlayer.WHITE))
+
+        board.place_piece((1, 1), TakPiece.WHITE_CAPSTONE)
+        board.place_piece((1, 2), TakPiece.WHITE_FLAT)
+        board.place_piece((1, 0), TakPiece.WHITE_FLAT)
+        self.assertTrue(board.has_path_for_player(TakPlayer.WHITE))
+        self.assertTrue(board.has_path_for_player(TakPlayer.WHITE, only_straight_road=True))
+        board.place_piece((2, 0), TakPiece.WHITE_FLAT)
+        board.place_piece((1, 0), TakPiece.BLACK_FLAT)
+        self.assertFalse(board.has_path_for_player(TakPlayer.WHITE))
+        board.place_piece((2, 1), TakPiece.WHITE_FLAT)
+        self.assertTrue(board.has_path_for_player(TakPlayer.WHITE))
+        self.assertFalse(board.has_path_for_player(TakPlayer.WHITE, only_straight_road=True))
+
+    def test_tak_road_tracker_init(self):
+        tracker = TakRoadTracker(3)
+        self.assertFalse(tracker.has_road)
+        self.assertEqual(tracker.road_squares, 0)
+        tracker = TakRoadTracker(3, mask_of(3, [(0, 0), (0, 1), (0, 2)]))
+        self.assertTrue(tracker.has_road)
+        self.assertEqual(tracker.find(0), tracker.find(2))
+
+    def test_tak_road_tracker_update(self):
+        tracker = TakRoadTracker(3)
+        tracker.update(mask_of(3, [(0, 0)]).bit_length() - 1, True)
+        tracker.update(mask_of(3, [(1, 1)]).bit_length() - 1, True)
+        tracker.update(mask_of(3, [(2, 2)]).bit_length() - 1, True)
+        self.assertFalse(tracker.has_road)
+        tracker.update(mask_of(3, [(1, 0)]).bit_length() - 1, True)
+        tracker.update(mask_of(3, [(2, 1)]).bit_length() - 1, True)
+        self.assertTrue(tracker.has_road)
+        copied_tracker = tracker.copy()
+        tracker.update(mask_of(3, [(1, 0)]).bit_length() - 1, False)
+        self.assertFalse(tracker.has_road)
+        self.assertTrue(copied_tracker.has_road)
+        tracker.update(mask_of(3, [(0, 1)]).bit_length() - 1, True)
+        self.assertTrue(tracker.has_road)
+
+    def test_tak_road_tracker_update_random(self):
+        rng = np.random.RandomState(4180)
+        for board_size in range(3, 8):
+            roads = TakRoads.get(board_size)
+            tracker = TakRoadTracker(board_size)
+            mask = 0
+            for _ in range(500):
+                square = rng.randint(board_size * board_size)
+                is_road_square = rng.rand() < 0.6
+                mask = mask | (1 << square) if is_road_square else mask & ~(1 << square)
+                tracker.update(square, is_road_square)
+                self.assertEqual(tracker.road_squares, mask)
+                self.assertEqual(tracker.has_road, roads.has_road(mask))
+
+    def test_tak_state_has_path_for_player_random_games(self):
+        rng = np.random.RandomState(4180)
+        for board_size, pieces, capstone in [(3, 10, False), (4, 15, False), (5, 21, True)]:
+            for _ in range(3):
+                state = TakState(board_size, TakBoard(board_size), pieces, pieces, capstone, capstone, TakPlayer.WHITE)
+                actions = TakAction.get_possible_actions(state)
+                while len(actions) > 0:
+                    state = actions[rng.randint(len(actions))].take(state, mutate=rng.rand() < 0.5)
+                    for player in TakPlayer:
+                        self.assertEqual(state.has_path_for_player(player), state.board.has_path_for_player(player))
+                    actions = TakAction.get_possible_actions(state)
+
+
+if __name__ == '__main__':
+    unittest.main()
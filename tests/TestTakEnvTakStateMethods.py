@@ -2,7 +2,11 @@ import unittest
 
 import numpy as np
 
+from tak_env.TakAction import TakActionPlace
+from tak_env.TakBitBoard import TakBitBoard
 from tak_env.TakBoard import TakBoard
+from tak_env.TakCacheStats import TakCacheStats
+from tak_env.TakPiece import TakPiece
 from tak_env.TakPlayer import TakPlayer
 from tak_env.TakState import TakState
 
@@ -55,6 +59,73 @@ class TestTakEnvTakStateMethods(unittest.TestCase):
         self.assertFalse(state.board.has_path_for_player(TakPlayer.WHITE))
         self.assertFalse(state.board.has_path_for_player(TakPlayer.BLACK))
 
+    def test_tak_state_is_terminal_cache(self):
+        for board_class in [TakBoard, TakBitBoard]:
+            state = TakState(3, board_class(3), 3, 3, False, False, TakPlayer.WHITE)
+            for position in [(0, 0), (0, 1)]:
+                TakActionPlace(position, TakPiece.BLACK_FLAT).take(state, mutate=True)
+                TakActionPlace((position[0] + 1, position[1]), TakPiece.WHITE_FLAT).take(state, mutate=True)
+
+            TakCacheStats.reset()
+            self.assertEqual(state.is_terminal(), (False, {}))
+            self.assertEqual(state.is_terminal(), (False, {}))
+            self.assertEqual(TakCacheStats.summary()['is_terminal'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+            # Changing the state drops the cached results (black places its last piece and has more flats)
+            record = TakActionPlace((0, 2), TakPiece.BLACK_FLAT).make(state)
+            done, info = state.is_terminal()
+            self.assertTrue(done)
+            self.assertEqual(info['winning_player'], TakPlayer.BLACK)
+            # The info is a new dict each time, so callers can change it
+            info['winning_player'] = None
+            self.assertEqual(state.is_terminal()[1]['winning_player'], TakPlayer.BLACK)
+            self.assertEqual(state.winning_player(), TakPlayer.BLACK)
+            self.assertEqual(TakCacheStats.hits['winning_player'], 1)
+            self.assertEqual(TakCacheStats.misses['is_terminal'], 2)
+
+            record.undo(state)
+            self.assertFalse(state.is_terminal()[0])
+
+    def test_tak_state_road_trackers_follow_board(self):
+        for board_class in [TakBoard, TakBitBoard]:
+            state = TakState(3, board_class(3), 10, 10, False, False, TakPlayer.WHITE)
+            self.assertEqual(state.is_terminal(), (False, {}))
+
+            # Changes made directly to the board (not with make/unmake) rebuild the road trackers
+            for rank in range(3):
+                state.board.place_piece((0, rank), TakPiece.WHITE_FLAT)
+                state.board.place_piece((2, rank), TakPiece.BLACK_FLAT)
+            self.assertTrue(state.has_path_for_player(TakPlayer.WHITE))
+            self.assertTrue(state.is_terminal()[0])
+
+            # Even when they are followed by make/unmake
+            state.board.pick_up((0, 2), 1)
+            record = TakActionPlace((1, 2), TakPiece.WHITE_FLAT).make(state)
+            self.assertFalse(state.has_path_for_player(TakPlayer.WHITE))
+            record.undo(state)
+            TakActionPlace((0, 2), TakPiece.WHITE_FLAT).make(state)
+            self.assertTrue(state.has_path_for_player(TakPlayer.WHITE))
+
+    def test_tak_state_board_scans_cache(self):
+        board = TakBoard(3)
+        board.place_piece((1, 1), TakPiece.WHITE_FLAT)
+        TakCacheStats.reset()
+        empty_positions = board.get_empty_positions()
+        self.assertEqual(len(empty_positions), 8)
+        empty_positions.clear()
+        self.assertEqual(len(board.get_empty_positions()), 8)
+        self.assertEqual(board.get_positions_controlled_by_player(TakPlayer.WHITE), [(1, 1)])
+        self.assertEqual(board.get_positions_controlled_by_player(TakPlayer.WHITE), [(1, 1)])
+        self.assertEqual(TakCacheStats.hit_rate('empty_positions'), 0.5)
+        self.assertEqual(TakCacheStats.hit_rate('controlled_positions'), 0.5)
+
+        copied_board = board.copy()
+        copied_board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+        self.assertEqual(copied_board.get_positions_controlled_by_player(TakPlayer.WHITE), [(0, 0), (1, 1)])
+        self.assertEqual(len(copied_board.get_empty_positions()), 7)
+        self.assertEqual(board.get_positions_controlled_by_player(TakPlayer.WHITE), [(1, 1)])
+        self.assertEqual(len(board.get_empty_positions()), 8)
+
 
 if __name__ == '__main__':
     unittest.main()
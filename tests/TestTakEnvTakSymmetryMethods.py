@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+
+from tak_env.TakAction import TakAction, TakActionPlace, TakActionMove, TakActionMoveDir
+from tak_env.TakBitBoard import TakBitBoard
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+from tak_env.TakSymmetry import TakSymmetry
+
+
+class TestTakEnvTakSymmetryMethods(unittest.TestCase):
+
+    def test_tak_symmetry_get(self):
+        self.assertIs(TakSymmetry.get(3), TakSymmetry.get(3))
+        self.assertEqual(TakSymmetry.get(5).board_size, 5)
+
+    def test_tak_symmetry_positions(self):
+        symmetry = TakSymmetry.get(3)
+        self.assertEqual(symmetry.transform_position((0, 0), 0), (0, 0))
+        # A quarter turn takes the corners around the board
+        self.assertEqual(symmetry.transform_position((0, 0), 1), (0, 2))
+        self.assertEqual(symmetry.transform_position((0, 2), 1), (2, 2))
+        self.assertEqual(symmetry.transform_position((1, 1), 1), (1, 1))
+        # Mirroring the files
+        self.assertEqual(symmetry.transform_position((0, 1), 4), (2, 1))
+        images = {symmetry.transform_position((0, 1), t) for t in range(TakSymmetry.TRANSFORMS)}
+        self.assertEqual(images, {(0, 1), (1, 0), (1, 2), (2, 1)})
+        for t in range(TakSymmetry.TRANSFORMS):
+            inverse = symmetry.inverse(t)
+            self.assertEqual(symmetry.transform_position(symmetry.transform_position((0, 1), t), inverse), (0, 1))
+
+    def test_tak_symmetry_actions(self):
+        symmetry = TakSymmetry.get(4)
+        self.assertEqual(symmetry.transform_direction(TakActionMoveDir.UP, 1), TakActionMoveDir.RIGHT)
+        self.assertEqual(symmetry.transform_direction(TakActionMoveDir.RIGHT, 4), TakActionMoveDir.LEFT)
+        self.assertEqual(symmetry.transform_direction(TakActionMoveDir.UP, 4), TakActionMoveDir.UP)
+
+        place = TakActionPlace((0, 1), TakPiece.WHITE_STANDING)
+        self.assertEqual(symmetry.transform_action(place, 1), TakActionPlace((1, 3), TakPiece.WHITE_STANDING))
+        move = TakActionMove((0, 0), TakActionMoveDir.UP, (2, 1))
+        self.assertEqual(symmetry.transform_action(move, 1), TakActionMove((0, 3), TakActionMoveDir.RIGHT, (2, 1)))
+        for t in range(TakSymmetry.TRANSFORMS):
+            self.assertEqual(symmetry.transform_action(symmetry.transform_action(move, t), symmetry.inverse(t)), move)
+
+        action_ids = np.array([symmetry.action_table.id_of(place), symmetry.action_table.id_of(move), 0])
+        for t in range(TakSymmetry.TRANSFORMS):
+            self.assertEqual(
+                [symmetry.action_table.action(action_id) for action_id in symmetry.transform_action_ids(action_ids, t)],
+                [symmetry.transform_action(symmetry.action_table.action(action_id), t) for action_id in action_ids]
+            )
+
+    def test_tak_symmetry_canonical(self):
+        for board_class in [TakBoard, TakBitBoard]:
+            symmetry = TakSymmetry.get(3)
+            state = TakState(3, board_class(3), 10, 10, False, False, TakPlayer.WHITE)
+            corners = [
+                TakActionPlace(position, TakPiece.BLACK_FLAT).take(state)
+                for position in [(0, 0), (0, 2), (2, 0), (2, 2)]
+            ]
+            canonical_states = [symmetry.canonical(corner)[0] for corner in corners]
+            for canonical_state in canonical_states:
+                self.assertEqual(canonical_state, canonical_states[0])
+                self.assertEqual(canonical_state.key, canonical_states[0].key)
+                self.assertIsInstance(canonical_state.board, board_class)
+            self.assertNotEqual(
+                symmetry.canonical(TakActionPlace((1, 1), TakPiece.BLACK_FLAT).take(state))[0],
+                canonical_states[0]
+            )
+            canonical_state, t = symmetry.canonical(canonical_states[0])
+            self.assertIs(canonical_state, canonical_states[0])
+            self.assertEqual(t, 0)
+
+    def test_tak_symmetry_random_games(self):
+        rng = np.random.RandomState(4180)
+        for board_class in [TakBoard, TakBitBoard]:
+            for board_size, pieces, capstone in [(3, 10, False), (4, 15, False), (5, 21, True)]:
+                symmetry = TakSymmetry.get(board_size)
+                state = TakState(
+                    board_size, board_class(board_size), pieces, pieces, capstone, capstone, TakPlayer.WHITE
+                )
+                actions = TakAction.get_possible_actions(state)
+                while len(actions) > 0:
+                    canonical_state = symmetry.canonical(state)[0]
+                    action = actions[rng.randint(len(actions))]
+                    t = rng.randint(TakSymmetry.TRANSFORMS)
+                    transformed_state = symmetry.transform_state(state, t)
+                    self.assertEqual(symmetry.canonical(transformed_state)[0], canonical_state)
+                    self.assertEqual(
+                        set(TakAction.get_possible_actions(transformed_state)),
+                        {symmetry.transform_action(a, t) for a in actions}
+                    )
+                    self.assertEqual(
+                        symmetry.transform_state(action.take(state), t),
+                        symmetry.transform_action(action, t).take(transformed_state)
+                    )
+                    state = action.take(state)
+                    actions = TakAction.get_possible_actions(state)
+
+
+if __name__ == '__main__':
+    unittest.main()
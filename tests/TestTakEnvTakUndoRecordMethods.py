@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+from tak_env.TakAction import TakAction, TakActionPlace, TakActionMove, TakActionMoveDir
+from tak_env.TakBitBoard import TakBitBoard
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+
+
+class TestTakEnvTakUndoRecordMethods(unittest.TestCase):
+
+    def assertSameState(self, state: TakState, other: TakState):
+        self.assertEqual(state, other)
+        self.assertEqual(state.key, other.key)
+        self.assertEqual(state.board.as_tuple(), other.board.as_tuple())
+        for player in TakPlayer:
+            self.assertEqual(state.has_path_for_player(player), other.board.has_path_for_player(player))
+
+    def test_tak_undo_record_place(self):
+        for board_class in [TakBoard, TakBitBoard]:
+            state = TakState(3, board_class(3), 10, 10, True, True, TakPlayer.WHITE)
+            before = state.copy()
+            action = TakActionPlace((1, 1), TakPiece.BLACK_FLAT)
+            record = action.make(state)
+            self.assertSameState(state, action.take(before))
+            self.assertEqual(state.black_pieces_available, 9)
+            self.assertEqual(state.current_player, TakPlayer.BLACK)
+            record.undo(state)
+            self.assertSameState(state, before)
+
+            state = action.take(state)
+            before = state.copy()
+            record = TakActionPlace((0, 0), TakPiece.BLACK_CAPSTONE).make(state)
+            self.assertFalse(state.black_capstone_available)
+            record.undo(state)
+            self.assertSameState(state, before)
+
+    def test_tak_undo_record_move_flatten(self):
+        for board_class in [TakBoard, TakBitBoard]:
+            state = TakState(3, board_class(3), 10, 10, True, True, TakPlayer.WHITE)
+            state.board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+            state.board.place_piece((0, 0), TakPiece.WHITE_CAPSTONE)
+            state.board.place_piece((0, 2), TakPiece.BLACK_STANDING)
+            before = state.copy()
+            action = TakActionMove((0, 0), TakActionMoveDir.UP, (1, 1))
+            self.assertTrue(action.is_valid(state))
+            record = action.make(state)
+            self.assertTrue(record.flattened)
+            self.assertEqual(record.drop_positions, [(0, 1), (0, 2)])
+            self.assertEqual(state.board.top_piece(0, 2), TakPiece.WHITE_CAPSTONE)
+            record.undo(state)
+            self.assertSameState(state, before)
+            self.assertEqual(state.board.top_piece(0, 2), TakPiece.BLACK_STANDING)
+
+    def test_tak_undo_record_random_games(self):
+        rng = np.random.RandomState(4017)
+        for board_class in [TakBoard, TakBitBoard]:
+            for board_size, pieces, capstone in [(3, 10, False), (4, 15, False), (5, 21, True)]:
+                state = TakState(
+                    board_size, board_class(board_size), pieces, pieces, capstone, capstone, TakPlayer.WHITE
+                )
+                actions = TakAction.get_possible_actions(state)
+                while len(actions) > 0:
+                    state.is_terminal()  # Builds the road trackers, so they are made and undone too
+                    before = state.copy()
+                    for action in actions:
+                        record = action.make(state)
+                        self.assertSameState(state, action.take(before))
+                        record.undo(state)
+                        self.assertSameState(state, before)
+                    actions[rng.randint(len(actions))].make(state)
+                    actions = TakAction.get_possible_actions(state)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from tak_env.TakAction import TakAction, TakActionPlace
+from tak_env.TakBitBoard import TakBitBoard
+from tak_env.TakBoard import TakBoard
+from tak_env.TakPiece import TakPiece
+from tak_env.TakPlayer import TakPlayer
+from tak_env.TakState import TakState
+from tak_env.TakZobrist import TakZobrist
+
+
+class TestTakEnvTakZobristMethods(unittest.TestCase):
+
+    def test_tak_zobrist_get(self):
+        self.assertIs(TakZobrist.get(3), TakZobrist.get(3))
+        self.assertEqual(TakZobrist.get(5).board_size, 5)
+
+    def test_tak_zobrist_deterministic(self):
+        zobrist = TakZobrist.get(4)
+        fresh = TakZobrist(4)
+        # Asking for keys in a different order still gives the same keys
+        self.assertEqual(fresh.reserve_key(TakPlayer.BLACK, 7), zobrist.reserve_key(TakPlayer.BLACK, 7))
+        self.assertEqual(fresh.piece_key(3, 5, TakPiece.WHITE_FLAT), zobrist.piece_key(3, 5, TakPiece.WHITE_FLAT))
+        self.assertEqual(fresh.piece_key(0, 0, TakPiece.BLACK_FLAT), zobrist.piece_key(0, 0, TakPiece.BLACK_FLAT))
+        self.assertEqual(fresh.player_keys, zobrist.player_keys)
+        self.assertNotEqual(TakZobrist(3).player_keys, zobrist.player_keys)
+
+    def test_tak_zobrist_board_key(self):
+        for board_class in [TakBoard, TakBitBoard]:
+            board = board_class(3)
+            self.assertEqual(board.key, 0)
+            board.place_piece((0, 0), TakPiece.WHITE_FLAT)
+            board.place_piece((0, 0), TakPiece.BLACK_STANDING)
+            board.place_piece((0, 0), TakPiece.WHITE_CAPSTONE)
+            self.assertEqual(board.key, TakZobrist.get(3).board_key(board))
+            self.assertEqual(board.copy().key, board.key)
+            board.pick_up((0, 0), 3)
+            self.assertEqual(board.key, 0)
+
+    def test_tak_zobrist_transpositions(self):
+        for board_class in [TakBoard, TakBitBoard]:
+            state = TakState(3, board_class(3), 10, 10, False, False, TakPlayer.WHITE)
+            first = TakActionPlace((0, 0), TakPiece.WHITE_FLAT)
+            second = TakActionPlace((1, 1), TakPiece.BLACK_FLAT)
+            third = TakActionPlace((2, 2), TakPiece.WHITE_FLAT)
+            fourth = TakActionPlace((1, 0), TakPiece.BLACK_FLAT)
+            state_a = fourth.take(third.take(second.take(first.take(state))))
+            state_b = second.take(first.take(fourth.take(third.take(state))))
+            self.assertEqual(state_a, state_b)
+            self.assertEqual(state_a.key, state_b.key)
+            self.assertEqual(hash(state_a), hash(state_b))
+
+    def test_tak_zobrist_state_key(self):
+        state = TakState(3, TakBoard(3), 10, 10, True, True, TakPlayer.WHITE)
+        other_player = TakState(3, TakBoard(3), 10, 10, True, True, TakPlayer.BLACK)
+        fewer_pieces = TakState(3, TakBoard(3), 9, 10, True, True, TakPlayer.WHITE)
+        no_capstone = TakState(3, TakBoard(3), 10, 10, True, False, TakPlayer.WHITE)
+        swapped_reserves = TakState(3, TakBoard(3), 10, 9, True, True, TakPlayer.WHITE)
+        keys = [state.key, other_player.key, fewer_pieces.key, no_capstone.key, swapped_reserves.key]
+        self.assertEqual(len(set(keys)), len(keys))
+        self.assertEqual(state.key, TakState(3, TakBitBoard(3), 10, 10, True, True, TakPlayer.WHITE).key)
+
+    def test_tak_zobrist_random_games(self):
+        rng = np.random.RandomState(4180)
+        for board_class in [TakBoard, TakBitBoard]:
+            for board_size, pieces, capstone in [(3, 10, False), (4, 15, False), (5, 21, True)]:
+                zobrist = TakZobrist.get(board_size)
+                state = TakState(
+                    board_size, board_class(board_size), pieces, pieces, capstone, capstone, TakPlayer.WHITE
+                )
+                actions = TakAction.get_possible_actions(state)
+                while len(actions) > 0:
+                    state = actions[rng.randint(len(actions))].take(state, mutate=rng.rand() < 0.5)
+                    self.assertEqual(state.board.key, zobrist.board_key(state.board))
+                    actions = TakAction.get_possible_actions(state)
+
+
+if __name__ == '__main__':
+    unittest.main()
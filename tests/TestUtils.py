@@ -1,6 +1,15 @@
+import pickle
+import tempfile
+import threading
 import unittest
 
-from utils.utils import partitions, ordered_partitions
+import numpy as np
+
+from utils.PackedTable import PackedTable
+from utils.QTable import QTable
+from utils.SearchBudget import SearchBudget
+from utils.TranspositionTable import TranspositionTable
+from utils.utils import partitions, ordered_partitions, decayed_chain_sums
 
 
 class TestUtils(unittest.TestCase):
@@ -53,6 +62,211 @@ class TestUtils(unittest.TestCase):
 
         # Fun fact, apparently the count of ordered partitions of 2^(n-1)
 
+    def test_decayed_chain_sums(self):
+        self.assertEqual([1.75, 1.5, 1.0], list(decayed_chain_sums([1.0, 1.0, 1.0], [False, False, False], 0.5)))
+        # The second chain starts after the first end
+        self.assertEqual(
+            [3.0, 2.0, 4.0, 8.0], list(decayed_chain_sums([2.0, 2.0, 0.0, 8.0], [False, True, False, True], 0.5))
+        )
+        self.assertEqual([2.0, 2.0], list(decayed_chain_sums([2.0, 2.0], [False, False], 0.0)))
+        self.assertEqual(0, len(decayed_chain_sums([], [], 0.5)))
+
+        # Long chains, against the sums of their definition
+        values = np.random.RandomState(24).normal(size=2000)
+        chain_ends = np.zeros(2000, dtype=bool)
+        chain_ends[[999, 1999]] = True
+        sums = decayed_chain_sums(values, chain_ends, 0.9)
+        for k in [0, 500, 999, 1000, 1998]:
+            chain_end = 999 if k < 1000 else 1999
+            self.assertAlmostEqual(sums[k], sum(0.9 ** (t - k) * values[t] for t in range(k, chain_end + 1)))
+
+        # Chains much longer than the blocks (decay^t would underflow over the whole chain), against the recurrence
+        values = np.random.RandomState(25).normal(size=5000)
+        chain_ends = np.zeros(5000, dtype=bool)
+        chain_ends[[1234, 1235, 4000]] = True
+        for decay in [0.5, 0.01, 0.999]:
+            expected_sums = np.zeros(5000)
+            running_sum = 0.0
+            for k in range(4999, -1, -1):
+                running_sum = values[k] + (0.0 if chain_ends[k] else decay * running_sum)
+                expected_sums[k] = running_sum
+            np.testing.assert_allclose(expected_sums, decayed_chain_sums(values, chain_ends, decay), atol=1e-12)
+
+    def test_search_budget(self):
+        budget = SearchBudget()
+        self.assertFalse(budget.is_limited())
+        budget.nodes = 10 ** 9
+        self.assertFalse(budget.exhausted())
+
+        budget = SearchBudget(node_budget=3).start()
+        self.assertTrue(budget.is_limited())
+        budget.nodes = 2
+        self.assertFalse(budget.exhausted())
+        budget.nodes = 3
+        self.assertTrue(budget.exhausted())
+        self.assertFalse(budget.start().exhausted())
+
+        budget = SearchBudget(time_budget_ms=0).start()
+        self.assertTrue(budget.exhausted())
+        self.assertGreaterEqual(budget.elapsed_ms(), 0)
+        self.assertFalse(SearchBudget(time_budget_ms=60000).start().exhausted())
+
+    def test_transposition_table(self):
+        table = TranspositionTable(max_memory_mb=0.001, bucket_size=2)
+        self.assertEqual(32, table.size)
+        self.assertEqual(0, len(table))
+        self.assertIsNone(table.get(5))
+
+        table.put(5, 3, 1.5, TranspositionTable.EXACT, 7)
+        self.assertEqual((3, 1.5, TranspositionTable.EXACT, 7), table.get(5))
+        table.put(5, 2, -1.0, TranspositionTable.UPPER_BOUND)
+        self.assertEqual((2, -1.0, TranspositionTable.UPPER_BOUND, -1), table.get(5))
+        self.assertEqual(1, len(table))
+
+        # Same bucket (same lowest bits) as 5: the full bucket replaces the entry with the lowest depth
+        big_key = 2 ** 64 - 16 + 5
+        table.put(big_key, 4, 2.0, TranspositionTable.LOWER_BOUND)
+        table.put(5 + 16, 1, 0.0, TranspositionTable.EXACT)
+        self.assertIsNone(table.get(5))
+        self.assertEqual((4, 2.0, TranspositionTable.LOWER_BOUND, -1), table.get(big_key))
+        table.put(5 + 32, 3, 0.0, TranspositionTable.EXACT)
+        self.assertIsNone(table.get(5 + 16))
+        self.assertEqual((3, 0.0, TranspositionTable.EXACT, -1), table.get(5 + 32))
+        self.assertEqual(2, table.replacements)
+
+        # Entries of the previous searches are replaced first, even if they are deeper
+        table.new_search()
+        table.put(5 + 32, 1, 0.0, TranspositionTable.EXACT)
+        table.put(5, 1, 0.0, TranspositionTable.EXACT)
+        self.assertIsNone(table.get(big_key))
+        self.assertIsNotNone(table.get(5 + 32))
+
+        table.clear()
+        self.assertEqual(0, len(table))
+        self.assertIsNone(table.get(5))
+
+    def test_q_table(self):
+        table = QTable(4, initial_value=0.5, initial_capacity=1)
+        self.assertEqual(0, len(table))
+        self.assertEqual(0.5, table.get(123, 2))
+        self.assertEqual([0.5] * 4, list(table.row(123)))
+        self.assertIsNone(table.state_id(123))
+        self.assertEqual(0, len(table))
+
+        table.set(123, 2, 1.0)
+        table.add(123, 1, -1.0)
+        table.add(456, 3, 2.0)
+        table.set(2 ** 64 - 1, 0, 3.0)
+        self.assertEqual(3, len(table))
+        self.assertEqual([0.5, -0.5, 1.0, 0.5], list(table.row(123)))
+        self.assertEqual(2.5, table.get(456, 3))
+        self.assertEqual(3.0, table.get(2 ** 64 - 1, 0))
+        self.assertEqual(1, table.state_id(456))
+
+        copied_table = pickle.loads(pickle.dumps(table))
+        self.assertEqual([0.5, -0.5, 1.0, 0.5], list(copied_table.row(123)))
+        copied_table.set(789, 0, 4.0)
+        self.assertEqual(4, len(copied_table))
+        self.assertEqual(0.5, table.get(789, 0))
+
+    def test_q_table_threads(self):
+        table = QTable(2, initial_capacity=1)
+
+        def add_rows(thread: int):
+            for key in range(3000):
+                table.add(thread * 10000 + key, 1, 1.0)
+                # A row shared by every thread, changed while the others grow the table
+                table.add_many(np.array([10 ** 6], dtype=np.uint64), np.array([0]), np.array([1.0]))
+
+        threads = [threading.Thread(target=add_rows, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Each state gets its own row
+        self.assertEqual(24001, len(table))
+        self.assertEqual(set(range(24001)), set(table.state_ids.values()))
+        # No change is lost
+        self.assertEqual(24000.0, table.get(10 ** 6, 0))
+        self.assertTrue(all(table.get(thread * 10000 + key, 1) == 1.0 for thread in range(8) for key in range(3000)))
+
+    def test_q_table_many(self):
+        table = QTable(3, initial_value=0.5)
+        table.set(10, 1, 2.0)
+        state_keys = np.array([10, 20, 10, 10], dtype=np.uint64)
+        self.assertEqual([0, -1, 0, 0], list(table.state_ids_of(state_keys)))
+        self.assertEqual([2.0, 0.5, 0.5, 2.0], list(table.get_many(state_keys, np.array([1, 1, 0, 1]))))
+
+        # Repeated pairs add up
+        table.add_many(state_keys, np.array([1, 2, 0, 1]), np.array([1.0, -1.0, 0.25, 1.0]))
+        self.assertEqual(2, len(table))
+        self.assertEqual([0.75, 4.0, 0.5], list(table.row(10)))
+        self.assertEqual([0.5, 0.5, -0.5], list(table.row(20)))
+
+        with tempfile.TemporaryDirectory() as path:
+            table.save(path)
+            loaded_table = QTable.load(path)
+            self.assertEqual([4.0, 0.5, -0.5], list(loaded_table.get_many(np.array([10, 30, 20]), np.array([1, 1, 2]))))
+            loaded_table.add_many(np.array([20]), np.array([0]), np.array([1.0]))
+            self.assertEqual([1.5, 0.5, -0.5], list(loaded_table.row(20)))
+
+    def test_packed_table(self):
+        with tempfile.TemporaryDirectory() as path:
+            PackedTable.save(
+                path, np.array([30, 10, 20]), {'values': np.array([[3, 3], [1, 1], [2, 2]])}, meta={'a': 1}
+            )
+            table = PackedTable.load(path)
+            self.assertEqual(3, len(table))
+            self.assertEqual([10, 20, 30], list(table.keys))
+            self.assertEqual(1, table.meta['a'])
+            self.assertEqual(2, table.index(30))
+            self.assertIsNone(table.index(40))
+            self.assertEqual([0, -1, 2], list(table.indices(np.array([10, 15, 30]))))
+            self.assertEqual([3, 3], list(table.arrays['values'][table.index(30)]))
+
+            # Rows of the base are kept unless given again, even when replacing the base
+            PackedTable.save(path, np.array([40, 20]), {'values': np.array([[4, 4], [5, 5]])}, base=table)
+            table = PackedTable.load(path, mmap=False)
+            self.assertEqual([10, 20, 30, 40], list(table.keys))
+            self.assertEqual([[1, 1], [5, 5], [3, 3], [4, 4]], table.arrays['values'].tolist())
+
+            with self.assertRaises(ValueError):
+                PackedTable.save(path, np.array([1, 1]), {'values': np.zeros((2, 2))})
+            with self.assertRaises(ValueError):
+                PackedTable.save(path, np.array([1]), {'other': np.zeros((1, 2))}, base=table)
+
+    def test_q_table_save_load(self):
+        table = QTable(4, initial_value=0.5)
+        table.set(123, 1, -0.5)
+        table.set(456, 3, 2.5)
+        with tempfile.TemporaryDirectory() as path:
+            table.save(path)
+            loaded_table = QTable.load(path)
+            self.assertEqual(2, len(loaded_table))
+            self.assertEqual(0, len(loaded_table.state_ids))
+            self.assertEqual([0.5, -0.5, 0.5, 0.5], list(loaded_table.row(123)))
+            self.assertEqual(2.5, loaded_table.get(456, 3))
+            self.assertEqual(0.5, loaded_table.get(789, 3))
+
+            # Changed rows are copied from the base into memory, and saving again merges both
+            loaded_table.add(456, 3, 1.0)
+            loaded_table.set(789, 0, 4.0)
+            self.assertEqual(3, len(loaded_table))
+            self.assertEqual(3.5, loaded_table.get(456, 3))
+            self.assertEqual(2.5, table.get(456, 3))
+            loaded_table.save(path)
+            self.assertEqual(3, len(loaded_table))
+
+            copied_table = pickle.loads(pickle.dumps(loaded_table))
+            self.assertEqual(3, len(copied_table))
+            self.assertEqual(-0.5, copied_table.get(123, 1))
+
+            loaded_table = QTable.load(path, mmap=False)
+            self.assertEqual(3, len(loaded_table))
+            self.assertEqual(-0.5, loaded_table.get(123, 1))
+            self.assertEqual(3.5, loaded_table.get(456, 3))
+            self.assertEqual(4.0, loaded_table.get(789, 0))
+
 
 if __name__ == '__main__':
     unittest.main()
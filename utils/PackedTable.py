@@ -0,0 +1,144 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class PackedTable(object):
+    """
+    PackedTable class.
+    Read only table of rows keyed by 64-bit keys (like the Zobrist keys of the states), stored on disk as a directory
+    of .npy files: the keys sorted in `keys.npy`, and one file per array of values (`<name>.npy`) with the row of each
+    key at the same index, plus a `meta.json` file with the names of the arrays and any extra metadata.
+
+    Tables are loaded memory mapped by default, so opening one does not read it into memory and every process that
+    opens it shares the same pages. Rows are looked up with a binary search over the keys. Pickling a memory mapped
+    table only pickles its path (it is opened again when unpickled).
+    """
+
+    KEYS = 'keys'
+    META = 'meta.json'
+
+    def __init__(
+            self,
+            path: Optional[str],
+            keys: np.ndarray,
+            arrays: Dict[str, np.ndarray],
+            meta: Dict[str, Any],
+            mmap: bool = True
+    ):
+        self.path: Optional[str] = path
+        self.keys: np.ndarray = keys
+        self.arrays: Dict[str, np.ndarray] = arrays
+        self.meta: Dict[str, Any] = meta
+        self.mmap: bool = mmap
+
+    def __getstate__(self):
+        if self.mmap and self.path is not None:
+            return {'path': self.path, 'mmap': True}
+        return self.__dict__.copy()
+
+    def __setstate__(self, state):
+        if 'keys' not in state:
+            state = PackedTable.load(state['path'], mmap=True).__dict__
+        self.__dict__.update(state)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def index(self, key: int) -> Optional[int]:
+        """
+        Returns the index of the row of the given key
+        :param key: the 64-bit key
+        :return: the index, or None if the key is not in the table
+        """
+        key = np.uint64(key)
+        i = int(np.searchsorted(self.keys, key))
+        return i if i < len(self.keys) and self.keys[i] == key else None
+
+    def indices(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Returns the indices of the rows of the given keys
+        :param keys: array of 64-bit keys
+        :return: array with the index of each key (-1 for the keys that are not in the table)
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        if len(self.keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[found] == keys, found, -1).astype(np.int64)
+
+    @staticmethod
+    def load(path: str, mmap: bool = True) -> 'PackedTable':
+        """
+        Opens the table saved in the given directory (see save)
+        :param path: the directory of the table
+        :param mmap: whether to memory map the arrays (read only) instead of reading them into memory
+        :return: PackedTable
+        """
+        with open(os.path.join(path, PackedTable.META)) as meta_file:
+            meta = json.load(meta_file)
+        mmap_mode = 'r' if mmap else None
+        keys = np.load(os.path.join(path, f"{PackedTable.KEYS}.npy"), mmap_mode=mmap_mode)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in meta['arrays']}
+        return PackedTable(path, keys, arrays, meta, mmap)
+
+    @staticmethod
+    def save(
+            path: str,
+            keys: np.ndarray,
+            arrays: Dict[str, np.ndarray],
+            meta: Optional[Dict[str, Any]] = None,
+            base: Optional['PackedTable'] = None,
+            block_rows: int = 65536
+    ) -> None:
+        """
+        Saves a table with the given rows (and the rows of the base table with keys that are not given) to the given
+        directory. The arrays are written in blocks of rows, so the base table (and the given arrays, if memory mapped)
+        is never read into memory at once. The base table can be one loaded from the same directory.
+        :param path: the directory to save the table to (created if missing)
+        :param keys: array with the 64-bit key of each row (without repeated keys)
+        :param arrays: the arrays of values, by name, with one row per key
+        :param meta: extra metadata to save (must be JSON serializable)
+        :param base: a table with the same arrays whose rows to keep (unless overwritten by the given rows)
+        :param block_rows: the number of rows to copy at once
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        if len(np.unique(keys)) != len(keys):
+            raise ValueError("The keys of a PackedTable must be unique")
+        # (keys, arrays, rows of the arrays) of each source of rows
+        sources: List[Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray]] = [(keys, arrays, np.arange(len(keys)))]
+        if base is not None and len(base) > 0:
+            if set(base.arrays) != set(arrays):
+                raise ValueError(f"The base table has other arrays: {sorted(base.arrays)} (expected {sorted(arrays)})")
+            base_rows = np.flatnonzero(~np.isin(base.keys, keys))
+            sources.append((base.keys[base_rows], base.arrays, base_rows))
+
+        all_keys = np.concatenate([source_keys for source_keys, _, _ in sources])
+        source_of = np.concatenate([np.full(len(rows), i) for i, (_, _, rows) in enumerate(sources)])
+        row_of = np.concatenate([rows for _, _, rows in sources])
+        order = np.argsort(all_keys, kind='stable')
+
+        # Written to temporary files first, so the base table can be the one being replaced
+        os.makedirs(path, exist_ok=True)
+        written = {PackedTable.KEYS: os.path.join(path, f"{PackedTable.KEYS}.tmp.npy")}
+        np.save(written[PackedTable.KEYS], all_keys[order])
+        for name, array in arrays.items():
+            written[name] = os.path.join(path, f"{name}.tmp.npy")
+            output = np.lib.format.open_memmap(
+                written[name], mode='w+', dtype=array.dtype, shape=(len(order),) + array.shape[1:]
+            )
+            for start in range(0, len(order), block_rows):
+                block = order[start:start + block_rows]
+                for i, (_, source_arrays, _) in enumerate(sources):
+                    in_source = source_of[block] == i
+                    output[start + np.flatnonzero(in_source)] = source_arrays[name][row_of[block[in_source]]]
+            output.flush()
+            del output
+        with open(os.path.join(path, f"{PackedTable.META}.tmp"), 'w') as meta_file:
+            json.dump(dict(meta or {}, arrays=list(arrays)), meta_file)
+
+        for name, written_path in written.items():
+            os.replace(written_path, os.path.join(path, f"{name}.npy"))
+        os.replace(os.path.join(path, f"{PackedTable.META}.tmp"), os.path.join(path, PackedTable.META))
@@ -0,0 +1,209 @@
+from threading import Lock
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+
+from utils.PackedTable import PackedTable
+
+
+class QTable(object):
+    """
+    QTable class.
+    Table of Q values for a fixed set of actions (like the ids of an action table, see TakActionTable): states are
+    interned to row ids (with any hashable key, like the Zobrist keys of the states), and each row is a NumPy array with
+    the Q value of every action of the state, so the values of all the actions of a state are one row lookup away.
+
+    Rows are only added when a value of the state is set, the values of states without a row are initial_value.
+    The rows are stored in a single array that doubles its capacity when full. Changing the table is thread safe (so it
+    can be updated from the threads of TakThreadRolloutExecutor): the rows are added and the values changed under a
+    lock, so no change is lost when another thread grows the array. Reads do not lock, and may see the values from
+    before a concurrent change.
+
+    Tables are saved to disk as a PackedTable (see save), which needs the state keys to be 64-bit ints. A loaded table
+    (see load) keeps the saved rows memory mapped as a read only base: a state of the base only gets a row in memory
+    (copied from the base) when one of its values is set, and saving the table again merges both.
+    """
+
+    def __init__(
+            self,
+            actions: int,
+            initial_value: float = 0.0,
+            initial_capacity: int = 1024,
+            dtype: type = np.float64
+    ):
+        """
+        :param actions: the number of actions (the length of each row)
+        :param initial_value: the Q value of the state-action pairs that were never set
+        :param initial_capacity: the number of rows to allocate at first
+        :param dtype: the type of the Q values
+        """
+        self.actions: int = actions
+        self.initial_value: float = initial_value
+        self.state_ids: Dict[Hashable, int] = {}
+        self.values: np.ndarray = np.full((max(initial_capacity, 1), actions), initial_value, dtype=dtype)
+        self._initial_row: np.ndarray = np.full(actions, initial_value, dtype=dtype)
+        self._initial_row.flags.writeable = False
+        # Saved rows (see load), and the number of them that have a row in memory
+        self.base: Optional[PackedTable] = None
+        self._base_rows_in_memory: int = 0
+        # Guards adding rows (and growing the values array) and changing the values
+        self._lock: Lock = Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Only the rows in use
+        state['values'] = self.values[:len(self.state_ids)].copy()
+        del state['_initial_row']
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.values = np.concatenate([
+            self.values, np.full((max(len(self.values), 1), self.actions), self.initial_value, dtype=self.values.dtype)
+        ])
+        self._initial_row = np.full(self.actions, self.initial_value, dtype=self.values.dtype)
+        self._initial_row.flags.writeable = False
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        base_rows = 0 if self.base is None else len(self.base) - self._base_rows_in_memory
+        return len(self.state_ids) + base_rows
+
+    def _base_row(self, state_key: Hashable) -> Optional[np.ndarray]:
+        if self.base is None:
+            return None
+        i = self.base.index(state_key)
+        return None if i is None else self.base.arrays['values'][i]
+
+    def state_id(self, state_key: Hashable, create: bool = False) -> Optional[int]:
+        """
+        Returns the row id of the given state
+        :param state_key: the key of the state
+        :param create: whether to add a row (with the initial values) for the state if it has none
+        :return: the row id, or None if the state has no row and create is False
+        """
+        state_id = self.state_ids.get(state_key)
+        if state_id is None and create:
+            with self._lock:
+                # Another thread may have added the row in the meantime
+                state_id = self.state_ids.get(state_key)
+                if state_id is None:
+                    state_id = len(self.state_ids)
+                    if state_id == len(self.values):
+                        self.values = np.concatenate([
+                            self.values, np.full(self.values.shape, self.initial_value, dtype=self.values.dtype)
+                        ])
+                    base_row = self._base_row(state_key)
+                    if base_row is not None:
+                        self.values[state_id] = base_row
+                        self._base_rows_in_memory += 1
+                    # Only visible to the readers (that do not lock) once the row is ready
+                    self.state_ids[state_key] = state_id
+        return state_id
+
+    def row(self, state_key: Hashable) -> np.ndarray:
+        """
+        Returns the Q values of all the actions of the given state (read only when the state has no row)
+        :param state_key: the key of the state
+        :return: array with the Q value of each action
+        """
+        state_id = self.state_ids.get(state_key)
+        if state_id is not None:
+            return self.values[state_id]
+        base_row = self._base_row(state_key)
+        return self._initial_row if base_row is None else base_row
+
+    def get(self, state_key: Hashable, action_id: int) -> float:
+        state_id = self.state_ids.get(state_key)
+        if state_id is not None:
+            return float(self.values[state_id, action_id])
+        base_row = self._base_row(state_key)
+        return self.initial_value if base_row is None else float(base_row[action_id])
+
+    def set(self, state_key: Hashable, action_id: int, value: float) -> None:
+        state_id = self.state_id(state_key, create=True)
+        # Under the lock, since adding a row (in another thread) can replace the values array
+        with self._lock:
+            self.values[state_id, action_id] = value
+
+    def add(self, state_key: Hashable, action_id: int, delta: float) -> None:
+        state_id = self.state_id(state_key, create=True)
+        with self._lock:
+            self.values[state_id, action_id] += delta
+
+    def state_ids_of(self, state_keys: np.ndarray, create: bool = False) -> np.ndarray:
+        """
+        Same as state_id, for an array of (integer) state keys
+        :param state_keys: array of state keys
+        :param create: whether to add rows for the states that have none
+        :return: array with the row id of each state (-1 for the states without a row if create is False)
+        """
+        unique_keys, inverse = np.unique(state_keys, return_inverse=True)
+        get = (lambda key: self.state_id(key, create=True)) if create else (lambda key: self.state_ids.get(key, -1))
+        return np.array([get(key) for key in unique_keys.tolist()], dtype=np.int64)[inverse.reshape(-1)]
+
+    def get_many(self, state_keys: np.ndarray, action_ids: np.ndarray) -> np.ndarray:
+        """
+        Same as get, for arrays of (integer) state keys and action ids
+        :param state_keys: array of state keys
+        :param action_ids: array with the action id of each state key
+        :return: array with the Q value of each state-action pair
+        """
+        action_ids = np.asarray(action_ids, dtype=np.int64)
+        state_ids = self.state_ids_of(state_keys)
+        values = np.full(len(state_ids), self.initial_value, dtype=self.values.dtype)
+        in_memory = state_ids >= 0
+        values[in_memory] = self.values[state_ids[in_memory], action_ids[in_memory]]
+        if self.base is not None and not in_memory.all():
+            missing = np.flatnonzero(~in_memory)
+            base_rows = self.base.indices(np.asarray(state_keys, dtype=np.uint64)[missing])
+            in_base = base_rows >= 0
+            values[missing[in_base]] = self.base.arrays['values'][base_rows[in_base], action_ids[missing[in_base]]]
+        return values
+
+    def add_many(self, state_keys: np.ndarray, action_ids: np.ndarray, deltas: np.ndarray) -> None:
+        """
+        Same as add, for arrays of (integer) state keys, action ids and changes. The changes of repeated state-action
+        pairs are added up.
+        :param state_keys: array of state keys
+        :param action_ids: array with the action id of each state key
+        :param deltas: array with the change of each state-action pair
+        """
+        state_ids = self.state_ids_of(state_keys, create=True)
+        with self._lock:
+            np.add.at(self.values, (state_ids, np.asarray(action_ids, dtype=np.int64)), deltas)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the table (the rows in memory and the rows of the base) to the given directory, as a PackedTable.
+        The saved table becomes the base of the table (the rows in memory are kept).
+        :param path: the directory to save the table to (it can be the one the table was loaded from)
+        """
+        rows = len(self.state_ids)
+        PackedTable.save(
+            path,
+            np.array(list(self.state_ids), dtype=np.uint64),
+            {'values': self.values[:rows]},
+            meta={'actions': self.actions, 'initial_value': self.initial_value},
+            base=self.base
+        )
+        self.base = PackedTable.load(path, mmap=self.base.mmap if self.base is not None else True)
+        self._base_rows_in_memory = rows
+
+    @staticmethod
+    def load(path: str, mmap: bool = True, initial_capacity: int = 1024) -> 'QTable':
+        """
+        Loads a table saved with save. The saved rows are the base of the table: they are only read (and copied into
+        memory when changed) as they are used, and when mmap is set every process that loads the table shares them.
+        :param path: the directory the table was saved to
+        :param mmap: whether to memory map the saved rows (read only) instead of reading them into memory
+        :param initial_capacity: the number of rows to allocate at first for the rows in memory
+        :return: QTable
+        """
+        base = PackedTable.load(path, mmap=mmap)
+        table = QTable(
+            base.meta['actions'], base.meta['initial_value'], initial_capacity, base.arrays['values'].dtype.type
+        )
+        table.base = base
+        return table
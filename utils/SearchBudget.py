@@ -0,0 +1,45 @@
+import time
+from typing import Optional
+
+
+class SearchBudget(object):
+    """
+    SearchBudget class.
+    Limit on the work a search can do for a single move: a wall-clock time (in milliseconds) and/or a number of nodes.
+    A budget with no limits is never exhausted.
+    """
+
+    def __init__(self, time_budget_ms: Optional[float] = None, node_budget: Optional[int] = None):
+        self.time_budget_ms: Optional[float] = time_budget_ms
+        self.node_budget: Optional[int] = node_budget
+        self.start_time: float = time.perf_counter()
+        self.nodes: int = 0
+
+    def is_limited(self) -> bool:
+        """
+        Returns whether this budget has a time or node limit
+        """
+        return self.time_budget_ms is not None or self.node_budget is not None
+
+    def start(self) -> 'SearchBudget':
+        """
+        Starts counting the time and nodes from now
+        :return: this budget
+        """
+        self.start_time = time.perf_counter()
+        self.nodes = 0
+        return self
+
+    def elapsed_ms(self) -> float:
+        """
+        Returns the milliseconds since the budget was started
+        """
+        return (time.perf_counter() - self.start_time) * 1000
+
+    def exhausted(self) -> bool:
+        """
+        Returns whether the time or the nodes of the budget have run out
+        """
+        if self.node_budget is not None and self.nodes >= self.node_budget:
+            return True
+        return self.time_budget_ms is not None and self.elapsed_ms() >= self.time_budget_ms
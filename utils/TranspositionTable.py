@@ -0,0 +1,112 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class TranspositionTable(object):
+    """
+    TranspositionTable class.
+    Fixed size table of search results (depth, value, bound type and index of the best move) keyed by 64-bit hashes
+    (like the Zobrist keys of the states), stored in NumPy arrays so it never grows past its memory cap.
+
+    The table is split into buckets of bucket_size entries; a key can only be stored in the bucket given by its lowest
+    bits. When the bucket is full the entry to replace is the one from the oldest search (see new_search), and between
+    entries of the same search the one searched to the lowest depth.
+    """
+
+    EXACT = 0
+    LOWER_BOUND = 1
+    UPPER_BOUND = 2
+
+    # key (8), value (8), depth (2), bound (1), best move (4), search (4)
+    ENTRY_BYTES = 27
+
+    def __init__(self, max_memory_mb: float = 16.0, bucket_size: int = 4):
+        """
+        :param max_memory_mb: the most memory (in megabytes) the entries can use
+        :param bucket_size: the number of entries of each bucket
+        """
+        max_buckets = int(max_memory_mb * 2 ** 20) // (TranspositionTable.ENTRY_BYTES * bucket_size)
+        if max_buckets < 1:
+            raise ValueError(f"Not enough memory for a bucket of {bucket_size} entries: {max_memory_mb}MB")
+        # Power of two, so the bucket is just the lowest bits of the key
+        self.buckets: int = 2 ** (max_buckets.bit_length() - 1)
+        self.bucket_size: int = bucket_size
+        self.size: int = self.buckets * bucket_size
+
+        self.keys = np.zeros(self.size, dtype=np.uint64)
+        self.values = np.zeros(self.size, dtype=np.float64)
+        self.depths = np.full(self.size, -1, dtype=np.int16)
+        self.bounds = np.zeros(self.size, dtype=np.int8)
+        self.best_moves = np.full(self.size, -1, dtype=np.int32)
+        self.searches = np.zeros(self.size, dtype=np.int32)
+
+        self.search: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.replacements: int = 0
+
+    def new_search(self) -> None:
+        """
+        Starts a new search: the entries of the previous searches are kept, but are replaced first
+        """
+        self.search += 1
+
+    def clear(self) -> None:
+        """
+        Removes all the entries of the table (and resets its counters)
+        """
+        self.depths.fill(-1)
+        self.best_moves.fill(-1)
+        self.search, self.hits, self.misses, self.replacements = 0, 0, 0, 0
+
+    def _bucket_start(self, key: int) -> int:
+        return (key & (self.buckets - 1)) * self.bucket_size
+
+    def _find(self, key: int) -> Optional[int]:
+        start = self._bucket_start(key)
+        for i in range(start, start + self.bucket_size):
+            if self.depths[i] >= 0 and self.keys[i] == key:
+                return i
+        return None
+
+    def get(self, key: int) -> Optional[Tuple[int, float, int, int]]:
+        """
+        Gets the entry of the given key
+        :param key: the 64-bit key
+        :return: the depth, value, bound type and best move (-1 if none) of the entry, or None if it is not stored
+        """
+        i = self._find(key)
+        if i is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return int(self.depths[i]), float(self.values[i]), int(self.bounds[i]), int(self.best_moves[i])
+
+    def put(self, key: int, depth: int, value: float, bound: int, best_move: int = -1) -> None:
+        """
+        Stores an entry for the given key, replacing the previous entry of the key (if any)
+        :param key: the 64-bit key
+        :param depth: the depth the value was searched to
+        :param value: the value
+        :param bound: whether the value is EXACT, a LOWER_BOUND or an UPPER_BOUND
+        :param best_move: the index of the best move (-1 if none)
+        """
+        i = self._find(key)
+        if i is None:
+            start = self._bucket_start(key)
+            i = min(
+                range(start, start + self.bucket_size),
+                key=lambda j: (self.depths[j] >= 0, self.searches[j] == self.search, self.depths[j])
+            )
+            if self.depths[i] >= 0:
+                self.replacements += 1
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.values[i] = value
+        self.bounds[i] = bound
+        self.best_moves[i] = best_move
+        self.searches[i] = self.search
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.depths >= 0))
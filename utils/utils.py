@@ -1,5 +1,6 @@
 from itertools import permutations
 
+import numpy as np
 from more_itertools import flatten
 
 
@@ -22,3 +23,34 @@ def ordered_partitions(n, min_i=1):
     Order of the elements to sum up to n IS important.
     """
     return flatten([set(permutations(partition)) for partition in partitions(n, min_i=min_i)])
+
+
+def decayed_chain_sums(values, chain_ends, decay):
+    """
+    Returns, for each element of values, the sum of it and the later elements of its chain, each decayed by decay per
+    step: sum over t >= k of decay^(t - k) * values[t] (like the TD errors credited by eligibility traces).
+    Chains are consecutive elements, ended by the elements where chain_ends is true (and by the last element).
+    Each chain is summed in blocks short enough for decay^t not to underflow: within a block, the reverse cumulative
+    sum of values[t] * decay^t divided by decay^t, plus the decayed sum of the next block.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    chain_ends = np.asarray(chain_ends, dtype=bool)
+    decay = float(decay)
+    if decay == 0.0 or len(values) == 0:
+        return values.copy()
+    # Blocks over which decay^t stays within 100 orders of magnitude of 1
+    log_decay = abs(np.log(abs(decay)))
+    block_length = len(values) if log_decay == 0.0 else max(1, int(100 * np.log(10) / log_decay))
+
+    sums = np.empty_like(values)
+    chain_starts = np.flatnonzero(chain_ends[:-1]) + 1
+    # The chains of sums are views, so filling them fills sums
+    for chain_values, chain_sums in zip(np.split(values, chain_starts), np.split(sums, chain_starts)):
+        next_block_sum = 0.0
+        for block_end in range(len(chain_values), 0, -block_length):
+            block_start = max(0, block_end - block_length)
+            powers = decay ** np.arange(block_end - block_start)
+            block_sums = np.cumsum((chain_values[block_start:block_end] * powers)[::-1])[::-1] / powers
+            chain_sums[block_start:block_end] = block_sums + next_block_sum * decay * powers[::-1]
+            next_block_sum = chain_sums[block_start]
+    return sums